@@ -0,0 +1,80 @@
+"""
+Compares the throughput of loading a corpus of saves with a plain synchronous loop and with plaza.aio.
+
+    python benchmarks/aio_throughput.py SAVE_DIR [-j WORKERS] [--concurrency N]
+
+The aio runs use a thread pool for file I/O, and either the same thread pool or a process pool for
+decryption (decryption is pure Python, so only the process pool runs it in parallel).
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from plaza import aio  # noqa: E402
+from plaza.batch import expand_paths  # noqa: E402
+from plaza.savefile import SaveFile  # noqa: E402
+
+
+def run_sync(paths: list[str]) -> int:
+    loaded = 0
+    for path in paths:
+        try:
+            SaveFile.load(path)
+            loaded += 1
+        except Exception:
+            pass
+    return loaded
+
+
+async def run_aio(paths: list[str], concurrency: int, io_executor, cpu_executor) -> int:
+    loaded = 0
+    async for _, result in aio.load_many(paths, concurrency, io_executor, cpu_executor):
+        loaded += isinstance(result, SaveFile)
+    return loaded
+
+
+def report(name: str, paths: list[str], loaded: int, seconds: float) -> None:
+    megabytes = sum(os.path.getsize(path) for path in paths) / 1e6
+    print(f"{name:24} {loaded:5d}/{len(paths)} files  {seconds:7.2f}s  {len(paths) / seconds:7.1f} files/s  "
+          f"{megabytes / seconds:7.1f} MB/s")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("corpus", nargs="+", help="save files, directories or glob patterns")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--concurrency", type=int, default=None, help="loads in flight (default: 2 x workers)")
+    args = parser.parse_args()
+
+    paths = expand_paths(args.corpus)
+    if not paths:
+        print("No files matched", file=sys.stderr)
+        return 2
+    concurrency = args.concurrency or 2 * args.workers
+
+    start = time.perf_counter()
+    loaded = run_sync(paths)
+    report("sync loop", paths, loaded, time.perf_counter() - start)
+
+    with ThreadPoolExecutor(args.workers) as threads:
+        start = time.perf_counter()
+        loaded = asyncio.run(run_aio(paths, concurrency, threads, threads))
+        report("aio, thread pool", paths, loaded, time.perf_counter() - start)
+
+        with ProcessPoolExecutor(args.workers) as processes:
+            # Start the worker processes before timing.
+            list(processes.map(abs, range(args.workers)))
+            start = time.perf_counter()
+            loaded = asyncio.run(run_aio(paths, concurrency, threads, processes))
+            report("aio, process pool", paths, loaded, time.perf_counter() - start)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
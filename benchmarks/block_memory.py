@@ -0,0 +1,119 @@
+"""
+Compares the memory held by the decrypted blocks of saves in each block layout, in bytes per block.
+
+    python benchmarks/block_memory.py SAVE [SAVE ...] [--lookups N]
+
+Layouts: SCBlock objects with a __dict__ (as before __slots__), SCBlock objects with __slots__ in a
+HashDB, and a BlockTable. Memory is measured with tracemalloc once the structure is built, so only
+what it keeps is counted; the payload line is the size of the block data itself.
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from plaza.batch import expand_paths  # noqa: E402
+from plaza.crypto import BlockTable, HashDB, SwishCrypto  # noqa: E402
+
+
+class DictBlock:
+    """SCBlock as it was laid out before __slots__ (same attributes, with a per-instance __dict__)."""
+
+    def __init__(self, key, block_type, data, sub_type):
+        self.key = key
+        self.type = block_type
+        self.raw = bytearray(data)
+        self.sub_type = sub_type
+
+
+def build_dict_blocks(decrypted: bytes):
+    blocks = [DictBlock(block.key, block.type, block.raw, block.sub_type)
+              for block in SwishCrypto.read_blocks(decrypted)]
+    return blocks, {f"{block.key:08X}": block for block in blocks}
+
+
+def build_hash_db(decrypted: bytes):
+    return HashDB(SwishCrypto.read_blocks(decrypted))
+
+
+def build_table(decrypted: bytes):
+    return BlockTable.read_blocks(decrypted)
+
+
+LAYOUTS = {
+    "SCBlock with __dict__": build_dict_blocks,
+    "SCBlock with __slots__": build_hash_db,
+    "BlockTable": build_table,
+}
+
+
+def measure(build, decrypted: bytes) -> tuple[object, int]:
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    built = build(decrypted)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return built, size
+
+
+def time_lookups(built, keys: list[int]) -> float:
+    if isinstance(built, tuple):
+        db = built[1]
+        get = lambda key: db[f"{key:08X}"]  # noqa: E731
+    else:
+        get = built.__getitem__
+    start = time.perf_counter()
+    for key in keys:
+        len(get(key).raw)
+    return (time.perf_counter() - start) / len(keys) * 1e9
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("saves", nargs="+", help="save files, directories or glob patterns")
+    parser.add_argument("--lookups", type=int, default=100000, help="block lookups timed per layout")
+    args = parser.parse_args()
+
+    paths = expand_paths(args.saves)
+    if not paths:
+        print("No files matched", file=sys.stderr)
+        return 2
+
+    totals = {name: 0 for name in LAYOUTS}
+    lookup_ns = {name: 0.0 for name in LAYOUTS}
+    blocks = payload = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        decrypted = bytearray(data[:-SwishCrypto.SIZE_HASH])
+        SwishCrypto.crypt_static_xorpad_bytes(decrypted)
+        decrypted = bytes(decrypted)
+
+        table = BlockTable.read_blocks(decrypted)
+        blocks += len(table)
+        payload += len(table.payload)
+        keys = random.Random(0).choices(list(table.keys), k=args.lookups)
+        for name, build in LAYOUTS.items():
+            built, size = measure(build, decrypted)
+            totals[name] += size
+            lookup_ns[name] += time_lookups(built, keys) / len(paths)
+            del built
+
+    print(f"{len(paths)} saves, {blocks} blocks, {payload / blocks:.1f} payload bytes per block on average")
+    baseline = totals["SCBlock with __dict__"]
+    for name, total in totals.items():
+        print(f"{name:24} {total / blocks:8.1f} bytes/block  {total / 1e6:8.2f} MB  "
+              f"{total / baseline:6.1%} of __dict__  {lookup_ns[name]:7.0f} ns/lookup")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
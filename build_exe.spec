@@ -28,6 +28,7 @@ a = Analysis(
         'tkinter.messagebox',
         'tkinter.simpledialog',
         'plaza.crypto',
+        'plaza.crypto.blocktable',
         'plaza.crypto.fnvhash',
         'plaza.crypto.hashdb',
         'plaza.crypto.scblock',
@@ -39,11 +40,27 @@ a = Analysis(
         'plaza.types.bagsave',
         'plaza.types.coredata',
         'plaza.types.pokedex',
+        'plaza.types.registry',
+        'plaza.backup',
+        'plaza.history',
+        'plaza.inplace',
+        'plaza.journal',
+        'plaza.overlay',
+        'plaza.patch',
+        'plaza.savefile',
+        'plaza.watcher',
         'plaza.util.items',
+        'plaza.util.search',
         'pokemon_legends_za_editor.main',
+        'pokemon_legends_za_editor.bag_model',
+        'pokemon_legends_za_editor.catalog_model',
+        'pokemon_legends_za_editor.startup',
+        'pokemon_legends_za_editor.tasks',
+        'pokemon_legends_za_editor.virtual_tree',
         'pokemon_legends_za_editor.plza_config',
         'pokemon_legends_za_editor.plza_utils',
         'pokemon_legends_za_editor.preset_manager',
+        'pokemon_legends_za_editor.saver',
     ],
     hookspath=[],
     hooksconfig={},
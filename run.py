@@ -13,4 +13,4 @@ if src_path not in sys.path:
 from pokemon_legends_za_editor.main import main
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
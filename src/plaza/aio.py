@@ -0,0 +1,95 @@
+"""
+Asyncio front-end for plaza: file I/O and the codec work run in executors, never on the event loop.
+
+Every function takes an io_executor (file reads and writes) and a cpu_executor (decrypt, encrypt,
+hashing). None means the loop's default executor. A ProcessPoolExecutor can be given as cpu_executor:
+only bytes and blocks cross the process boundary.
+"""
+
+import asyncio
+from concurrent.futures import Executor
+from typing import AsyncIterator, Iterable, Optional, Union
+
+from .crypto import HashDB, SCBlock, SwishCrypto
+from .savefile import SaveFile, write_atomic
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _decrypt(data: bytes) -> list[SCBlock]:
+    if not SaveFile.has_magic(data):
+        raise ValueError("Data is not a save file")
+    return SwishCrypto.decrypt(data)
+
+
+async def load_save(path: str, io_executor: Optional[Executor] = None,
+                    cpu_executor: Optional[Executor] = None) -> SaveFile:
+    """Reads and decrypts a save file."""
+    loop = asyncio.get_running_loop()
+    data = await loop.run_in_executor(io_executor, _read, path)
+    blocks = await loop.run_in_executor(cpu_executor, _decrypt, data)
+    return SaveFile(data, HashDB(blocks), path)
+
+
+async def save_save(save_file: SaveFile, path: Optional[str] = None, atomic: bool = True,
+                    io_executor: Optional[Executor] = None, cpu_executor: Optional[Executor] = None) -> bytes:
+    """
+    Encrypts the blocks of a save and writes them to path (defaults to the path it was loaded from).
+
+    The blocks are copied before the first await, so edits made while the save is being written
+    are not part of it.
+    """
+    path = path or save_file.path
+    if path is None:
+        raise ValueError("No path to write the save file to")
+    loop = asyncio.get_running_loop()
+    blocks = [block.clone() for block in save_file.hash_db.blocks]
+    data = await loop.run_in_executor(cpu_executor, SwishCrypto.encrypt, blocks)
+    await loop.run_in_executor(io_executor, write_atomic if atomic else _write, path, data)
+    save_file.replace_data(data, hash_valid=True)
+    save_file.path = path
+    return data
+
+
+async def verify(path: str, io_executor: Optional[Executor] = None,
+                 cpu_executor: Optional[Executor] = None) -> bool:
+    """Checks the SHA-256 trailer of a save file, without decrypting it."""
+    loop = asyncio.get_running_loop()
+    data = await loop.run_in_executor(io_executor, _read, path)
+    if not SaveFile.has_magic(data):
+        return False
+    return await loop.run_in_executor(cpu_executor, SwishCrypto.get_is_hash_valid, data)
+
+
+async def load_many(paths: Iterable[str], concurrency: int = 4, io_executor: Optional[Executor] = None,
+                    cpu_executor: Optional[Executor] = None
+                    ) -> AsyncIterator[tuple[str, Union[SaveFile, Exception]]]:
+    """
+    Loads many saves with at most `concurrency` loads in flight, yielding (path, save or error)
+    in completion order. A file that fails to load does not stop the others.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def load(path: str) -> tuple[str, Union[SaveFile, Exception]]:
+        async with semaphore:
+            try:
+                return path, await load_save(path, io_executor, cpu_executor)
+            except Exception as e:
+                return path, e
+
+    tasks = [asyncio.ensure_future(load(path)) for path in paths]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The consumer stopped early: do not leave loads running in the background.
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,239 @@
+"""
+Content-addressed backup store for save files.
+
+A backup is a small manifest listing the blocks of a save, in file order. Every object is stored
+once, zlib-compressed, under the SHA-256 of its content, so what did not change between two backups
+is shared by both. Block payloads larger than PACK_LIMIT are objects of their own; runs of up to
+PACK_SIZE smaller blocks (the thousands of scalars and flags) are packed into a single object, so
+changing one flag only stores one new pack.
+
+    <store>/objects/ab/abcdef...      zlib(payload or pack)
+    <store>/manifests/<source>/<id>   zlib(JSON manifest)
+    <store>/.lock                     held while a backup is created or garbage is collected
+
+Objects are written before the manifest that references them, so garbage collection must not run
+while a backup is being created: both take the lock file, which works across threads and processes.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, Optional
+
+from .crypto import SCBlock, SwishCrypto
+from .crypto.sctypecode import SCTypeCode
+from .savefile import write_atomic
+
+DEFAULT_DIRECTORY = ".plaza_backups"
+LOCK_NAME = ".lock"
+PACK_LIMIT = 64
+PACK_SIZE = 128
+MANIFEST_VERSION = 1
+
+PACKED_HEADER = struct.Struct("<IBBI")   # key, type, sub-type, payload length
+
+
+def pack_blocks(blocks: list[SCBlock]) -> bytes:
+    packed = bytearray()
+    for block in blocks:
+        packed += PACKED_HEADER.pack(block.key, block.type.value, block.sub_type.value, len(block.raw))
+        packed += block.raw
+    return bytes(packed)
+
+
+def unpack_blocks(packed: bytes) -> list[SCBlock]:
+    blocks = []
+    offset = 0
+    while offset < len(packed):
+        key, block_type, sub_type, length = PACKED_HEADER.unpack_from(packed, offset)
+        offset += PACKED_HEADER.size
+        blocks.append(SCBlock(key, SCTypeCode(block_type), packed[offset:offset + length], SCTypeCode(sub_type)))
+        offset += length
+    return blocks
+
+
+class BackupStore:
+    """Backups of the saves of one directory; retention keeps the newest max_backups per save."""
+
+    def __init__(self, root: str, max_backups: int = 10):
+        self.root = root
+        self.max_backups = max_backups
+        self.objects_dir = os.path.join(root, "objects")
+        self.manifests_dir = os.path.join(root, "manifests")
+
+    @classmethod
+    def for_save(cls, save_path: str, max_backups: int = 10) -> 'BackupStore':
+        """Gets the store kept next to a save file."""
+        return cls(os.path.join(os.path.dirname(os.path.abspath(save_path)), DEFAULT_DIRECTORY), max_backups)
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """Holds the lock file of the store (exclusive, blocking)."""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, LOCK_NAME), "a+b") as f:
+            if os.name == "nt":
+                import msvcrt
+                f.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue    # LK_LOCK gives up after about 10 seconds
+                try:
+                    yield
+                finally:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def get_object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def put_object(self, payload: bytes) -> str:
+        digest = hashlib.sha256(payload).hexdigest()
+        path = self.get_object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_atomic(path, zlib.compress(payload))
+        return digest
+
+    def get_object(self, digest: str) -> bytes:
+        with open(self.get_object_path(digest), "rb") as f:
+            payload = zlib.decompress(f.read())
+        if hashlib.sha256(payload).hexdigest() != digest:
+            raise ValueError(f"Backup object {digest} is corrupted")
+        return payload
+
+    def get_source_dir(self, source: str) -> str:
+        return os.path.join(self.manifests_dir, os.path.basename(source))
+
+    def create(self, blocks: Iterable[SCBlock], source: str, data: Optional[bytes] = None) -> str:
+        """
+        Backs up the blocks of a save; returns the id of the backup. If given, data is the encrypted
+        file the blocks come from, whose trailer identifies it in the listing.
+        """
+        with self.lock():
+            backup_id = self._create(blocks, source, data)
+            self._prune(source)
+        return backup_id
+
+    def _create(self, blocks: Iterable[SCBlock], source: str, data: Optional[bytes]) -> str:
+        # Entries are either ["pack", digest] or [key, type, sub-type, digest].
+        entries: list[list] = []
+        run: list[SCBlock] = []
+
+        def flush_run():
+            if run:
+                entries.append(["pack", self.put_object(pack_blocks(run))])
+                run.clear()
+
+        for block in blocks:
+            if len(block.raw) <= PACK_LIMIT:
+                run.append(block)
+                if len(run) == PACK_SIZE:
+                    flush_run()
+            else:
+                flush_run()
+                entries.append([block.key, block.type.value, block.sub_type.value, self.put_object(bytes(block.raw))])
+        flush_run()
+
+        created = time.time()
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "source": os.path.basename(source),
+            "created": created,
+            "trailer": data[-SwishCrypto.SIZE_HASH:].hex() if data else None,
+            "blocks": entries,
+        }
+        encoded = zlib.compress(json.dumps(manifest, separators=(",", ":")).encode("utf-8"))
+        # Ids sort in creation order (to the millisecond), the hash keeps them unique.
+        backup_id = (time.strftime("%Y%m%d-%H%M%S", time.localtime(created)) + f".{int(created * 1000) % 1000:03d}-"
+                     + hashlib.sha256(encoded).hexdigest()[:8])
+
+        source_dir = self.get_source_dir(source)
+        os.makedirs(source_dir, exist_ok=True)
+        write_atomic(os.path.join(source_dir, backup_id), encoded)
+        return backup_id
+
+    def list_backups(self, source: str) -> list[str]:
+        """Gets the backup ids of a save, oldest first."""
+        try:
+            return sorted(name for name in os.listdir(self.get_source_dir(source)) if not name.startswith("."))
+        except FileNotFoundError:
+            return []
+
+    def read_manifest(self, source: str, backup_id: str) -> dict[str, Any]:
+        with open(os.path.join(self.get_source_dir(source), backup_id), "rb") as f:
+            return json.loads(zlib.decompress(f.read()))
+
+    def restore_blocks(self, source: str, backup_id: str) -> list[SCBlock]:
+        """Rebuilds the blocks of a backup from its manifest and the objects it references."""
+        manifest = self.read_manifest(source, backup_id)
+        if manifest["version"] != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported backup manifest version {manifest['version']}")
+        blocks = []
+        for entry in manifest["blocks"]:
+            if entry[0] == "pack":
+                blocks.extend(unpack_blocks(self.get_object(entry[1])))
+            else:
+                key, block_type, sub_type, digest = entry
+                blocks.append(SCBlock(key, SCTypeCode(block_type), self.get_object(digest), SCTypeCode(sub_type)))
+        return blocks
+
+    def restore(self, source: str, backup_id: str, output: str) -> bytes:
+        """Writes the save of a backup to output (atomically); returns the encrypted data."""
+        data = SwishCrypto.encrypt(self.restore_blocks(source, backup_id))
+        write_atomic(output, data)
+        return data
+
+    def prune(self, source: str) -> list[str]:
+        """Removes the oldest backups of a save beyond max_backups, then the objects nobody references."""
+        with self.lock():
+            return self._prune(source)
+
+    def _prune(self, source: str) -> list[str]:
+        backup_ids = self.list_backups(source)
+        removed = backup_ids[:max(0, len(backup_ids) - self.max_backups)]
+        for backup_id in removed:
+            os.unlink(os.path.join(self.get_source_dir(source), backup_id))
+        if removed:
+            self._collect_garbage()
+        return removed
+
+    def collect_garbage(self) -> int:
+        """Deletes the objects that no manifest references; returns how many were deleted."""
+        with self.lock():
+            return self._collect_garbage()
+
+    def _collect_garbage(self) -> int:
+        if not os.path.isdir(self.objects_dir):
+            return 0
+        referenced = set()
+        for source in os.listdir(self.manifests_dir):
+            for backup_id in self.list_backups(source):
+                manifest = self.read_manifest(source, backup_id)
+                referenced.update(entry[-1] for entry in manifest["blocks"])
+
+        deleted = 0
+        for prefix in os.listdir(self.objects_dir):
+            for digest in os.listdir(os.path.join(self.objects_dir, prefix)):
+                if digest not in referenced and not digest.startswith("."):
+                    os.unlink(os.path.join(self.objects_dir, prefix, digest))
+                    deleted += 1
+        return deleted
+
+    def get_size(self) -> int:
+        """Gets the bytes used by the store on disk."""
+        return sum(os.path.getsize(os.path.join(directory, name))
+                   for directory, _, names in os.walk(self.root) for name in names)
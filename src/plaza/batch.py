@@ -0,0 +1,278 @@
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Iterable, Iterator, Optional
+
+from . import inplace
+from .crypto import SwishCrypto
+from .patch import Patch, apply_to_data, apply_to_hash_db
+from .savefile import SaveFile, write_atomic
+from .types import BagEntry, BagSave, CoreData, HashDBKeys
+
+# An operation is a picklable tuple, so it can be sent to pool workers:
+#   ("set_item", item_id, quantity)
+#   ("preset", path)              items of a preset JSON file ({"items": [{"id", "quantity"}, ...]})
+#   ("repair",)                   fix categories, remove unknown items
+#   ("set_core", field, value)    CoreData field, value given as a string
+#   ("patch", path)               compiled patch file (see plaza.patch)
+Operation = tuple
+
+CORE_FIELDS = (
+    "name", "id", "sex", "mega_power", "mega_evo_timer", "player_hp", "member_rank", "member_rank_exp",
+    "partner_walk_count", "egg_hatch_count", "birthday_month", "birthday_day", "player_icon_id",
+)
+
+# Per-process caches, filled by init_worker in pool workers (and lazily otherwise).
+_item_db: Optional[dict] = None
+_presets: dict[str, list[tuple[int, int]]] = {}
+_patches: dict[str, Patch] = {}
+
+
+def get_item_db() -> dict:
+    global _item_db
+    if _item_db is None:
+        from .util.items import item_db
+        _item_db = item_db
+    return _item_db
+
+
+def get_preset(path: str) -> list[tuple[int, int]]:
+    """Loads the (item id, quantity) pairs of a preset file, once per process."""
+    path = os.path.abspath(path)
+    if path not in _presets:
+        with open(path, encoding="utf-8") as f:
+            preset = json.load(f)
+        _presets[path] = [(int(item["id"]), int(item["quantity"])) for item in preset.get("items", [])]
+    return _presets[path]
+
+
+def get_patch(path: str) -> Patch:
+    """Loads a compiled patch file, once per process."""
+    path = os.path.abspath(path)
+    if path not in _patches:
+        _patches[path] = Patch.load(path)
+    return _patches[path]
+
+
+def init_worker(preset_paths: Iterable[str] = (), patch_paths: Iterable[str] = ()) -> None:
+    """Pool initializer: warms the item database, preset and patch caches once per worker process."""
+    get_item_db()
+    for path in preset_paths:
+        get_preset(path)
+    for path in patch_paths:
+        get_patch(path)
+
+
+def expand_paths(patterns: Iterable[str], recursive: bool = False) -> list[str]:
+    """Expands files, directories and glob patterns into a sorted list of files."""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            if recursive:
+                for root, _, files in os.walk(pattern):
+                    paths.update(os.path.join(root, name) for name in files)
+            else:
+                paths.update(entry.path for entry in os.scandir(pattern) if entry.is_file())
+        elif os.path.isfile(pattern):
+            paths.add(pattern)
+        else:
+            paths.update(path for path in glob.glob(pattern, recursive=recursive) if os.path.isfile(path))
+    return sorted(paths)
+
+
+def get_output_paths(paths: list[str], output_dir: str) -> dict[str, str]:
+    """
+    Maps each input to its path under output_dir, relative to the common root of the inputs, so
+    inputs with the same name in different directories do not overwrite each other.
+    """
+    absolute = [os.path.abspath(path) for path in paths]
+    try:
+        root = os.path.commonpath([os.path.dirname(path) for path in absolute]) if absolute else ""
+    except ValueError:  # different drives: only the names are kept
+        root = None
+    outputs = {}
+    for path, path_abs in zip(paths, absolute):
+        relative = os.path.basename(path_abs) if root is None else os.path.relpath(path_abs, root)
+        outputs[path] = os.path.join(output_dir, relative)
+    seen: dict[str, str] = {}
+    for path, output in outputs.items():
+        key = os.path.normcase(output)
+        if key in seen:
+            raise ValueError(f"{seen[key]} and {path} would both be written to {output}")
+        seen[key] = path
+    return outputs
+
+
+def make_entry(item_id: int, quantity: int) -> BagEntry:
+    """Creates a bag entry with the expected category of the item (an empty entry if quantity is 0)."""
+    entry = BagEntry()
+    entry.quantity = quantity
+    entry.category = get_item_db()[item_id]["expected_category"] if quantity > 0 else 0
+    return entry
+
+
+def set_item(bag_save: BagSave, item_id: int, quantity: int) -> int:
+    if item_id not in get_item_db():
+        raise ValueError(f"Unknown item id {item_id}")
+    bag_save.set_entry(item_id, make_entry(item_id, quantity))
+    return 1
+
+
+def repair_bag(bag_save: BagSave) -> int:
+    """Fixes the categories of known items and removes unknown items; returns the number of entries changed."""
+    item_db = get_item_db()
+    repaired = 0
+    for i, entry in enumerate(bag_save.entries):
+        if entry.quantity <= 0:
+            continue
+        if i in item_db:
+            expected_category = item_db[i]["expected_category"]
+            if entry.category != expected_category:
+                entry.category = expected_category
+                bag_save.set_entry(i, entry)
+                repaired += 1
+        else:
+            entry.quantity = 0
+            entry.category = 0
+            bag_save.set_entry(i, entry)
+            repaired += 1
+    return repaired
+
+
+def set_core_field(core_data: CoreData, field: str, value: str) -> int:
+    if field not in CORE_FIELDS:
+        raise ValueError(f"Unsupported CoreData field {field!r} (expected one of {', '.join(CORE_FIELDS)})")
+    if field == "name":
+        core_data.set_name_string(value[:12])
+    elif isinstance(getattr(core_data, field), float):
+        setattr(core_data, field, float(value))
+    else:
+        setattr(core_data, field, int(value, 0))
+    return 1
+
+
+def apply_operations(save_file: SaveFile, operations: Iterable[Operation]) -> int:
+    """Applies the operations to the blocks of a save; returns the number of changes."""
+    bag_save = core_data = None
+    changes = 0
+
+    for operation in operations:
+        kind = operation[0]
+        if kind == "patch":
+            # Patches write raw block bytes: the models parsed so far are written back first.
+            if bag_save is not None:
+                save_file.hash_db[HashDBKeys.BagSave].change_data(bag_save.to_bytes())
+            if core_data is not None:
+                save_file.hash_db[HashDBKeys.CoreData].change_data(core_data.to_bytes())
+            bag_save = core_data = None
+        elif kind in ("set_item", "preset", "repair") and bag_save is None:
+            bag_save = BagSave.from_bytes(save_file.hash_db[HashDBKeys.BagSave].data)
+        elif kind == "set_core" and core_data is None:
+            core_data = CoreData.from_bytes(save_file.hash_db[HashDBKeys.CoreData].data)
+
+        if kind == "set_item":
+            changes += set_item(bag_save, operation[1], operation[2])
+        elif kind == "preset":
+            # Presets are shared between game versions: items this database does not know are skipped.
+            item_db = get_item_db()
+            for item_id, quantity in get_preset(operation[1]):
+                if item_id in item_db:
+                    changes += set_item(bag_save, item_id, quantity)
+        elif kind == "repair":
+            changes += repair_bag(bag_save)
+        elif kind == "set_core":
+            changes += set_core_field(core_data, operation[1], operation[2])
+        elif kind == "patch":
+            changes += apply_to_hash_db(save_file.hash_db, get_patch(operation[1]))
+        else:
+            raise ValueError(f"Unknown operation {kind!r}")
+
+    if bag_save is not None:
+        save_file.hash_db[HashDBKeys.BagSave].change_data(bag_save.to_bytes())
+    if core_data is not None:
+        save_file.hash_db[HashDBKeys.CoreData].change_data(core_data.to_bytes())
+    return changes
+
+
+def process_file(path: str, operations: list[Operation], output: Optional[str] = None,
+                 dry_run: bool = False) -> dict[str, Any]:
+    """
+    Verifies a save and applies the operations to it, writing it back in place (or to output, see
+    get_output_paths).
+
+    "changes" counts the edits applied (items set, fields set, entries repaired, patch records
+    written), except when every operation is a patch: the save is then patched without decoding it,
+    and "changes" counts the patch records that changed bytes, which may cover several items each.
+    "changes_unit" tells which ("edits" or "patch records").
+
+    Never raises: failures are reported in the "error" field of the result.
+    """
+    start = time.perf_counter()
+    result: dict[str, Any] = {"path": path, "ok": False, "hash_valid": None, "changes": 0,
+                              "changes_unit": "edits", "output": None, "error": None}
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        if not SaveFile.has_magic(data):
+            raise ValueError("Not a save file")
+
+        if not operations:
+            # Verifying only needs the hash, not the decrypted blocks.
+            result["hash_valid"] = SwishCrypto.get_is_hash_valid(data)
+        elif all(operation[0] == "patch" for operation in operations):
+            # Patches only need the touched bytes re-encrypted and the hash recomputed, not the decrypted blocks.
+            result["hash_valid"] = SwishCrypto.get_is_hash_valid(data)
+            result["changes_unit"] = "patch records"
+            new_data = data
+            for operation in operations:
+                new_data, changes = apply_to_data(new_data, get_patch(operation[1]))
+                result["changes"] += changes
+            if result["changes"] and not dry_run:
+                output = output or path
+                os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+                if inplace.write_in_place(output, data, new_data) is None:
+                    write_atomic(output, new_data)
+                result["output"] = output
+        else:
+            save_file = SaveFile.from_bytes(data, path)
+            result["hash_valid"] = save_file.is_hash_valid()
+            result["changes"] = apply_operations(save_file, operations)
+            if result["changes"] and not dry_run:
+                output = output or path
+                os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+                save_file.write(output, atomic=True, in_place=True)
+                result["output"] = output
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def run_batch(paths: list[str], operations: list[Operation], workers: Optional[int] = None,
+              output_dir: Optional[str] = None, dry_run: bool = False) -> Iterator[dict[str, Any]]:
+    """
+    Processes the saves on a pool of worker processes, yielding each result as it completes.
+
+    With workers=1 (or a single file) the files are processed in this process. With output_dir, the
+    saves keep their paths relative to the common root of the inputs (see get_output_paths).
+    """
+    outputs = get_output_paths(paths, output_dir) if output_dir else {}
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    preset_paths = [operation[1] for operation in operations if operation[0] == "preset"]
+    patch_paths = [operation[1] for operation in operations if operation[0] == "patch"]
+
+    if workers == 1 or len(paths) <= 1:
+        init_worker(preset_paths, patch_paths)
+        for path in paths:
+            yield process_file(path, operations, outputs.get(path), dry_run)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(preset_paths, patch_paths)) as pool:
+        futures = [pool.submit(process_file, path, operations, outputs.get(path), dry_run) for path in paths]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,316 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from typing import Optional
+
+
+def parse_pair(text: str, name: str) -> tuple[str, str]:
+    key, sep, value = text.partition("=")
+    if not sep or not key or not value:
+        raise argparse.ArgumentTypeError(f"{name} expects KEY=VALUE, got {text!r}")
+    return key, value
+
+
+def parse_item(text: str) -> tuple[int, int]:
+    item_id, quantity = parse_pair(text, "--set-item")
+    try:
+        return int(item_id), int(quantity)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"--set-item expects ID=QUANTITY, got {text!r}")
+
+
+def get_operations(args: argparse.Namespace) -> list[tuple]:
+    """Builds the batch operations in the order they are applied: items, presets, patches, core fields, repair."""
+    operations = []
+    operations += [("set_item", item_id, quantity) for item_id, quantity in args.set_item]
+    operations += [("preset", path) for path in args.preset]
+    operations += [("patch", path) for path in args.patch]
+    operations += [("set_core", field, value) for field, value in args.set_core]
+    if args.repair:
+        operations.append(("repair",))
+    return operations
+
+
+def format_result(result: dict) -> str:
+    hash_status = {True: "valid", False: "INVALID", None: "-"}[result["hash_valid"]]
+    status = "ok" if result["ok"] else "FAILED"
+    changes = f"{result['changes']}"
+    if result.get("changes_unit", "edits") != "edits":
+        changes += f" ({result['changes_unit']})"
+    line = f"{status:6} {result['path']}  hash={hash_status} changes={changes} " \
+           f"{result['seconds'] * 1000:.1f}ms"
+    if result["error"]:
+        line += f"  {result['error']}"
+    return line
+
+
+def command_batch(args: argparse.Namespace) -> int:
+    from .batch import expand_paths, get_output_paths, get_patch, get_preset, run_batch
+
+    paths = expand_paths(args.paths, args.recursive)
+    if not paths:
+        print("No files matched", file=sys.stderr)
+        return 2
+
+    # Load the presets once here so a broken file is reported before any save is touched.
+    for path in args.preset:
+        try:
+            get_preset(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Cannot load preset {path}: {e}", file=sys.stderr)
+            return 2
+    for path in args.patch:
+        try:
+            get_patch(path)
+        except (OSError, ValueError) as e:
+            print(f"Cannot load patch {path}: {e}", file=sys.stderr)
+            return 2
+
+    if args.output_dir:
+        try:
+            get_output_paths(paths, args.output_dir)
+        except ValueError as e:
+            print(f"Cannot write into {args.output_dir}: {e}", file=sys.stderr)
+            return 2
+
+    operations = get_operations(args)
+    start = time.perf_counter()
+    failed = invalid = 0
+    for result in run_batch(paths, operations, args.workers, args.output_dir, args.dry_run):
+        print(format_result(result), flush=True)
+        failed += not result["ok"]
+        invalid += result["hash_valid"] is False
+
+    elapsed = time.perf_counter() - start
+    print(f"{len(paths)} files, {len(paths) - failed} ok, {failed} failed, {invalid} with an invalid hash "
+          f"in {elapsed:.2f}s ({len(paths) / elapsed if elapsed else 0:.1f} files/s)")
+    if failed or (args.verify and invalid):
+        return 1
+    return 0
+
+
+def command_verify(args: argparse.Namespace) -> int:
+    from .batch import expand_paths
+    from .verify import verify_many
+
+    paths = expand_paths(args.paths, args.recursive)
+    if not paths:
+        print("No files matched", file=sys.stderr)
+        return 2
+
+    start = time.perf_counter()
+    total_bytes = valid = invalid = not_saves = errors = 0
+    results = verify_many(paths, args.workers)
+    try:
+        for result in results:
+            result["seconds"] = round(result["seconds"], 6)
+            print(json.dumps(result), flush=True)
+            total_bytes += result["size"]
+            if result["error"]:
+                errors += 1
+            elif not result["magic"]:
+                not_saves += 1
+            elif result["hash_valid"]:
+                valid += 1
+            else:
+                invalid += 1
+    except BrokenPipeError:
+        # The reader went away (e.g. piped into head): stop quietly. stdout is pointed at devnull so
+        # the interpreter's final flush does not fail again.
+        results.close()
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+
+    elapsed = time.perf_counter() - start
+    # The summary goes to stderr so stdout stays valid JSON Lines.
+    print(f"{len(paths)} files, {valid} valid, {invalid} invalid, {not_saves} not saves, {errors} errors; "
+          f"{total_bytes / 1e9:.3f} GB in {elapsed:.2f}s ({total_bytes / 1e9 / elapsed if elapsed else 0:.2f} GB/s)",
+          file=sys.stderr)
+    return 1 if invalid or errors else 0
+
+
+def command_backup(args: argparse.Namespace) -> int:
+    from .backup import BackupStore
+    from .savefile import SaveFile
+
+    store = BackupStore(args.store, args.max_backups) if args.store else \
+        BackupStore.for_save(args.save, args.max_backups)
+    if args.action == "create":
+        save_file = SaveFile.load(args.save)
+        print(store.create(save_file.hash_db.blocks, args.save, save_file.data))
+    elif args.action == "list":
+        for backup_id in store.list_backups(args.save):
+            manifest = store.read_manifest(args.save, backup_id)
+            created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(manifest["created"]))
+            print(f"{backup_id}  {created}  {len(manifest['blocks'])} entries")
+        print(f"Store size: {store.get_size()} bytes", file=sys.stderr)
+    else:
+        if not args.backup_id:
+            print("restore needs a backup id (see 'plaza backup list')", file=sys.stderr)
+            return 2
+        store.restore(args.save, args.backup_id, args.output or args.save)
+        print(f"Restored {args.backup_id} to {args.output or args.save}")
+    return 0
+
+
+def command_watch(args: argparse.Namespace) -> int:
+    from .daemon import WatchDaemon
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    daemon = WatchDaemon(args.directory, args.workers, args.queue_size, args.interval, args.suffix,
+                         args.stats_interval)
+    try:
+        daemon.run(once=args.once)
+    except KeyboardInterrupt:
+        daemon.stop()
+    return 0
+
+
+def command_serve(args: argparse.Namespace) -> int:
+    import asyncio
+
+    from .server import InspectionServer
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    server = InspectionServer(args.root, args.cache_size)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def command_diff(args: argparse.Namespace) -> int:
+    from .diff import diff_files, format_diff, to_json
+
+    start = time.perf_counter()
+    diff = diff_files(args.old, args.new, args.limit)
+    elapsed = time.perf_counter() - start
+    if args.json:
+        print(to_json(diff, indent=2 if args.indent else None))
+    else:
+        print(format_diff(diff))
+        print(f"Compared in {elapsed * 1000:.1f}ms", file=sys.stderr)
+    # Like diff(1): 0 when the saves hold the same blocks, 1 when they differ.
+    return 1 if diff["blocks"] else 0
+
+
+def command_patch(args: argparse.Namespace) -> int:
+    from .patch import Patch, compile_diff, compile_preset_file
+
+    if args.action == "show":
+        patch = Patch.load(args.patch)
+        for record in patch.records:
+            precondition = record.precondition.hex() if record.precondition else "-"
+            print(f"{record.key:08X}  offset={record.offset:<8} length={len(record.data):<6} expects={precondition}")
+        print(f"{len(patch)} records, {sum(len(record.data) for record in patch.records)} bytes", file=sys.stderr)
+        return 0
+
+    if not args.preset and not args.diff:
+        print("compile needs --preset or --diff", file=sys.stderr)
+        return 2
+    patch = Patch()
+    for path in args.preset:
+        preset_patch, unresolved = compile_preset_file(path)
+        for name in unresolved:
+            print(f"{path}: unknown item {name!r} skipped", file=sys.stderr)
+        patch.records += preset_patch.records
+    if args.diff:
+        with open(args.diff[0], "rb") as f:
+            old_data = f.read()
+        with open(args.diff[1], "rb") as f:
+            new_data = f.read()
+        patch.records += compile_diff(old_data, new_data, not args.no_preconditions).records
+    patch.save(args.patch)
+    print(f"{len(patch)} records written to {args.patch}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="plaza", description="Command-line tools for Pokémon Legends Z-A saves.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch = commands.add_parser("batch", help="verify and edit many saves in parallel")
+    batch.add_argument("paths", nargs="+", help="save files, directories or glob patterns")
+    batch.add_argument("-r", "--recursive", action="store_true", help="recurse into directories and ** patterns")
+    batch.add_argument("--set-item", metavar="ID=QUANTITY", type=parse_item, action="append", default=[],
+                       help="set the quantity of an item (0 removes it)")
+    batch.add_argument("--preset", metavar="FILE", action="append", default=[],
+                       help="apply the items of a preset JSON file")
+    batch.add_argument("--patch", metavar="FILE", action="append", default=[],
+                       help="apply a compiled patch file (see 'plaza patch')")
+    batch.add_argument("--set-core", metavar="FIELD=VALUE", type=lambda text: parse_pair(text, "--set-core"),
+                       action="append", default=[], help="set a CoreData field (name, id, sex, mega_power, ...)")
+    batch.add_argument("--repair", action="store_true", help="fix item categories and remove unknown items")
+    batch.add_argument("--verify", action="store_true", help="exit with an error if a hash is invalid")
+    batch.add_argument("-o", "--output-dir", help="write edited saves here instead of in place (keeping their paths relative to the inputs)")
+    batch.add_argument("-j", "--workers", type=int, default=None,
+                       help="number of worker processes (default: CPU count)")
+    batch.add_argument("-n", "--dry-run", action="store_true", help="apply the operations without writing")
+    batch.set_defaults(func=command_batch)
+
+    verify = commands.add_parser("verify", help="check the hashes of many saves, as JSON Lines")
+    verify.add_argument("paths", nargs="+", help="save files, directories or glob patterns")
+    verify.add_argument("-r", "--recursive", action="store_true", help="recurse into directories and ** patterns")
+    verify.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of hashing threads (default: CPU count + 4, at most 32)")
+    verify.set_defaults(func=command_verify)
+
+    backup = commands.add_parser("backup", help="create, list and restore deduplicated backups of a save")
+    backup.add_argument("action", choices=("create", "list", "restore"))
+    backup.add_argument("save", help="save file")
+    backup.add_argument("backup_id", nargs="?", help="backup to restore")
+    backup.add_argument("-o", "--output", help="restore to this file instead of over the save")
+    backup.add_argument("--store", help="backup store directory (default: .plaza_backups next to the save)")
+    backup.add_argument("--max-backups", type=int, default=10, help="backups kept per save (default: 10)")
+    backup.set_defaults(func=command_backup)
+
+    diff = commands.add_parser("diff", help="compare two saves block by block")
+    diff.add_argument("old", help="save to compare from")
+    diff.add_argument("new", help="save to compare to")
+    diff.add_argument("--json", action="store_true", help="print the differences as JSON")
+    diff.add_argument("--indent", action="store_true", help="indent the JSON output")
+    diff.add_argument("--limit", type=int, default=200, help="changes listed per block (default: 200)")
+    diff.set_defaults(func=command_diff)
+
+    patch = commands.add_parser("patch", help="compile presets or the differences between two saves into a patch")
+    patch.add_argument("action", choices=("compile", "show"))
+    patch.add_argument("patch", help="patch file to write (compile) or read (show)")
+    patch.add_argument("--preset", metavar="FILE", action="append", default=[],
+                       help="compile the items of a preset JSON file (by id or name)")
+    patch.add_argument("--diff", metavar=("OLD", "NEW"), nargs=2, help="compile the changes from OLD to NEW")
+    patch.add_argument("--no-preconditions", action="store_true",
+                       help="apply diff records even to saves that do not hold the bytes of OLD")
+    patch.set_defaults(func=command_patch)
+
+    watch = commands.add_parser("watch", help="verify, repair and re-sign the saves dropped into a folder")
+    watch.add_argument("directory", help="folder to poll")
+    watch.add_argument("-j", "--workers", type=int, default=None,
+                       help="number of worker processes (default: CPU count)")
+    watch.add_argument("--queue-size", type=int, default=16, help="files waiting for a worker before polling blocks")
+    watch.add_argument("--interval", type=float, default=2.0, help="seconds between two polls")
+    watch.add_argument("--suffix", default=".normalized", help="suffix of the output written next to each input")
+    watch.add_argument("--stats-interval", type=float, default=30.0, help="seconds between two statistics logs")
+    watch.add_argument("--once", action="store_true", help="process the files already there, then exit")
+    watch.set_defaults(func=command_watch)
+
+    serve = commands.add_parser("serve", help="answer JSON questions about saves over local HTTP")
+    serve.add_argument("root", help="directory of the saves that can be inspected")
+    serve.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    serve.add_argument("--port", type=int, default=8765, help="port to listen on (default: 8765)")
+    serve.add_argument("--cache-size", type=int, default=8, help="number of parsed saves kept in memory")
+    serve.set_defaults(func=command_serve)
+
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 from .fnvhash import FnvHash
 from .swishcrypto import SwishCrypto
 from .scblock import SCBlock
-from .hashdb import HashDB
\ No newline at end of file
+from .hashdb import HashDB
+from .blocktable import BlockTable, TableBlock
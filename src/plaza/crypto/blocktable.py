@@ -0,0 +1,161 @@
+"""
+Compact storage for the blocks of a save.
+
+A save holds a few thousand blocks, most of them scalars and booleans of 0 to 8 bytes; as SCBlock
+objects each pays for an object, two enum references and its own bytearray, many times its payload.
+A BlockTable keeps the keys in an array('I'), the type codes in bytearrays, and the payloads in one
+shared buffer addressed by offset and length. Blocks are read through TableBlock, a flyweight SCBlock
+created on demand whose raw is a view into the shared buffer: same-size writes go to the table.
+"""
+
+import sys
+from array import array
+from bisect import bisect_left
+from enum import Enum
+from typing import Callable, Iterable, Iterator, Optional
+
+from .fnvhash import FnvHash
+from .hashdb import HashDB
+from .scblock import SCBlock
+from .sctypecode import SCTypeCode
+from .swishcrypto import SwishCrypto
+
+
+class TableBlock(SCBlock):
+    """A block of a BlockTable; it only holds the table and its position."""
+
+    __slots__ = ("table", "index")
+
+    def __init__(self, table: 'BlockTable', index: int):
+        self.table = table
+        self.index = index
+
+    @property
+    def key(self) -> int:
+        return self.table.keys[self.index]
+
+    @property
+    def type(self) -> SCTypeCode:
+        return SCTypeCode(self.table.types[self.index])
+
+    @type.setter
+    def type(self, value: SCTypeCode) -> None:
+        # Boolean blocks change type (see change_boolean_type); the size never changes.
+        self.table.types[self.index] = value.value
+
+    @property
+    def sub_type(self) -> SCTypeCode:
+        return SCTypeCode(self.table.sub_types[self.index])
+
+    @property
+    def raw(self) -> memoryview:
+        offset = self.table.offsets[self.index]
+        return self.table.view[offset:offset + self.table.lengths[self.index]]
+
+
+class BlockTable:
+    """
+    The blocks of a save in parallel arrays. Lookups take the same keys as HashDB (key, HashDBKeys or
+    name); blocks keep their size, so the table is built once and then only written in place.
+    """
+
+    def __init__(self):
+        self.keys = array("I")
+        self.types = bytearray()
+        self.sub_types = bytearray()
+        self.offsets = array("I")
+        self.lengths = array("I")
+        self.payload = bytearray()
+        self.view = memoryview(b"")
+        # Keys in ascending order and the position of each, for lookups by bisection.
+        self.sorted_keys = array("I")
+        self.positions = array("I")
+
+    def append(self, key: int, block_type: SCTypeCode, data: bytes = b"",
+               sub_type: SCTypeCode = SCTypeCode.NONE) -> None:
+        self.keys.append(key)
+        self.types.append(block_type.value)
+        self.sub_types.append(sub_type.value)
+        self.offsets.append(len(self.payload))
+        self.lengths.append(len(data))
+        self.payload += data
+
+    def seal(self) -> 'BlockTable':
+        """Ends building the table: indexes the keys and shares the payload buffer with the blocks."""
+        order = sorted(range(len(self.keys)), key=self.keys.__getitem__)
+        self.sorted_keys = array("I", (self.keys[i] for i in order))
+        self.positions = array("I", order)
+        self.view = memoryview(self.payload)
+        return self
+
+    @classmethod
+    def from_blocks(cls, blocks: Iterable[SCBlock]) -> 'BlockTable':
+        table = cls()
+        for block in blocks:
+            table.append(block.key, block.type, block.raw, block.sub_type)
+        return table.seal()
+
+    @classmethod
+    def read_blocks(cls, data: bytes, progress: Optional[Callable[[float], None]] = None) -> 'BlockTable':
+        """Reads the blocks of decrypted data (see SwishCrypto.read_blocks) into a table."""
+        table = cls()
+        offset = 0
+        while offset < len(data):
+            block, offset = SCBlock.read_from_offset(data, offset)
+            table.append(block.key, block.type, block.raw, block.sub_type)
+            if progress is not None and len(table.keys) % SwishCrypto.PROGRESS_INTERVAL == 0:
+                progress(offset / len(data))
+        return table.seal()
+
+    @classmethod
+    def decrypt(cls, data: bytes, progress: Optional[Callable[[float], None]] = None) -> 'BlockTable':
+        """Decrypts a save into a table (see SwishCrypto.decrypt)."""
+        payload = bytearray(data[:-SwishCrypto.SIZE_HASH])
+        SwishCrypto.crypt_static_xorpad_bytes(payload)
+        return cls.read_blocks(bytes(payload), progress)
+
+    def get_index(self, item: 'str | int | Enum') -> int:
+        if isinstance(item, Enum):  # HashDBKeys
+            item = item.value
+        elif isinstance(item, str):
+            item = FnvHash.hash_fnv1a_32(item)
+        elif not isinstance(item, int):
+            raise TypeError()
+        i = bisect_left(self.sorted_keys, item)
+        if i == len(self.sorted_keys) or self.sorted_keys[i] != item:
+            raise KeyError()
+        return self.positions[i]
+
+    def __getitem__(self, item: 'str | int | Enum') -> TableBlock:
+        return TableBlock(self, self.get_index(item))
+
+    def __contains__(self, item: 'str | int | Enum') -> bool:
+        try:
+            self.get_index(item)
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __iter__(self) -> Iterator[TableBlock]:
+        return (TableBlock(self, i) for i in range(len(self.keys)))
+
+    @property
+    def blocks(self) -> list[TableBlock]:
+        """The blocks in file order, as flyweights (like HashDB.blocks)."""
+        return list(self)
+
+    def encrypt(self, progress: Optional[Callable[[float], None]] = None) -> bytes:
+        return SwishCrypto.encrypt(self.blocks, progress)
+
+    def to_hash_db(self) -> HashDB:
+        """Copies the blocks into independent SCBlock objects."""
+        return HashDB([block.clone() for block in self])
+
+    def get_memory_size(self) -> int:
+        """Gets the bytes held by the table (its arrays and buffers)."""
+        return sum(sys.getsizeof(part) for part in (
+            self, self.keys, self.types, self.sub_types, self.offsets, self.lengths, self.payload,
+            self.view, self.sorted_keys, self.positions))
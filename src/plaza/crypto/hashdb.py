@@ -1,6 +1,12 @@
+from enum import Enum
+from typing import TYPE_CHECKING
+
 from .swishcrypto import SCBlock
 from .fnvhash import FnvHash
-from ..types.accessors import HashDBKeys
+
+if TYPE_CHECKING:
+    # plaza.types.accessors imports plaza.crypto, so importing it here at runtime would be circular.
+    from ..types.accessors import HashDBKeys
 
 class HashDB:
     def __init__(self, blocks: list[SCBlock]):
@@ -10,10 +16,10 @@ class HashDB:
         for block in blocks:
             self.db[f"{block.key:08X}"] = block
 
-    def __getitem__(self, item: str | int | HashDBKeys):
+    def __getitem__(self, item: 'str | int | HashDBKeys'):
         if isinstance(item, int):
             item = f"{item:08X}"
-        elif isinstance(item, HashDBKeys):
+        elif isinstance(item, Enum):  # HashDBKeys
             item = f'{item.value:08X}'
         elif isinstance(item, str):
             item = f'{FnvHash.hash_fnv1a_32(item):08X}'
@@ -9,6 +9,9 @@ class SCBlock:
     Block of Data obtained from a SwishCrypto encrypted block storage binary.
     """
 
+    # A save holds thousands of blocks, most of them a few bytes long: no per-instance __dict__.
+    __slots__ = ("key", "type", "raw", "sub_type")
+
     def __init__(self, key: int, block_type: SCTypeCode, data: bytes = b'', sub_type: SCTypeCode = SCTypeCode.NONE):
         self.key = key
         self.type = block_type
@@ -79,8 +82,7 @@ class SCBlock:
             result.append(self.sub_type.value ^ xk.next())
 
         # Write data
-        for byte in self.raw:
-            result.append(byte ^ xk.next())
+        result.extend(xk.crypt(self.raw))
 
         return bytes(result)
 
@@ -155,12 +157,9 @@ class SCBlock:
 
             if offset + num_bytes > len(data):
                 raise ValueError("Insufficient data for object payload")
-            arr = bytearray(data[offset:offset + num_bytes])
+            arr = bytearray(xk.crypt(data[offset:offset + num_bytes]))
             offset += num_bytes
 
-            for i in range(len(arr)):
-                arr[i] ^= xk.next()
-
             return SCBlock(key, block_type, bytes(arr)), offset
         elif block_type == SCTypeCode.ARRAY:
             if offset + 4 > len(data):
@@ -176,12 +175,9 @@ class SCBlock:
             num_bytes = num_entries * sub_type.get_type_size()
             if offset + num_bytes > len(data):
                 raise ValueError("Insufficient data for array payload")
-            arr = bytearray(data[offset:offset + num_bytes])
+            arr = bytearray(xk.crypt(data[offset:offset + num_bytes]))
             offset += num_bytes
 
-            for i in range(len(arr)):
-                arr[i] ^= xk.next()
-
             SCBlock._ensure_array_is_sane(sub_type, arr)
 
             return SCBlock(key, SCTypeCode.ARRAY, bytes(arr), sub_type), offset
@@ -189,12 +185,9 @@ class SCBlock:
             num_bytes = block_type.get_type_size()
             if offset + num_bytes > len(data):
                 raise ValueError("Insufficient data for single value")
-            arr = bytearray(data[offset:offset + num_bytes])
+            arr = bytearray(xk.crypt(data[offset:offset + num_bytes]))
             offset += num_bytes
 
-            for i in range(len(arr)):
-                arr[i] ^= xk.next()
-
             return SCBlock(key, block_type, bytes(arr)), offset
 
     @staticmethod
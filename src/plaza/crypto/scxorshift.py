@@ -1,3 +1,7 @@
+import struct
+from functools import lru_cache
+
+
 class SCXorShift32:
     """
     Self-mutating value that returns a crypto value to be xor-ed with another (unaligned) byte stream.
@@ -9,8 +13,9 @@ class SCXorShift32:
         self.state = self._get_initial_state(seed)
 
     @staticmethod
+    @lru_cache(maxsize=8192)
     def _get_initial_state(state: int) -> int:
-        """Get initial state based on seed."""
+        """Get initial state based on seed (cached: a save has a few thousand keys, the same in every save)."""
         pop_count = bin(state).count('1')
         for _ in range(pop_count):
             state = SCXorShift32._xorshift_advance(state)
@@ -31,6 +36,32 @@ class SCXorShift32:
         """Gets a 32-bit integer from the current state."""
         return self.next() | (self.next() << 8) | (self.next() << 16) | (self.next() << 24)
 
+    def crypt(self, data: bytes | bytearray | memoryview) -> bytes:
+        """Xors data with the next len(data) crypto bytes, as calling next() for every byte would."""
+        length = len(data)
+        if length == 0:
+            return b""
+        state, counter = self.state, self.counter
+        stream = bytearray(state.to_bytes(4, "little")[counter:counter + length])
+        counter += len(stream)
+        if counter == 4:
+            state, counter = self._xorshift_advance(state), 0
+
+        # Whole states at once, then what is left of the last one.
+        words = []
+        for _ in range((length - len(stream)) // 4):
+            words.append(state)
+            state ^= (state << 2) & 0xFFFFFFFF
+            state ^= state >> 15
+            state ^= (state << 13) & 0xFFFFFFFF
+        stream += struct.pack(f"<{len(words)}I", *words)
+        if len(stream) < length:
+            counter = length - len(stream)
+            stream += state.to_bytes(4, "little")[:counter]
+
+        self.state, self.counter = state, counter
+        return (int.from_bytes(data, "little") ^ int.from_bytes(stream, "little")).to_bytes(length, "little")
+
     @staticmethod
     def _xorshift_advance(state: int) -> int:
         """Advance the xorshift state."""
@@ -1,6 +1,7 @@
 
 import hashlib
-from typing import List
+from enum import Enum
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from .scblock import SCBlock
 
@@ -35,9 +36,17 @@ class SwishCrypto:
         0xA4, 0x48, 0xB3, 0x50, 0x9E, 0x14, 0xA0, 0x52, 0xDE, 0x7E, 0x10, 0x2B, 0x1B, 0x77, 0x6E, 0,  # aligned to 0x80
     ])
 
+    # The xorpad repeats every 127 bytes (its last byte is 0, it only pads the overlap between two passes).
+    XORPAD_PERIOD = len(STATIC_XORPAD) - 1
+
+    # Longest encoded block header after the key: type, array entry count and array sub-type.
+    MAX_HEADER_LENGTH = 1 + 4 + 1
+
     BLOCK_DATA_RATIO_ESTIMATE1 = 777  # bytes per block, on average (generous)
     BLOCK_DATA_RATIO_ESTIMATE2 = 555  # bytes per block, on average (stingy)
 
+    PROGRESS_INTERVAL = 256  # blocks between two progress reports
+
     @staticmethod
     def crypt_static_xorpad_bytes(data: bytearray) -> None:
         """Apply the static xorpad to the data in-place."""
@@ -57,7 +66,56 @@ class SwishCrypto:
             data[offset + i] ^= xp[i]
 
     @staticmethod
-    def compute_hash(data: bytes) -> bytes:
+    def crypt_static_xorpad_range(data: bytes | memoryview, offset: int) -> bytes:
+        """
+        Apply the static xorpad to a slice of the payload that starts at offset, returning a copy.
+        Since the xorpad only depends on the position, any range can be decrypted on its own.
+        """
+        period = SwishCrypto.XORPAD_PERIOD
+        start = offset % period
+        repeats = (start + len(data)) // period + 1
+        pad = (SwishCrypto.STATIC_XORPAD[:period] * repeats)[start:start + len(data)]
+        return (int.from_bytes(data, 'little') ^ int.from_bytes(pad, 'little')).to_bytes(len(data), 'little')
+
+    @staticmethod
+    def iter_block_spans(data: bytes | memoryview) -> Iterator[Tuple[int, int, int]]:
+        """
+        Yields the (key, offset, length) of every block of an encrypted save, in file order,
+        by decrypting only the few header bytes needed to find where the next block starts.
+        """
+        end = len(data) - SwishCrypto.SIZE_HASH
+        offset = 0
+        while offset < end:
+            header_end = min(offset + 4 + SwishCrypto.MAX_HEADER_LENGTH, end)
+            header = SwishCrypto.crypt_static_xorpad_range(data[offset:header_end], offset)
+            if len(header) < 5:
+                raise ValueError("Insufficient data for block header")
+            key = int.from_bytes(header[:4], 'little')
+            length = 4 + SCBlock.get_total_length(header[4:], key)
+            if offset + length > end:
+                raise ValueError(f"Block 0x{key:08X} runs past the end of the data")
+            yield key, offset, length
+            offset += length
+
+    @staticmethod
+    def decrypt_blocks(data: bytes | memoryview, keys: Iterable[int | Enum]) -> Dict[int, SCBlock]:
+        """
+        Decrypts only the blocks with the given keys, skipping over the others.
+
+        Keys that are not in the save are missing from the result.
+        """
+        wanted = {key.value if isinstance(key, Enum) else key for key in keys}
+        result = {}
+        for key, offset, length in SwishCrypto.iter_block_spans(data):
+            if key in wanted:
+                encoded = SwishCrypto.crypt_static_xorpad_range(data[offset:offset + length], offset)
+                result[key] = SCBlock.read_from_offset(encoded, 0)[0]
+                if len(result) == len(wanted):
+                    break
+        return result
+
+    @staticmethod
+    def compute_hash(data: bytes | memoryview) -> bytes:
         """Compute the SHA256 hash with intro and outro bytes."""
         sha = hashlib.sha256()
         sha.update(SwishCrypto.INTRO_HASH_BYTES)
@@ -66,8 +124,8 @@ class SwishCrypto:
         return sha.digest()
 
     @staticmethod
-    def get_is_hash_valid(data: bytes) -> bool:
-        """Check if the file hash is valid."""
+    def get_is_hash_valid(data: bytes | memoryview) -> bool:
+        """Check if the file hash is valid (a memoryview is hashed without being copied)."""
         if len(data) < SwishCrypto.SIZE_HASH:
             return False
 
@@ -76,19 +134,20 @@ class SwishCrypto:
         return computed == stored
 
     @staticmethod
-    def decrypt(data: bytes) -> List[SCBlock]:
+    def decrypt(data: bytes, progress: Optional[Callable[[float], None]] = None) -> List[SCBlock]:
         """
         Decrypts the save data, then unpacks the blocks.
 
         Hash is assumed to be valid before calling this method.
+        If given, progress is called with the fraction of the payload read so far.
         """
         data_ba = bytearray(data)
         payload = data_ba[:-SwishCrypto.SIZE_HASH]
         SwishCrypto.crypt_static_xorpad_bytes(payload)
-        return SwishCrypto.read_blocks(bytes(payload))
+        return SwishCrypto.read_blocks(bytes(payload), progress)
 
     @staticmethod
-    def read_blocks(data: bytes) -> List[SCBlock]:
+    def read_blocks(data: bytes, progress: Optional[Callable[[float], None]] = None) -> List[SCBlock]:
         """Read blocks from decrypted data."""
         result = []
         offset = 0
@@ -96,13 +155,19 @@ class SwishCrypto:
         while offset < len(data):
             block, offset = SCBlock.read_from_offset(data, offset)
             result.append(block)
+            if progress is not None and len(result) % SwishCrypto.PROGRESS_INTERVAL == 0:
+                progress(offset / len(data))
 
         return result
 
     @staticmethod
-    def encrypt(blocks: List[SCBlock]) -> bytes:
-        """Encrypt the save data from blocks."""
-        result = SwishCrypto.get_decrypted_raw_data(blocks)
+    def encrypt(blocks: List[SCBlock], progress: Optional[Callable[[float], None]] = None) -> bytes:
+        """
+        Encrypt the save data from blocks.
+
+        If given, progress is called with the fraction of the blocks written so far.
+        """
+        result = SwishCrypto.get_decrypted_raw_data(blocks, progress)
         result_ba = bytearray(result)
         payload = result_ba[:-SwishCrypto.SIZE_HASH]
         SwishCrypto.crypt_static_xorpad_bytes(payload)
@@ -114,11 +179,13 @@ class SwishCrypto:
         return bytes(result_ba)
 
     @staticmethod
-    def get_decrypted_raw_data(blocks: List[SCBlock]) -> bytes:
+    def get_decrypted_raw_data(blocks: List[SCBlock], progress: Optional[Callable[[float], None]] = None) -> bytes:
         """Get raw save data without the final xorpad layer."""
         result = bytearray()
-        for block in blocks:
+        for i, block in enumerate(blocks, 1):
             result.extend(block.write_block())
+            if progress is not None and i % SwishCrypto.PROGRESS_INTERVAL == 0:
+                progress(i / len(blocks))
 
         # Add space for hash
         result.extend(b'\x00' * SwishCrypto.SIZE_HASH)
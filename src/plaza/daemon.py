@@ -0,0 +1,209 @@
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional
+
+from .batch import apply_operations, init_worker
+from .savefile import SaveFile
+
+logger = logging.getLogger(__name__)
+
+WorkItem = tuple[str, bytes]    # (path, SHA-256 of the content)
+
+
+def normalize_file(path: str, output: str) -> dict[str, Any]:
+    """
+    Verifies a save, repairs its bag and re-signs it, writing the result atomically to output.
+
+    Never raises: failures are reported in the "error" field of the result.
+    """
+    start = time.perf_counter()
+    result: dict[str, Any] = {"path": path, "ok": False, "hash_valid": None, "changes": 0, "output": None,
+                              "error": None}
+    try:
+        save_file = SaveFile.load(path)
+        result["hash_valid"] = save_file.is_hash_valid()
+        result["changes"] = apply_operations(save_file, [("repair",)])
+        save_file.write(output, atomic=True)
+        result["output"] = output
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+class WatchDaemon:
+    """
+    Polls a directory and normalizes every new or changed save dropped into it.
+
+    Only plain os.scandir polling is used, so no inotify bindings are needed. A file is picked up
+    once its size and mtime are the same on two consecutive polls (so files still being copied are
+    left alone), and a file whose current content was already normalized under the same name is
+    skipped. Only successes are remembered, in a bounded LRU, so a failed file is tried again when
+    it is dropped again. The scanner feeds a bounded queue: when the workers fall behind, the
+    scanner blocks instead of piling up work.
+    """
+
+    TEMP_SUFFIX = ".tmp"
+
+    def __init__(self, directory: str, workers: Optional[int] = None, queue_size: int = 16,
+                 interval: float = 2.0, suffix: str = ".normalized", stats_interval: float = 30.0,
+                 max_done: int = 4096):
+        self.directory = directory
+        self.workers = workers or os.cpu_count() or 1
+        self.interval = interval
+        self.suffix = suffix
+        self.stats_interval = stats_interval
+
+        self.queue: "queue.Queue[Optional[WorkItem]]" = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.signatures: dict[str, tuple[int, int]] = {}   # signature of the last version handled
+        self.candidates: dict[str, tuple[int, int]] = {}   # signature seen on the previous poll
+        # (path, content digest) of the files normalized successfully, least recently used first.
+        self.done: OrderedDict[WorkItem, None] = OrderedDict()
+        self.max_done = max_done
+        self.in_flight: set[WorkItem] = set()
+
+        self.lock = threading.Lock()
+        self.stats = {"queued": 0, "processed": 0, "failed": 0, "duplicates": 0}
+        self.started = time.perf_counter()
+
+    def is_ignored(self, name: str) -> bool:
+        """Outputs and temporary files written by the daemon itself are not inputs."""
+        return name.startswith(".") or name.endswith(self.suffix) or name.endswith(self.TEMP_SUFFIX)
+
+    def scan(self) -> list[str]:
+        """Gets the files that are new or changed since they were handled, and stable since the last poll."""
+        ready = []
+        seen = set()
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.is_file() or self.is_ignored(entry.name):
+                    continue
+                stat = entry.stat()
+                signature = (stat.st_mtime_ns, stat.st_size)
+                seen.add(entry.path)
+                if self.signatures.get(entry.path) == signature:
+                    continue
+                if self.candidates.get(entry.path) == signature:
+                    del self.candidates[entry.path]
+                    self.signatures[entry.path] = signature
+                    ready.append(entry.path)
+                else:
+                    self.candidates[entry.path] = signature
+
+        # Forget deleted files, so a file dropped again under the same name is handled.
+        for path in list(self.signatures):
+            if path not in seen:
+                del self.signatures[path]
+        for path in list(self.candidates):
+            if path not in seen:
+                del self.candidates[path]
+        return sorted(ready)
+
+    def enqueue(self, path: str) -> None:
+        """Skips a file already normalized with this content, otherwise waits for room in the queue."""
+        try:
+            with open(path, "rb") as f:
+                digest = hashlib.sha256(f.read()).digest()
+        except OSError as e:
+            logger.warning("Cannot read %s: %s", path, e)
+            return
+
+        item = (path, digest)
+        with self.lock:
+            if item in self.done or item in self.in_flight:
+                if item in self.done:
+                    self.done.move_to_end(item)
+                self.stats["duplicates"] += 1
+                logger.info("Skipping %s: already processed", path)
+                return
+            self.in_flight.add(item)
+
+        # Backpressure: block the scanner while the queue is full, but keep honoring stop().
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.5)
+            except queue.Full:
+                continue
+            with self.lock:
+                self.stats["queued"] += 1
+            return
+        with self.lock:
+            self.in_flight.discard(item)
+
+    def finish(self, item: WorkItem, ok: bool) -> None:
+        """Remembers a file normalized successfully (a failed one is tried again when dropped again)."""
+        with self.lock:
+            self.in_flight.discard(item)
+            self.stats["processed" if ok else "failed"] += 1
+            if ok:
+                self.done[item] = None
+                self.done.move_to_end(item)
+                while len(self.done) > self.max_done:
+                    self.done.popitem(last=False)
+
+    def work(self, pool: ProcessPoolExecutor) -> None:
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                path = item[0]
+                try:
+                    result = pool.submit(normalize_file, path, path + self.suffix).result()
+                except Exception as e:  # e.g. a worker process died
+                    result = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                self.finish(item, result["ok"])
+                if result["ok"]:
+                    logger.info("Normalized %s -> %s (hash %s, %d changes, %.0f ms)", path, result["output"],
+                                "valid" if result["hash_valid"] else "INVALID", result["changes"],
+                                result["seconds"] * 1000)
+                else:
+                    logger.error("Failed to normalize %s: %s", path, result["error"])
+            finally:
+                self.queue.task_done()
+
+    def log_stats(self) -> None:
+        elapsed = time.perf_counter() - self.started
+        with self.lock:
+            stats = dict(self.stats)
+        logger.info("processed=%d failed=%d duplicates=%d queue=%d/%d throughput=%.2f files/s",
+                    stats["processed"], stats["failed"], stats["duplicates"], self.queue.qsize(),
+                    self.queue.maxsize, (stats["processed"] + stats["failed"]) / elapsed if elapsed else 0.0)
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def run(self, once: bool = False) -> None:
+        """Polls until stop() is called (or, with once, processes what is there and returns)."""
+        logger.info("Watching %s with %d workers", self.directory, self.workers)
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker) as pool:
+            threads = [threading.Thread(target=self.work, args=(pool,), name=f"plaza-watch-{i}", daemon=True)
+                       for i in range(self.workers)]
+            for thread in threads:
+                thread.start()
+
+            next_stats = time.monotonic() + self.stats_interval
+            try:
+                while not self.stop_event.is_set():
+                    for path in self.scan():
+                        self.enqueue(path)
+                    if once and not self.candidates:
+                        break
+                    if time.monotonic() >= next_stats:
+                        self.log_stats()
+                        next_stats += self.stats_interval
+                    self.stop_event.wait(self.interval)
+            finally:
+                for _ in threads:
+                    self.queue.put(None)
+                for thread in threads:
+                    thread.join()
+                self.log_stats()
@@ -0,0 +1,273 @@
+"""
+Block-level comparison of two saves.
+
+Blocks are aligned by key. Their encrypted spans are fingerprinted first (see plaza.watcher), so
+blocks that are byte-identical in both files are skipped without being decrypted; only the others
+are decoded and compared. Changed blocks are described by type: the old and new value of scalars,
+the changed elements of arrays, the changed entries of the bag and fields of the known structures,
+and the changed byte ranges of any other object.
+"""
+
+import json
+from enum import Enum
+from typing import Any, Optional
+
+from .crypto import SCBlock, SwishCrypto
+from .crypto.sctypecode import SCTypeCode
+from .crypto.scxorshift import SCXorShift32
+from .inplace import diff_ranges
+from .types import BagEntry, BagReleaseCategory, BagSave, CoreData, HashDBKeys, PokedexCoreData, PokedexData
+from .watcher import fingerprint_spans
+
+KEY_NAMES = {key.value: key.name for key in HashDBKeys if key.value >= 0}
+OBJECT_HEADER_SIZE = 4 + 1 + 4     # key, type, payload length
+MAX_CHANGES = 200   # changes listed per block; the count is always complete
+
+
+def to_json_value(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    if isinstance(value, list):
+        return [to_json_value(item) for item in value]
+    if hasattr(value, "__dict__"):
+        return {field: to_json_value(item) for field, item in vars(value).items()}
+    return value
+
+
+def diff_fields(old: Any, new: Any) -> list[dict[str, Any]]:
+    """Compares the attributes of two parsed structures."""
+    changes = []
+    for field, old_value in vars(old).items():
+        old_value, new_value = to_json_value(old_value), to_json_value(getattr(new, field, None))
+        if old_value != new_value:
+            changes.append({"field": field, "old": old_value, "new": new_value})
+    return changes
+
+
+def diff_records(old: bytes, new: bytes, size: int, count: int, parse, label: str, limit: int) -> dict[str, Any]:
+    """Compares the fixed-size records of a structure; only the records whose bytes differ are parsed."""
+    changes = []
+    changed = 0
+    for index in range(count):
+        start = index * size
+        if old[start:start + size] == new[start:start + size]:
+            continue
+        fields = diff_fields(parse(old[start:start + size]), parse(new[start:start + size]))
+        if fields:
+            changed += 1
+            if len(changes) < limit:
+                changes.append({label: index, "fields": fields})
+    return {"entries": changes, "count": changed}
+
+
+def diff_bag(old: bytes, new: bytes, limit: int) -> dict[str, Any]:
+    result = diff_records(old, new, 16, BagSave.ENTRY_CAPACITY, BagEntry.from_bytes, "item", limit)
+    release_start = BagSave.ENTRY_CAPACITY * 16
+    old_release = BagReleaseCategory.from_bytes(old[release_start:release_start + 4])
+    new_release = BagReleaseCategory.from_bytes(new[release_start:release_start + 4])
+    if old_release.flags != new_release.flags:
+        result["release_category"] = {"old": old_release.flags, "new": new_release.flags}
+    return result
+
+
+def diff_pokedex(old: bytes, new: bytes, limit: int) -> dict[str, Any]:
+    return diff_records(old, new, PokedexCoreData.SIZE, PokedexData.DEV_NO_MAX, PokedexCoreData.from_bytes,
+                        "dev_no", limit)
+
+
+def diff_core(old: bytes, new: bytes, limit: int) -> dict[str, Any]:
+    fields = diff_fields(CoreData.from_bytes(old), CoreData.from_bytes(new))
+    return {"fields": fields[:limit], "count": len(fields)}
+
+
+# Structures diffed field by field, by block key.
+STRUCTURE_DIFFS = {
+    HashDBKeys.BagSave.value: (BagSave.TOTAL_SIZE, diff_bag),
+    HashDBKeys.CoreData.value: (CoreData.SIZE, diff_core),
+    HashDBKeys.PokeDex.value: (PokedexData.SIZE, diff_pokedex),
+}
+
+
+def diff_array(old: SCBlock, new: SCBlock, limit: int) -> dict[str, Any]:
+    size = old.sub_type.get_type_size()
+    old_count, new_count = len(old.raw) // size, len(new.raw) // size
+    changes = []
+    count = 0
+    # Equal-sized arrays are compared by ranges first, so only the changed elements are decoded.
+    if len(old.raw) == len(new.raw):
+        indices = (index for start, data in diff_ranges(bytes(old.raw), bytes(new.raw))
+                   for index in range(start // size, (start + len(data) - 1) // size + 1))
+    else:
+        indices = (index for index in range(min(old_count, new_count))
+                   if old.raw[index * size:index * size + size] != new.raw[index * size:index * size + size])
+    for index in indices:
+        old_value = old.sub_type.get_value(bytes(old.raw[index * size:index * size + size]))
+        new_value = new.sub_type.get_value(bytes(new.raw[index * size:index * size + size]))
+        if old_value == new_value:
+            continue    # a range can cover unchanged neighbours
+        count += 1
+        if len(changes) < limit:
+            changes.append({"index": index, "old": old_value, "new": new_value})
+    result: dict[str, Any] = {"elements": changes, "count": count}
+    if old_count != new_count:
+        result["old_length"], result["new_length"] = old_count, new_count
+    return result
+
+
+def diff_block(old: SCBlock, new: SCBlock, limit: int = MAX_CHANGES) -> dict[str, Any]:
+    """Describes how a block changed, according to its type."""
+    result: dict[str, Any] = {"key": f"0x{old.key:08X}", "name": KEY_NAMES.get(old.key), "status": "changed",
+                              "type": new.type.name}
+    if old.type != new.type or old.sub_type != new.sub_type:
+        result["old_type"] = old.type.name
+        if old.sub_type != new.sub_type:
+            result["old_sub_type"], result["sub_type"] = old.sub_type.name, new.sub_type.name
+        if old.type.is_boolean() and new.type.is_boolean():
+            result["old"], result["new"] = old.type == SCTypeCode.BOOL2, new.type == SCTypeCode.BOOL2
+        return result
+
+    structure = STRUCTURE_DIFFS.get(old.key)
+    if structure and len(old.raw) == len(new.raw) == structure[0]:
+        result.update(structure[1](bytes(old.raw), bytes(new.raw), limit))
+    elif new.has_value() and len(old.raw) == len(new.raw):
+        result["old"], result["new"] = old.get_value(), new.get_value()
+    elif new.type == SCTypeCode.ARRAY and new.sub_type.value > SCTypeCode.ARRAY.value:
+        result["sub_type"] = new.sub_type.name
+        result.update(diff_array(old, new, limit))
+    elif len(old.raw) == len(new.raw):
+        ranges = diff_ranges(bytes(old.raw), bytes(new.raw))
+        result["ranges"] = [{"offset": start, "length": len(data)} for start, data in ranges[:limit]]
+        result["count"] = len(ranges)
+    else:
+        result["old_size"], result["new_size"] = len(old.raw), len(new.raw)
+    return result
+
+
+def describe_block(block: SCBlock, status: str) -> dict[str, Any]:
+    result: dict[str, Any] = {"key": f"0x{block.key:08X}", "name": KEY_NAMES.get(block.key), "status": status,
+                              "type": block.type.name, "size": len(block.raw)}
+    if block.has_value():
+        result["value"] = block.get_value()
+    elif block.type in (SCTypeCode.BOOL1, SCTypeCode.BOOL2):
+        result["value"] = block.type == SCTypeCode.BOOL2
+    return result
+
+
+def decode_span(data: memoryview, offset: int, length: int) -> SCBlock:
+    return SCBlock.read_from_offset(SwishCrypto.crypt_static_xorpad_range(data[offset:offset + length], offset), 0)[0]
+
+
+def diff_encoded_object(key: int, old: bytes, new: bytes, limit: int) -> Optional[dict[str, Any]]:
+    """
+    Compares two versions of an unstructured OBJECT block without decrypting them: both payloads are
+    xored with the same keystream (it only depends on the key), so they differ exactly where the data
+    does. Returns None if the blocks are not same-sized objects (they must be decoded instead).
+    """
+    header = OBJECT_HEADER_SIZE
+    if (key in STRUCTURE_DIFFS or len(old) != len(new) or len(old) < header or old[:header] != new[:header]
+            or old[4] ^ SCXorShift32(key).next() != SCTypeCode.OBJECT.value):
+        return None
+    ranges = diff_ranges(old[header:], new[header:])
+    return {"key": f"0x{key:08X}", "name": KEY_NAMES.get(key), "status": "changed", "type": SCTypeCode.OBJECT.name,
+            "ranges": [{"offset": start, "length": len(data)} for start, data in ranges[:limit]],
+            "count": len(ranges)}
+
+
+def diff_saves(old: bytes, new: bytes, limit: int = MAX_CHANGES) -> dict[str, Any]:
+    """
+    Compares two encrypted saves block by block; returns the counts of identical, changed, added and
+    removed blocks and the description of every block that is not identical, in the order of new.
+    """
+    old_view, new_view = memoryview(old), memoryview(new)
+    old_spans, new_spans = fingerprint_spans(old_view), fingerprint_spans(new_view)
+    blocks = []
+    identical = 0
+    for key, (offset, length, fingerprint) in new_spans.items():
+        old_span = old_spans.get(key)
+        if old_span is None:
+            blocks.append(describe_block(decode_span(new_view, offset, length), "added"))
+            continue
+        if old_span[2] == fingerprint:
+            identical += 1
+            continue
+        old_encoded = SwishCrypto.crypt_static_xorpad_range(old_view[old_span[0]:old_span[0] + old_span[1]], old_span[0])
+        new_encoded = SwishCrypto.crypt_static_xorpad_range(new_view[offset:offset + length], offset)
+        if old_encoded == new_encoded:
+            identical += 1      # same block at another position
+            continue
+        described = diff_encoded_object(key, old_encoded, new_encoded, limit)
+        if described is not None:
+            blocks.append(described)
+            continue
+        old_block, new_block = SCBlock.read_from_offset(old_encoded, 0)[0], SCBlock.read_from_offset(new_encoded, 0)[0]
+        blocks.append(diff_block(old_block, new_block, limit))
+    for key, (offset, length, _) in old_spans.items():
+        if key not in new_spans:
+            blocks.append(describe_block(decode_span(old_view, offset, length), "removed"))
+
+    return {
+        "identical": identical,
+        "changed": sum(block["status"] == "changed" for block in blocks),
+        "added": sum(block["status"] == "added" for block in blocks),
+        "removed": sum(block["status"] == "removed" for block in blocks),
+        "blocks": blocks,
+    }
+
+
+def diff_files(old_path: str, new_path: str, limit: int = MAX_CHANGES) -> dict[str, Any]:
+    with open(old_path, "rb") as f:
+        old = f.read()
+    with open(new_path, "rb") as f:
+        new = f.read()
+    return diff_saves(old, new, limit)
+
+
+def format_change(change: dict[str, Any]) -> str:
+    return f"{change['old']!r} -> {change['new']!r}"
+
+
+def format_diff(diff: dict[str, Any]) -> str:
+    """Formats the result of diff_saves as readable text."""
+    lines = []
+    for block in diff["blocks"]:
+        title = f"{block['key']}" + (f" ({block['name']})" if block["name"] else "")
+        if block["status"] != "changed":
+            value = f" = {block['value']!r}" if "value" in block else ""
+            lines.append(f"{'+' if block['status'] == 'added' else '-'} {title} {block['type']} "
+                         f"[{block['size']} bytes]{value}")
+            continue
+
+        lines.append(f"~ {title} {block['type']}")
+        if "old_type" in block:
+            lines.append(f"    type {block['old_type']} -> {block['type']}")
+        if "old" in block:
+            lines.append(f"    {format_change(block)}")
+        for entry in block.get("entries", []):
+            label = f"item {entry['item']}" if "item" in entry else f"dev_no {entry['dev_no']}"
+            fields = ", ".join(f"{field['field']}: {format_change(field)}" for field in entry["fields"])
+            lines.append(f"    {label}: {fields}")
+        for field in block.get("fields", []):
+            lines.append(f"    {field['field']}: {format_change(field)}")
+        for element in block.get("elements", []):
+            lines.append(f"    [{element['index']}] {format_change(element)}")
+        for byte_range in block.get("ranges", []):
+            lines.append(f"    bytes {byte_range['offset']}..{byte_range['offset'] + byte_range['length'] - 1}")
+        if "release_category" in block:
+            lines.append(f"    release_category: {format_change(block['release_category'])}")
+        if "old_length" in block:
+            lines.append(f"    length {block['old_length']} -> {block['new_length']}")
+        if "old_size" in block:
+            lines.append(f"    size {block['old_size']} -> {block['new_size']} bytes")
+        listed = len(block.get("entries", block.get("fields", block.get("elements", block.get("ranges", [])))))
+        if block.get("count", 0) > listed:
+            lines.append(f"    ... {block['count'] - listed} more")
+
+    lines.append(f"{diff['identical']} identical, {diff['changed']} changed, {diff['added']} added, "
+                 f"{diff['removed']} removed")
+    return "\n".join(lines)
+
+
+def to_json(diff: dict[str, Any], indent: Optional[int] = None) -> str:
+    return json.dumps(diff, indent=indent, ensure_ascii=False)
@@ -0,0 +1,196 @@
+"""
+Undo/redo for the blocks of a save, recorded as byte deltas.
+
+Every write to a block goes through BlockHistory.write, which records only the byte ranges that
+actually changed, as (key, offset, old bytes, new bytes). Writes are grouped into transactions
+(one user action); undoing or redoing a transaction costs only its changed bytes, whatever the
+size of the blocks. The history is capped by the bytes it holds, not by a number of steps.
+"""
+
+from contextlib import contextmanager
+from enum import Enum
+from typing import Callable, Iterator, Optional
+
+from .crypto import HashDB
+from .inplace import MERGE_GAP, diff_ranges
+
+
+class BlockDelta:
+    __slots__ = ("key", "offset", "old", "new")
+
+    def __init__(self, key: int, offset: int, old: bytes, new: bytes):
+        self.key = key
+        self.offset = offset
+        self.old = old
+        self.new = new
+
+    @property
+    def end(self) -> int:
+        return self.offset + len(self.new)
+
+    @property
+    def size(self) -> int:
+        return len(self.old) + len(self.new)
+
+    def __repr__(self) -> str:
+        return f"BlockDelta(key=0x{self.key:08X}, offset={self.offset}, length={len(self.new)})"
+
+
+class Transaction:
+    """The deltas of one user action, in the order they were applied."""
+
+    def __init__(self, label: Optional[str] = None):
+        self.label = label
+        self.deltas: list[BlockDelta] = []
+        self.size = 0
+
+    def get_keys(self) -> set[int]:
+        return {delta.key for delta in self.deltas}
+
+
+class BlockHistory:
+    def __init__(self, hash_db: HashDB, max_bytes: int = 4 * 1024 * 1024):
+        self.hash_db = hash_db
+        self.max_bytes = max_bytes
+        self.undo_stack: list[Transaction] = []
+        self.redo_stack: list[Transaction] = []
+        self.current: Optional[Transaction] = None
+        self.size = 0
+        self.listeners: list[Callable[[int, int, bytes], None]] = []
+
+    def add_listener(self, listener: Callable[[int, int, bytes], None]) -> None:
+        """Registers a callback invoked with (key, offset, new bytes) for every change made to a block."""
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[int, int, bytes], None]) -> None:
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def notify_changed(self, key: int, offset: int, data: bytes) -> None:
+        for listener in self.listeners:
+            listener(key, offset, data)
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self.undo_stack) or bool(self.current and self.current.deltas)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self.redo_stack)
+
+    def begin(self, label: Optional[str] = None) -> Transaction:
+        """Opens a transaction (writes outside of one open it implicitly); returns the open one."""
+        if self.current is None:
+            self.current = Transaction(label)
+        elif label and not self.current.label:
+            self.current.label = label
+        return self.current
+
+    def commit(self) -> Optional[Transaction]:
+        """Closes the open transaction; returns it, or None if nothing changed."""
+        transaction, self.current = self.current, None
+        if transaction is None or not transaction.deltas:
+            return None
+        self.undo_stack.append(transaction)
+        self.size += transaction.size
+        # New changes make the undone ones unreachable.
+        self.size -= sum(undone.size for undone in self.redo_stack)
+        self.redo_stack.clear()
+        self.trim()
+        return transaction
+
+    @contextmanager
+    def transaction(self, label: Optional[str] = None) -> Iterator[Transaction]:
+        transaction = self.begin(label)
+        try:
+            yield transaction
+        finally:
+            self.commit()
+
+    def trim(self) -> None:
+        """Forgets the oldest transactions while the history is over max_bytes (keeping the newest one)."""
+        while self.size > self.max_bytes and len(self.undo_stack) > 1:
+            self.size -= self.undo_stack.pop(0).size
+
+    def write(self, key: int | Enum, offset: int, data: bytes) -> int:
+        """
+        Writes data into a block at offset (the block keeps its size), recording the changed ranges
+        in the open transaction; returns the number of bytes that changed.
+        """
+        block = self.hash_db[key]
+        end = offset + len(data)
+        if offset < 0 or end > len(block.raw):
+            raise ValueError(f"Cannot write {len(data)} bytes at {offset} into a block of {len(block.raw)} bytes")
+        old = bytes(block.raw[offset:end])
+        ranges = diff_ranges(old, bytes(data))
+        if not ranges:
+            return 0
+
+        transaction = self.begin()
+        changed = 0
+        for start, new in ranges:
+            start_in_block = offset + start
+            delta = BlockDelta(block.key, start_in_block, old[start:start + len(new)], new)
+            block.raw[start_in_block:start_in_block + len(new)] = new
+            self.add_delta(transaction, delta)
+            self.notify_changed(block.key, start_in_block, new)
+            changed += len(new)
+        return changed
+
+    def change_data(self, key: int | Enum, data: bytes) -> int:
+        """Replaces the whole data of a block (same size), like SCBlock.change_data, recording the changes."""
+        if len(data) != len(self.hash_db[key].raw):
+            raise ValueError(f"Cannot change the size of a block from {len(self.hash_db[key].raw)} to {len(data)}")
+        return self.write(key, 0, data)
+
+    def add_delta(self, transaction: Transaction, delta: BlockDelta) -> None:
+        """Appends a delta, merging it with the previous one when they touch the same bytes or are close."""
+        last = transaction.deltas[-1] if transaction.deltas else None
+        if (last is None or last.key != delta.key or delta.offset > last.end + MERGE_GAP
+                or last.offset > delta.end + MERGE_GAP):
+            transaction.deltas.append(delta)
+            transaction.size += delta.size
+            return
+
+        # The merged delta covers both ranges: its new bytes are the block as it is now, and its old
+        # bytes are the block with both deltas taken back, newest first.
+        raw = self.hash_db[delta.key].raw
+        start, end = min(last.offset, delta.offset), max(last.end, delta.end)
+        old = bytearray(raw[start:end])
+        old[delta.offset - start:delta.end - start] = delta.old
+        old[last.offset - start:last.end - start] = last.old
+        merged = BlockDelta(delta.key, start, bytes(old), bytes(raw[start:end]))
+        transaction.deltas[-1] = merged
+        transaction.size += merged.size - last.size
+
+    def undo(self) -> Optional[Transaction]:
+        """Takes back the last transaction (committing the open one first); returns it, or None."""
+        self.commit()
+        if not self.undo_stack:
+            return None
+        transaction = self.undo_stack.pop()
+        for delta in reversed(transaction.deltas):
+            self.hash_db[delta.key].raw[delta.offset:delta.end] = delta.old
+            self.notify_changed(delta.key, delta.offset, delta.old)
+        self.redo_stack.append(transaction)
+        return transaction
+
+    def redo(self) -> Optional[Transaction]:
+        """Applies the last undone transaction again; returns it, or None."""
+        if self.current is not None and self.current.deltas:
+            # Changes were made since the undo: there is nothing left to redo.
+            return None
+        if not self.redo_stack:
+            return None
+        transaction = self.redo_stack.pop()
+        for delta in transaction.deltas:
+            self.hash_db[delta.key].raw[delta.offset:delta.end] = delta.new
+            self.notify_changed(delta.key, delta.offset, delta.new)
+        self.undo_stack.append(transaction)
+        return transaction
+
+    def clear(self) -> None:
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.current = None
+        self.size = 0
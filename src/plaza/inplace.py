@@ -0,0 +1,194 @@
+"""
+In-place save writes: when no block changed size, only the encrypted bytes that changed and the
+SHA-256 trailer are written back into the existing file.
+
+Crash safety comes from a small write-ahead record (<save>.wal) holding the new bytes of every
+range, with the old and new SHA-256 trailers of the save. It is made durable before the save is
+touched and removed once the save is synced, so after a crash the save is either untouched (no valid
+record) or can be completed by replaying the record. The trailer is written last, once the other
+ranges are durable: a save ending with the new trailer is complete, and one ending with neither
+trailer was rewritten by someone else since, so the record no longer applies to it.
+"""
+
+import hashlib
+import os
+import struct
+from typing import NamedTuple, Optional
+
+from .crypto import SwishCrypto
+
+WAL_SUFFIX = ".wal"
+WAL_MAGIC = b"PLZAWAL2"
+WAL_HEADER = struct.Struct("<8sQ32s32sI")   # magic, file size, old trailer, new trailer, number of ranges
+WAL_RANGE = struct.Struct("<QI")        # offset, length (followed by the bytes)
+
+CHUNK_SIZE = 512        # granularity of the first, coarse comparison
+MERGE_GAP = 64          # ranges closer than this are written as one
+
+Range = tuple[int, bytes]   # (offset, new bytes)
+
+
+class WalRecord(NamedTuple):
+    size: int
+    old_trailer: bytes
+    new_trailer: bytes
+    ranges: list[Range]
+
+
+def diff_ranges(old: bytes, new: bytes) -> list[Range]:
+    """Gets the byte ranges of new that differ from old (both must have the same length)."""
+    if len(old) != len(new):
+        raise ValueError("In-place diff needs buffers of the same size")
+    spans: list[list[int]] = []
+    for chunk_start in range(0, len(new), CHUNK_SIZE):
+        chunk_end = min(chunk_start + CHUNK_SIZE, len(new))
+        if old[chunk_start:chunk_end] == new[chunk_start:chunk_end]:
+            continue
+        start = chunk_start
+        while old[start] == new[start]:
+            start += 1
+        end = chunk_end
+        while old[end - 1] == new[end - 1]:
+            end -= 1
+        if spans and start - spans[-1][1] <= MERGE_GAP:
+            spans[-1][1] = end
+        else:
+            spans.append([start, end])
+    return [(start, new[start:end]) for start, end in spans]
+
+
+def get_wal_path(path: str) -> str:
+    return path + WAL_SUFFIX
+
+
+def encode_wal(record: WalRecord) -> bytes:
+    body = bytearray(WAL_HEADER.pack(WAL_MAGIC, record.size, record.old_trailer, record.new_trailer,
+                                     len(record.ranges)))
+    for offset, data in record.ranges:
+        body += WAL_RANGE.pack(offset, len(data))
+        body += data
+    return bytes(body) + hashlib.sha256(body).digest()
+
+
+def decode_wal(record: bytes) -> Optional[WalRecord]:
+    """Decodes a write-ahead record; None if it is incomplete or corrupted (it was never committed)."""
+    if len(record) < WAL_HEADER.size + 32:
+        return None
+    body, checksum = record[:-32], record[-32:]
+    if hashlib.sha256(body).digest() != checksum:
+        return None
+    magic, size, old_trailer, new_trailer, count = WAL_HEADER.unpack_from(body, 0)
+    if magic != WAL_MAGIC:
+        return None
+    ranges = []
+    offset = WAL_HEADER.size
+    for _ in range(count):
+        start, length = WAL_RANGE.unpack_from(body, offset)
+        offset += WAL_RANGE.size
+        ranges.append((start, body[offset:offset + length]))
+        offset += length
+    return WalRecord(size, old_trailer, new_trailer, ranges)
+
+
+def _fsync_directory(path: str) -> None:
+    # Makes the creation or removal of a file durable; not possible (nor needed) on Windows.
+    if os.name == "nt":
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _pwrite(fd: int, data: bytes, offset: int) -> None:
+    if hasattr(os, "pwrite"):
+        os.pwrite(fd, data, offset)
+    else:
+        os.lseek(fd, offset, os.SEEK_SET)
+        os.write(fd, data)
+
+
+def _apply_ranges(path: str, record: WalRecord) -> None:
+    """Writes the ranges of a record, then the new trailer once they are durable."""
+    fd = os.open(path, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+    try:
+        end = record.size - SwishCrypto.SIZE_HASH
+        for offset, data in record.ranges:
+            if offset < end:
+                _pwrite(fd, data[:end - offset], offset)
+        os.fsync(fd)
+        _pwrite(fd, record.new_trailer, end)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def read_trailer(path: str) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as f:
+            f.seek(-SwishCrypto.SIZE_HASH, os.SEEK_END)
+            return f.read()
+    except OSError:
+        return None
+
+
+def recover(path: str) -> bool:
+    """
+    Completes an in-place write interrupted by a crash, if there is one; returns True if the save
+    was repaired. The record is only replayed onto the version of the save it was made for (the file
+    still ends with the old trailer); a record that was not fully written, that was already applied,
+    or whose save was rewritten since is discarded without touching the save.
+    """
+    wal_path = get_wal_path(path)
+    try:
+        with open(wal_path, "rb") as f:
+            record = f.read()
+    except FileNotFoundError:
+        return False
+
+    decoded = decode_wal(record)
+    repaired = False
+    if (decoded is not None and os.path.exists(path) and os.path.getsize(path) == decoded.size
+            and read_trailer(path) == decoded.old_trailer):
+        _apply_ranges(path, decoded)
+        repaired = True
+    os.unlink(wal_path)
+    _fsync_directory(wal_path)
+    return repaired
+
+
+def matches_file(path: str, data: bytes) -> bool:
+    """Indicates if the file on disk still holds data, judging by its size and SHA-256 trailer."""
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size != len(data):
+                return False
+            f.seek(-SwishCrypto.SIZE_HASH, os.SEEK_END)
+            return f.read() == data[-SwishCrypto.SIZE_HASH:]
+    except OSError:
+        return False
+
+
+def write_in_place(path: str, old: bytes, new: bytes) -> Optional[int]:
+    """
+    Patches the file at path, which holds old, so that it holds new; returns the number of bytes
+    written, or None if the file cannot be patched (size changed, or the file is not old anymore).
+    """
+    if len(old) != len(new) or not matches_file(path, old):
+        return None
+    ranges = diff_ranges(old, new)
+    if not ranges:
+        return 0
+
+    record = WalRecord(len(new), old[-SwishCrypto.SIZE_HASH:], new[-SwishCrypto.SIZE_HASH:], ranges)
+    wal_path = get_wal_path(path)
+    with open(wal_path, "wb") as f:
+        f.write(encode_wal(record))
+        f.flush()
+        os.fsync(f.fileno())
+    _fsync_directory(wal_path)
+
+    _apply_ranges(path, record)
+    os.unlink(wal_path)
+    return sum(len(data) for _, data in ranges)
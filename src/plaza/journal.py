@@ -0,0 +1,218 @@
+"""
+Append-only crash journal for the unsaved edits of a save.
+
+The journal (<save>.journal) starts with the SHA-256 trailer of the save file it applies to, followed
+by one record per block write: the key, offset and new bytes, checked by a CRC-32. Appending only
+encodes the record into a buffer; a writer thread writes and syncs everything buffered at once (group
+commit), so one fsync covers all the edits made while the previous one ran.
+
+After a crash, the records are replayed in order onto the blocks of the save they were made against;
+a record that was cut short by the crash ends the replay.
+
+A failed write (e.g. a full disk) is kept in Journal.error and raised by sync: the records appended
+since are not protected until the journal is reset.
+"""
+
+import os
+import struct
+import threading
+import time
+import zlib
+from enum import Enum
+from typing import Optional
+
+from .crypto import HashDB, SwishCrypto
+from .savefile import write_atomic
+
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_MAGIC = b"PLZAJRN1"
+JOURNAL_HEADER_SIZE = len(JOURNAL_MAGIC) + SwishCrypto.SIZE_HASH
+RECORD_HEADER = struct.Struct("<III")    # key, offset, length (followed by the bytes, then the CRC-32)
+RECORD_CRC = struct.Struct("<I")
+
+Record = tuple[int, int, bytes]     # (key, offset, new bytes)
+
+
+def get_journal_path(path: str) -> str:
+    return path + JOURNAL_SUFFIX
+
+
+def encode_record(key: int, offset: int, data: bytes) -> bytes:
+    record = RECORD_HEADER.pack(key, offset, len(data)) + data
+    return record + RECORD_CRC.pack(zlib.crc32(record))
+
+
+def decode_records(body: bytes | memoryview) -> list[Record]:
+    """Decodes the records of a journal body, stopping at the first incomplete or corrupted one."""
+    records = []
+    view = memoryview(body)
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(view):
+        key, start, length = RECORD_HEADER.unpack_from(view, offset)
+        end = offset + RECORD_HEADER.size + length
+        if end + RECORD_CRC.size > len(view):
+            break
+        (crc,) = RECORD_CRC.unpack_from(view, end)
+        if zlib.crc32(view[offset:end]) != crc:
+            break
+        records.append((key, start, bytes(view[offset + RECORD_HEADER.size:end])))
+        offset = end + RECORD_CRC.size
+    return records
+
+
+def read_journal(path: str, data: bytes) -> Optional[list[Record]]:
+    """
+    Reads the journal of the save at path, whose content is data; returns its records, or None if
+    there is no journal or it was made against another version of the save.
+    """
+    try:
+        with open(get_journal_path(path), "rb") as f:
+            journal = f.read()
+    except FileNotFoundError:
+        return None
+    if (len(journal) < JOURNAL_HEADER_SIZE or not journal.startswith(JOURNAL_MAGIC)
+            or journal[len(JOURNAL_MAGIC):JOURNAL_HEADER_SIZE] != data[-SwishCrypto.SIZE_HASH:]):
+        return None
+    return decode_records(memoryview(journal)[JOURNAL_HEADER_SIZE:])
+
+
+def apply_records(hash_db: HashDB, records: list[Record]) -> int:
+    """Writes records into the blocks of hash_db, in order; returns how many could be applied."""
+    applied = 0
+    for key, offset, data in records:
+        try:
+            block = hash_db[key]
+        except KeyError:
+            continue
+        if offset + len(data) <= len(block.raw):
+            block.raw[offset:offset + len(data)] = data
+            applied += 1
+    return applied
+
+
+def discard_journal(path: str) -> None:
+    try:
+        os.unlink(get_journal_path(path))
+    except FileNotFoundError:
+        pass
+
+
+class Journal:
+    """The open journal of one save; append is cheap and thread-safe, syncing happens in a writer thread."""
+
+    def __init__(self, path: str, trailer: bytes, flush_delay: float = 0.0):
+        self.path = path
+        self.flush_delay = flush_delay
+        self.condition = threading.Condition()
+        # Held while the file is written or replaced; taken before the condition.
+        self.io_lock = threading.Lock()
+        self.buffer = bytearray()
+        self.records: list[bytes] = []      # encoded records since the last reset
+        self.appended = 0
+        self.synced = 0
+        self.error: Optional[OSError] = None     # first failed write since the journal was (re)started
+        self.closed = False
+        self.file = None
+        self.start(trailer, [])
+        self.thread = threading.Thread(target=self.run, name="plaza-journal", daemon=True)
+        self.thread.start()
+
+    def start(self, trailer: bytes, records: list[bytes]) -> None:
+        # A new journal is written whole and replaces the old one, so a crash leaves either.
+        if self.file is not None:
+            self.file.close()
+        journal_path = get_journal_path(self.path)
+        write_atomic(journal_path, JOURNAL_MAGIC + bytes(trailer[-SwishCrypto.SIZE_HASH:]) + b"".join(records))
+        self.file = open(journal_path, "ab")
+        with self.condition:
+            self.error = None
+
+    def append(self, key: int | Enum, offset: int, data: bytes) -> int:
+        """Queues a record; returns its sequence number (see sync and reset)."""
+        record = encode_record(key.value if isinstance(key, Enum) else key, offset, bytes(data))
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("The journal is closed")
+            self.buffer += record
+            self.records.append(record)
+            self.appended += 1
+            self.condition.notify_all()
+            return self.appended
+
+    def mark(self) -> int:
+        """Gets the sequence number of the last appended record."""
+        with self.condition:
+            return self.appended
+
+    def run(self) -> None:
+        while True:
+            with self.condition:
+                while not self.buffer and not self.closed:
+                    self.condition.wait()
+                if not self.buffer and self.closed:
+                    return
+            if self.flush_delay:
+                # Leaves a moment for more records to join this commit.
+                time.sleep(self.flush_delay)
+            self.flush()
+
+    def flush(self) -> None:
+        with self.io_lock:
+            with self.condition:
+                chunk, self.buffer = bytes(self.buffer), bytearray()
+                target = self.appended
+            try:
+                if chunk:
+                    self.file.write(chunk)
+                    self.file.flush()
+                    os.fsync(self.file.fileno())
+            except OSError as e:
+                with self.condition:
+                    self.error = self.error or e
+            with self.condition:
+                self.synced = max(self.synced, target)
+                self.condition.notify_all()
+
+    def sync(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until every appended record is on disk; returns False on timeout. Raises the error of
+        a failed write, since the records are then not on disk.
+        """
+        with self.condition:
+            target = self.appended
+            synced = self.condition.wait_for(lambda: self.synced >= target, timeout)
+            if self.error is not None:
+                raise self.error
+            return synced
+
+    def reset(self, trailer: bytes, keep_from: int = 0, path: Optional[str] = None) -> None:
+        """
+        Restarts the journal for a new version of the save (after it was written), keeping the records
+        appended after sequence number keep_from. If given, path is where the save now is.
+        """
+        with self.io_lock:
+            with self.condition:
+                first = len(self.records) - (self.appended - keep_from)
+                kept = self.records[max(0, first):]
+                self.records = kept
+                self.buffer = bytearray()
+                self.synced = self.appended
+            if path is not None and path != self.path:
+                self.file.close()
+                self.file = None
+                discard_journal(self.path)
+                self.path = path
+            self.start(trailer, kept)
+
+    def close(self, discard: bool = False) -> None:
+        """Syncs and closes the journal; discard removes it (the edits were saved or dropped)."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        with self.io_lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            if discard:
+                discard_journal(self.path)
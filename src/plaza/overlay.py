@@ -0,0 +1,167 @@
+"""
+Copy-on-write views of a save for what-if edits (previews of presets, bulk edits, patches).
+
+A SaveOverlay wraps a loaded HashDB without copying it: writes are recorded in a sparse map of
+fixed-size pages per block, and reads combine the pages with the blocks of the base. Only the bytes
+written are kept (a page remembers which of its bytes were written), so bytes of the base that change
+later still show through. Committing writes the written ranges into the base, and discarding forgets
+them; both cost only the pages changed. Any number of overlays can share one base.
+"""
+
+from bisect import bisect_left
+from enum import Enum
+from typing import Callable, Iterator, Optional
+
+from .crypto import HashDB
+from .inplace import diff_ranges
+from .patch import Patch, PatchConflict, digest_range
+
+PAGE_SIZE = 256
+
+Range = tuple[int, int, bytes]      # (key, offset, bytes)
+
+
+class OverlayPage:
+    __slots__ = ("data", "runs")
+
+    def __init__(self):
+        self.data = bytearray(PAGE_SIZE)
+        self.runs: list[list[int]] = []     # [start, end) written, sorted and disjoint
+
+    def add_run(self, start: int, end: int) -> None:
+        """Marks [start, end) as written, merging it with the runs it overlaps or touches."""
+        i = bisect_left(self.runs, [start])
+        if i > 0 and self.runs[i - 1][1] >= start:
+            i -= 1
+        j = i
+        while j < len(self.runs) and self.runs[j][0] <= end:
+            start, end = min(start, self.runs[j][0]), max(end, self.runs[j][1])
+            j += 1
+        self.runs[i:j] = [[start, end]]
+
+
+class SaveOverlay:
+    def __init__(self, base: HashDB, label: Optional[str] = None):
+        self.base = base
+        self.label = label
+        self.pages: dict[int, dict[int, OverlayPage]] = {}   # block key -> page index -> page
+
+    def __bool__(self) -> bool:
+        return bool(self.pages)
+
+    def get_page_count(self) -> int:
+        return sum(len(pages) for pages in self.pages.values())
+
+    def get_keys(self) -> set[int]:
+        """Gets the keys of the blocks written in the overlay."""
+        return set(self.pages)
+
+    def write(self, key: int | Enum, offset: int, data: bytes) -> None:
+        """Writes data into a block of the overlay at offset (the block keeps its size)."""
+        block = self.base[key]
+        end = offset + len(data)
+        if offset < 0 or end > len(block.raw):
+            raise ValueError(f"Cannot write {len(data)} bytes at {offset} into a block of {len(block.raw)} bytes")
+        pages = self.pages.setdefault(block.key, {})
+        position = offset
+        while position < end:
+            index, start = divmod(position, PAGE_SIZE)
+            stop = min(PAGE_SIZE, start + end - position)
+            page = pages.get(index)
+            if page is None:
+                page = pages[index] = OverlayPage()
+            page.data[start:stop] = data[position - offset:position - offset + stop - start]
+            page.add_run(start, stop)
+            position += stop - start
+        if not pages:
+            del self.pages[block.key]
+
+    def change_data(self, key: int | Enum, data: bytes) -> None:
+        """Replaces the whole data of a block in the overlay (same size), writing only the bytes that differ."""
+        block = self.base[key]
+        if len(data) != len(block.raw):
+            raise ValueError(f"Cannot change the size of a block from {len(block.raw)} to {len(data)}")
+        for start, new in diff_ranges(self.read(key), bytes(data)):
+            self.write(key, start, new)
+
+    def read(self, key: int | Enum, offset: int = 0, length: Optional[int] = None) -> bytes:
+        """Reads bytes of a block as the overlay sees it (the whole block by default)."""
+        block = self.base[key]
+        end = len(block.raw) if length is None else offset + length
+        if offset < 0 or end > len(block.raw):
+            raise ValueError(f"Cannot read {end - offset} bytes at {offset} from a block of {len(block.raw)} bytes")
+        pages = self.pages.get(block.key)
+        if not pages:
+            return bytes(block.raw[offset:end])
+        data = bytearray(block.raw[offset:end])
+        for index, page in pages.items():
+            page_start = index * PAGE_SIZE
+            if page_start >= end or page_start + PAGE_SIZE <= offset:
+                continue
+            for run_start, run_end in page.runs:
+                start, stop = max(page_start + run_start, offset), min(page_start + run_end, end)
+                if start < stop:
+                    data[start - offset:stop - offset] = page.data[start - page_start:stop - page_start]
+        return bytes(data)
+
+    def iter_writes(self) -> Iterator[Range]:
+        """Yields the ranges written in the overlay, by block and offset, joining runs across pages."""
+        for key, pages in self.pages.items():
+            pending: Optional[tuple[int, bytearray]] = None
+            for index in sorted(pages):
+                page = pages[index]
+                for run_start, run_end in page.runs:
+                    start = index * PAGE_SIZE + run_start
+                    if pending is not None and pending[0] + len(pending[1]) == start:
+                        pending[1].extend(page.data[run_start:run_end])
+                        continue
+                    if pending is not None:
+                        yield key, pending[0], bytes(pending[1])
+                    pending = (start, bytearray(page.data[run_start:run_end]))
+            if pending is not None:
+                yield key, pending[0], bytes(pending[1])
+
+    def get_changes(self) -> list[Range]:
+        """Gets the ranges where the overlay differs from the base now (writes of identical bytes are left out)."""
+        changes = []
+        for key, offset, data in self.iter_writes():
+            base = bytes(self.base[key].raw[offset:offset + len(data)])
+            changes += [(key, offset + start, new) for start, new in diff_ranges(base, data)]
+        return changes
+
+    def commit(self, write: Optional[Callable[[int, int, bytes], object]] = None) -> int:
+        """
+        Writes the changes into the base and empties the overlay; returns the number of ranges written.
+        write(key, offset, data) replaces the direct write, e.g. BlockHistory.write to make it undoable.
+        """
+        changes = self.get_changes()
+        for key, offset, data in changes:
+            if write is not None:
+                write(key, offset, data)
+            else:
+                self.base[key].raw[offset:offset + len(data)] = data
+        self.pages.clear()
+        return len(changes)
+
+    def discard(self) -> None:
+        self.pages.clear()
+
+    def apply(self, patch: Patch, check: bool = True) -> int:
+        """Applies a patch to the overlay (see plaza.patch.apply_to_hash_db); returns the records written."""
+        for record in patch.records:
+            try:
+                size = len(self.base[record.key].raw)
+            except KeyError:
+                raise PatchConflict(f"Block 0x{record.key:08X} is not in the save")
+            if record.end > size:
+                raise PatchConflict(f"Block 0x{record.key:08X} has {size} bytes, the patch writes up to {record.end}")
+            if (check and record.precondition
+                    and digest_range(self.read(record.key, record.offset, len(record.data))) != record.precondition):
+                raise PatchConflict(f"Block 0x{record.key:08X} does not hold the expected bytes at {record.offset}")
+
+        written = 0
+        for record in patch.records:
+            if self.read(record.key, record.offset, len(record.data)) != record.data:
+                self.write(record.key, record.offset, record.data)
+                written += 1
+        return written
@@ -0,0 +1,281 @@
+"""
+Compiled save patches: (block key, offset, bytes) records, resolved once and applied to any number of saves.
+
+A record may carry a precondition, the digest of the bytes it expects to replace, so a patch made
+from a diff only applies to saves that still hold the old data. Patches apply either to a decoded
+HashDB, or directly to the encrypted bytes of a save: the keystream of a block only depends on its
+key and the static xorpad on the position, so the touched bytes can be re-encrypted in place without
+decrypting anything else, and only the SHA-256 trailer has to be recomputed.
+
+    header   "PLZAPCH1", record count (u32)
+    record   key (u32), offset (u32), length (u32), flags (u8), [precondition (16 bytes)], bytes
+    trailer  SHA-256 of everything before it
+"""
+
+import hashlib
+import json
+import struct
+from typing import Any, Iterable, Optional
+
+from .crypto import HashDB, SCBlock, SwishCrypto
+from .crypto.sctypecode import SCTypeCode
+from .crypto.scxorshift import SCXorShift32
+from .inplace import diff_ranges
+from .types import HashDBKeys
+
+PATCH_MAGIC = b"PLZAPCH1"
+PATCH_HEADER = struct.Struct("<8sI")
+RECORD_HEADER = struct.Struct("<IIIB")
+FLAG_PRECONDITION = 0x01
+PRECONDITION_SIZE = 16
+ENTRY_SIZE = 16     # bag entries
+
+
+class PatchConflict(ValueError):
+    """The save does not match the patch (missing block, block too small, or failed precondition)."""
+
+
+def digest_range(data: bytes | memoryview) -> bytes:
+    return hashlib.blake2b(data, digest_size=PRECONDITION_SIZE).digest()
+
+
+def xor_bytes(a: bytes | memoryview, b: bytes | memoryview) -> bytes:
+    return (int.from_bytes(a, "little") ^ int.from_bytes(b, "little")).to_bytes(len(a), "little")
+
+
+class PatchRecord:
+    __slots__ = ("key", "offset", "data", "precondition")
+
+    def __init__(self, key: int, offset: int, data: bytes, precondition: Optional[bytes] = None):
+        self.key = key
+        self.offset = offset
+        self.data = data
+        self.precondition = precondition
+
+    @property
+    def end(self) -> int:
+        return self.offset + len(self.data)
+
+    def __repr__(self) -> str:
+        return f"PatchRecord(key=0x{self.key:08X}, offset={self.offset}, length={len(self.data)})"
+
+
+class Patch:
+    def __init__(self, records: Optional[list[PatchRecord]] = None):
+        self.records: list[PatchRecord] = records or []
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def get_keys(self) -> set[int]:
+        return {record.key for record in self.records}
+
+    def to_bytes(self) -> bytes:
+        body = bytearray(PATCH_HEADER.pack(PATCH_MAGIC, len(self.records)))
+        for record in self.records:
+            flags = FLAG_PRECONDITION if record.precondition else 0
+            body += RECORD_HEADER.pack(record.key, record.offset, len(record.data), flags)
+            if record.precondition:
+                body += record.precondition
+            body += record.data
+        return bytes(body) + hashlib.sha256(body).digest()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Patch':
+        if len(data) < PATCH_HEADER.size + 32 or not data.startswith(PATCH_MAGIC):
+            raise ValueError("Data is not a save patch")
+        body = memoryview(data)[:-32]
+        if hashlib.sha256(body).digest() != data[-32:]:
+            raise ValueError("Save patch is corrupted")
+        _, count = PATCH_HEADER.unpack_from(body, 0)
+        offset = PATCH_HEADER.size
+        records = []
+        for _ in range(count):
+            key, start, length, flags = RECORD_HEADER.unpack_from(body, offset)
+            offset += RECORD_HEADER.size
+            precondition = None
+            if flags & FLAG_PRECONDITION:
+                precondition = bytes(body[offset:offset + PRECONDITION_SIZE])
+                offset += PRECONDITION_SIZE
+            records.append(PatchRecord(key, start, bytes(body[offset:offset + length]), precondition))
+            offset += length
+        return cls(records)
+
+    def save(self, path: str) -> None:
+        from .savefile import write_atomic
+        write_atomic(path, self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> 'Patch':
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+def apply_to_hash_db(hash_db: HashDB, patch: Patch, check: bool = True) -> int:
+    """
+    Applies a patch to decoded blocks; returns the number of records that changed something. Every
+    record is checked before anything is written, so a conflicting patch leaves the blocks untouched.
+    """
+    targets = []
+    for record in patch.records:
+        try:
+            block = hash_db[record.key]
+        except KeyError:
+            raise PatchConflict(f"Block 0x{record.key:08X} is not in the save")
+        if record.end > len(block.raw):
+            raise PatchConflict(f"Block 0x{record.key:08X} has {len(block.raw)} bytes, the patch writes up to {record.end}")
+        if check and record.precondition and digest_range(block.raw[record.offset:record.end]) != record.precondition:
+            raise PatchConflict(f"Block 0x{record.key:08X} does not hold the expected bytes at {record.offset}")
+        targets.append(block)
+
+    changed = 0
+    for record, block in zip(patch.records, targets):
+        if block.raw[record.offset:record.end] != record.data:
+            block.raw[record.offset:record.end] = record.data
+            changed += 1
+    return changed
+
+
+# Keystreams only depend on the block key: they are shared by every save a patch is applied to.
+_keystreams: dict[int, bytes] = {}
+
+
+def get_keystream(key: int, length: int) -> bytes:
+    keystream = _keystreams.get(key, b"")
+    if len(keystream) < length:
+        keystream = SCXorShift32(key).crypt(bytes(length))
+        _keystreams[key] = keystream
+    return keystream
+
+
+def get_payload_start(block_type: SCTypeCode) -> int:
+    """Gets where the payload of a block starts, counting from its key."""
+    if block_type.is_boolean():
+        return -1   # no payload
+    if block_type == SCTypeCode.OBJECT:
+        return 4 + 1 + 4
+    if block_type == SCTypeCode.ARRAY:
+        return 4 + 1 + 4 + 1
+    return 4 + 1
+
+
+def apply_to_data(data: bytes, patch: Patch, check: bool = True) -> tuple[bytes, int]:
+    """
+    Applies a patch to an encrypted save without decrypting it; returns the new encrypted save (with
+    its hash recomputed) and the number of records that changed something.
+    """
+    view = memoryview(data)
+    wanted = patch.get_keys()
+    spans = {}
+    for key, offset, length in SwishCrypto.iter_block_spans(view):
+        if key in wanted:
+            spans[key] = (offset, length)
+            if len(spans) == len(wanted):
+                break
+
+    writes = []
+    for record in patch.records:
+        if record.key not in spans:
+            raise PatchConflict(f"Block 0x{record.key:08X} is not in the save")
+        offset, length = spans[record.key]
+        block_type = SCTypeCode(SwishCrypto.crypt_static_xorpad_range(view[offset + 4:offset + 5], offset + 4)[0]
+                                ^ get_keystream(record.key, 1)[0])
+        payload_start = get_payload_start(block_type)
+        if payload_start < 0 or record.end > length - payload_start:
+            raise PatchConflict(f"Block 0x{record.key:08X} has {max(0, length - payload_start)} bytes, "
+                                f"the patch writes up to {record.end}")
+
+        # Byte n of the payload is xored with byte (payload_start - 4 + n) of the keystream.
+        start = offset + payload_start + record.offset
+        stream_start = payload_start - 4 + record.offset
+        keystream = get_keystream(record.key, stream_start + len(record.data))[stream_start:stream_start + len(record.data)]
+        old = xor_bytes(SwishCrypto.crypt_static_xorpad_range(view[start:start + len(record.data)], start), keystream)
+        if check and record.precondition and digest_range(old) != record.precondition:
+            raise PatchConflict(f"Block 0x{record.key:08X} does not hold the expected bytes at {record.offset}")
+        if old != record.data:
+            writes.append((start, SwishCrypto.crypt_static_xorpad_range(xor_bytes(record.data, keystream), start)))
+
+    if not writes:
+        return data, 0
+    patched = bytearray(data)
+    for start, encrypted in writes:
+        patched[start:start + len(encrypted)] = encrypted
+    patched[-SwishCrypto.SIZE_HASH:] = SwishCrypto.compute_hash(memoryview(patched)[:-SwishCrypto.SIZE_HASH])
+    return bytes(patched), len(writes)
+
+
+def compile_items(items: Iterable[tuple[int, int]]) -> Patch:
+    """Compiles (item id, quantity) pairs into bag entry records, merging consecutive items."""
+    from .batch import get_item_db, make_entry
+
+    item_db = get_item_db()
+    entries = {item_id: make_entry(item_id, quantity).to_bytes() for item_id, quantity in items if item_id in item_db}
+    records: list[PatchRecord] = []
+    for item_id in sorted(entries):
+        offset = item_id * ENTRY_SIZE
+        if records and records[-1].end == offset:
+            records[-1].data += entries[item_id]
+        else:
+            records.append(PatchRecord(HashDBKeys.BagSave.value, offset, entries[item_id]))
+    return Patch(records)
+
+
+def resolve_item(item: dict[str, Any], names: dict[str, int]) -> Optional[int]:
+    if "id" in item:
+        return int(item["id"])
+    return names.get(str(item.get("name", "")).casefold())
+
+
+def compile_preset(preset: dict[str, Any]) -> tuple[Patch, list[str]]:
+    """
+    Compiles a preset ({"items": [{"id" or "name", "quantity"}, ...]}, as in assets/presets) into a
+    patch; returns it with the names of the items that could not be resolved.
+    """
+    from .batch import get_item_db
+
+    names = {}
+    for item_id, item in get_item_db().items():
+        names[item["english_ui_name"].casefold()] = item_id
+        names[item["canonical_name"].casefold()] = item_id
+    items = []
+    unresolved = []
+    for item in preset.get("items", []):
+        item_id = resolve_item(item, names)
+        if item_id is None:
+            unresolved.append(str(item.get("name")))
+        else:
+            items.append((item_id, int(item["quantity"])))
+    return compile_items(items), unresolved
+
+
+def compile_preset_file(path: str) -> tuple[Patch, list[str]]:
+    with open(path, encoding="utf-8") as f:
+        return compile_preset(json.load(f))
+
+
+def compile_blocks(old_blocks: Iterable[SCBlock], new_blocks: Iterable[SCBlock], preconditions: bool = True) -> Patch:
+    """
+    Compiles the differences between two versions of the blocks of a save into a patch. Only data
+    changes can be patched: blocks that were added, removed, resized or changed type are refused.
+    """
+    old_by_key = {block.key: block for block in old_blocks}
+    records = []
+    for new in new_blocks:
+        old = old_by_key.pop(new.key, None)
+        if old is None:
+            raise ValueError(f"Block 0x{new.key:08X} was added: a patch can only change data")
+        if old.type != new.type or old.sub_type != new.sub_type or len(old.raw) != len(new.raw):
+            raise ValueError(f"Block 0x{new.key:08X} changed type or size: a patch can only change data")
+        if old.raw == new.raw:
+            continue
+        for start, data in diff_ranges(bytes(old.raw), bytes(new.raw)):
+            precondition = digest_range(old.raw[start:start + len(data)]) if preconditions else None
+            records.append(PatchRecord(new.key, start, data, precondition))
+    if old_by_key:
+        raise ValueError(f"Block 0x{next(iter(old_by_key)):08X} was removed: a patch can only change data")
+    return Patch(records)
+
+
+def compile_diff(old_data: bytes, new_data: bytes, preconditions: bool = True) -> Patch:
+    """Compiles the differences between two encrypted saves into a patch (see compile_blocks)."""
+    return compile_blocks(SwishCrypto.decrypt(old_data), SwishCrypto.decrypt(new_data), preconditions)
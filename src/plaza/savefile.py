@@ -0,0 +1,168 @@
+import os
+import tempfile
+import threading
+from enum import Enum
+from typing import Callable, Iterable, Optional
+
+from . import inplace
+from .crypto import BlockTable, HashDB, SCBlock, SwishCrypto
+
+SAVE_FILE_MAGIC = bytes([0x17, 0x2D, 0xBB, 0x06, 0xEA])
+
+ProgressCallback = Callable[[float], None]
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """Writes a file through a temporary file in the same directory, so readers never see a partial file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file as 0600: keep the mode of the file being replaced instead.
+        os.chmod(temp_path, os.stat(path).st_mode & 0o7777 if os.path.exists(path) else 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class SaveFile:
+    """
+    A loaded save file: the encrypted bytes it was read from and its decrypted block database.
+
+    The hash status of the encrypted bytes is computed at most once per distinct buffer.
+    """
+
+    def __init__(self, data: bytes, hash_db: HashDB | BlockTable, path: Optional[str] = None):
+        self._data = data
+        self._hash_valid: Optional[bool] = None
+        self._hash_thread: Optional[threading.Thread] = None
+        self._hash_lock = threading.Lock()
+        self.hash_db = hash_db
+        self.path = path
+        self.last_write_size = 0   # bytes actually written to disk by the last write()
+
+    @property
+    def data(self) -> bytes:
+        return self._data
+
+    @data.setter
+    def data(self, data: bytes) -> None:
+        self.replace_data(data)
+
+    def replace_data(self, data: bytes, hash_valid: Optional[bool] = None) -> None:
+        """
+        Replaces the encrypted bytes. The cached hash status is kept if the bytes did not change,
+        otherwise it is replaced by hash_valid (None meaning unknown).
+        """
+        with self._hash_lock:
+            if data is self._data or data == self._data:
+                return
+            self._data = data
+            self._hash_thread = None
+            self._hash_valid = hash_valid
+
+    @staticmethod
+    def has_magic(data: bytes) -> bool:
+        """Indicates if the data starts like an encrypted save file."""
+        return data.startswith(SAVE_FILE_MAGIC)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, path: Optional[str] = None,
+                   progress: Optional[ProgressCallback] = None, compact: bool = False) -> 'SaveFile':
+        """
+        Decrypts an encrypted save file. If compact is set, the blocks are kept in a BlockTable
+        (less memory, blocks keep their size) instead of a HashDB of SCBlock objects.
+        """
+        if not cls.has_magic(data):
+            raise ValueError("Data is not a save file")
+        save_file = cls(data, HashDB([]), path)
+        # hashlib releases the GIL, so the hash is checked while the blocks are parsed.
+        save_file.start_hash_check()
+        if compact:
+            save_file.hash_db = BlockTable.decrypt(data, progress)
+        else:
+            save_file.hash_db = HashDB(SwishCrypto.decrypt(data, progress))
+        return save_file
+
+    @classmethod
+    def load(cls, path: str, progress: Optional[ProgressCallback] = None, compact: bool = False) -> 'SaveFile':
+        """Reads and decrypts a save file from disk (completing an interrupted in-place write first)."""
+        inplace.recover(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        return cls.from_bytes(data, path, progress, compact)
+
+    @classmethod
+    def read_blocks(cls, path: str, keys: Iterable[int | Enum]) -> dict[int, SCBlock]:
+        """Reads only the given blocks of a save file, without decrypting the others (see SwishCrypto.decrypt_blocks)."""
+        with open(path, "rb") as f:
+            data = f.read()
+        if not cls.has_magic(data):
+            raise ValueError("Data is not a save file")
+        return SwishCrypto.decrypt_blocks(data, keys)
+
+    def start_hash_check(self) -> None:
+        """Starts checking the hash on a background thread, unless the status is already known."""
+        if self._hash_valid is not None or self._hash_thread is not None:
+            return
+        data = self._data
+
+        def check():
+            is_valid = SwishCrypto.get_is_hash_valid(data)
+            with self._hash_lock:
+                if self._data is data:
+                    self._hash_valid = is_valid
+
+        self._hash_thread = threading.Thread(target=check, name="plaza-hash", daemon=True)
+        self._hash_thread.start()
+
+    @property
+    def hash_status(self) -> Optional[bool]:
+        """Gets the cached hash status without blocking; None if it is not known yet."""
+        return self._hash_valid
+
+    def is_hash_valid(self) -> bool:
+        """Checks the SHA-256 trailer of the encrypted data (cached)."""
+        thread = self._hash_thread
+        if thread is not None:
+            thread.join()
+        if self._hash_valid is None:
+            self._hash_valid = SwishCrypto.get_is_hash_valid(self._data)
+        return self._hash_valid
+
+    def encrypt(self, progress: Optional[ProgressCallback] = None) -> bytes:
+        """Encrypts the current blocks, and makes the result the file's data."""
+        # Freshly encrypted data carries a freshly computed hash.
+        self.replace_data(SwishCrypto.encrypt(self.hash_db.blocks, progress), hash_valid=True)
+        return self._data
+
+    def write(self, path: Optional[str] = None, progress: Optional[ProgressCallback] = None,
+              atomic: bool = False, in_place: bool = False) -> bytes:
+        """
+        Encrypts the current blocks and writes them to path (defaults to the path the file was loaded from).
+
+        If in_place is set and the file on disk still holds the data this save was read from, only the
+        changed bytes are patched into it (see plaza.inplace); otherwise the whole file is written.
+        If atomic is set, a whole file is replaced in a single step (see write_atomic).
+        """
+        path = path or self.path
+        if path is None:
+            raise ValueError("No path to write the save file to")
+        old_data = self._data
+        data = self.encrypt(progress)
+
+        written = inplace.write_in_place(path, old_data, data) if in_place else None
+        if written is None:
+            if atomic:
+                write_atomic(path, data)
+            else:
+                with open(path, "wb") as f:
+                    f.write(data)
+            written = len(data)
+        self.last_write_size = written
+        self.path = path
+        return data
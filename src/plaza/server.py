@@ -0,0 +1,338 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Any, Callable, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from .batch import CORE_FIELDS, get_item_db
+from .savefile import SaveFile
+from .types import BagSave, CoreData, HashDBKeys, PokedexData
+
+logger = logging.getLogger(__name__)
+
+CacheKey = tuple[str, int, int]   # (real path, mtime_ns, size)
+
+MAX_REQUEST_LINE = 8192
+MAX_HEADERS = 100
+
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def read_save(path: str) -> SaveFile:
+    """
+    Reads a save without SaveFile.load's recovery of interrupted in-place writes: the service only
+    reads, and must never change a save or its write-ahead record.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    # Cached saves are only read: their blocks are kept in a compact BlockTable.
+    return SaveFile.from_bytes(data, path, compact=True)
+
+
+class CachedSave:
+    """A parsed save in the cache, with the JSON views already computed for it."""
+
+    def __init__(self, save_file: SaveFile):
+        self.save_file = save_file
+        self.views: dict[str, Any] = {}
+
+
+class SaveCache:
+    """
+    LRU cache of parsed saves, keyed by path, mtime and size so a file changed on disk is parsed again.
+
+    Concurrent requests for a save that is being parsed wait for that parse instead of starting their own.
+    """
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self.entries: OrderedDict[CacheKey, CachedSave] = OrderedDict()
+        self.pending: dict[CacheKey, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_key(path: str) -> CacheKey:
+        stat = os.stat(path)
+        return path, stat.st_mtime_ns, stat.st_size
+
+    async def get(self, path: str, executor: Executor) -> CachedSave:
+        key = self.get_key(path)
+        cached = self.entries.get(key)
+        if cached is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return cached
+        if key in self.pending:
+            self.hits += 1
+            return await asyncio.shield(self.pending[key])
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[key] = future
+        try:
+            save_file = await asyncio.get_running_loop().run_in_executor(executor, read_save, path)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()   # marks it retrieved: failures without waiters are not logged by asyncio
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self.pending[key]
+
+        cached = CachedSave(save_file)
+        # Older versions of the same file will never be asked for again.
+        for old_key in [old_key for old_key in self.entries if old_key[0] == path]:
+            del self.entries[old_key]
+        self.entries[key] = cached
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        future.set_result(cached)
+        return cached
+
+    def get_stats(self) -> dict[str, Any]:
+        return {"entries": len(self.entries), "max_entries": self.max_entries, "hits": self.hits,
+                "misses": self.misses}
+
+
+class LatencyMetrics:
+    """Request count, errors and latency percentiles per endpoint, over the last `window` requests."""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self.samples: dict[str, list[float]] = {}
+        self.counts: dict[str, int] = {}
+        self.errors: dict[str, int] = {}
+
+    def record(self, endpoint: str, seconds: float, failed: bool) -> None:
+        samples = self.samples.setdefault(endpoint, [])
+        samples.append(seconds * 1000)
+        if len(samples) > self.window:
+            del samples[:len(samples) - self.window]
+        self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+        self.errors[endpoint] = self.errors.get(endpoint, 0) + failed
+
+    def get_stats(self) -> dict[str, Any]:
+        stats = {}
+        for endpoint, samples in self.samples.items():
+            ordered = sorted(samples)
+            stats[endpoint] = {
+                "count": self.counts[endpoint],
+                "errors": self.errors[endpoint],
+                "mean_ms": round(sum(ordered) / len(ordered), 3),
+                "p50_ms": round(ordered[len(ordered) // 2], 3),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                "max_ms": round(ordered[-1], 3),
+            }
+        return stats
+
+
+def describe_blocks(save_file: SaveFile) -> list[dict[str, Any]]:
+    return [{"key": f"0x{block.key:08X}", "type": block.type.name, "sub_type": block.sub_type.name,
+             "size": len(block.raw)} for block in save_file.hash_db.blocks]
+
+
+def describe_bag(save_file: SaveFile) -> list[dict[str, Any]]:
+    item_db = get_item_db()
+    bag_save = BagSave.from_bytes(bytes(save_file.hash_db[HashDBKeys.BagSave].data))
+    items = []
+    for item_id, entry in enumerate(bag_save.entries):
+        if entry.quantity <= 0:
+            continue
+        category = entry.category.name if hasattr(entry.category, "name") else entry.category
+        item = item_db.get(item_id)
+        items.append({"id": item_id, "name": item["english_ui_name"] if item else None, "quantity": entry.quantity,
+                      "category": category, "flags": entry.flags})
+    return items
+
+
+def describe_core(save_file: SaveFile) -> dict[str, Any]:
+    core_data = CoreData.from_bytes(bytes(save_file.hash_db[HashDBKeys.CoreData].data))
+    core = {field: getattr(core_data, field) for field in CORE_FIELDS}
+    core["name"] = core_data.get_name_string()
+    return core
+
+
+def describe_pokedex(save_file: SaveFile) -> dict[str, Any]:
+    pokedex = PokedexData.from_bytes(bytes(save_file.hash_db[HashDBKeys.PokeDex].data))
+    entries = [{"dev_no": dev_no, "capture_flags": data.capture_flg, "battle_flags": data.battle_flg,
+                "shiny_flags": data.rare_flg, "capture_count": sum(data.capture_num),
+                "defeat_count": sum(data.defeat_num)}
+               for dev_no, data in enumerate(pokedex.pokedex_data) if data.capture_flg or data.battle_flg]
+    return {"captured": pokedex.get_captured_count(), "shiny": pokedex.get_shiny_count(),
+            "total": pokedex.DEV_NO_MAX, "entries": entries}
+
+
+def describe_hash(save_file: SaveFile) -> dict[str, Any]:
+    return {"valid": save_file.is_hash_valid(), "size": len(save_file.data)}
+
+
+# Endpoint name -> function computing its JSON view from a parsed save (once per cached save).
+SAVE_VIEWS: dict[str, Callable[[SaveFile], Any]] = {
+    "blocks": describe_blocks,
+    "bag": describe_bag,
+    "core": describe_core,
+    "pokedex": describe_pokedex,
+    "hash": describe_hash,
+}
+
+
+class InspectionServer:
+    """
+    Small local HTTP service answering read-only questions about save files, as JSON.
+
+        GET /<view>?path=FILE     view is one of blocks, bag, core, pokedex, hash
+        GET /block?path=FILE&key=0x21C9BD44
+        GET /metrics
+
+    Only files under root can be inspected. Parsing and view computation run in an executor so the
+    event loop keeps answering cached requests while a new save is decrypted.
+    """
+
+    def __init__(self, root: str, cache_size: int = 8, executor: Optional[Executor] = None):
+        self.root = os.path.realpath(root)
+        self.cache = SaveCache(cache_size)
+        self.metrics = LatencyMetrics()
+        self.executor = executor or ThreadPoolExecutor(max_workers=4, thread_name_prefix="plaza-serve")
+        self.started = time.monotonic()
+
+    def resolve_path(self, query: dict[str, list[str]]) -> str:
+        if "path" not in query:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Missing 'path' parameter")
+        path = os.path.realpath(os.path.join(self.root, query["path"][0]))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise HTTPError(HTTPStatus.FORBIDDEN, "Path is outside of the served directory")
+        if not os.path.isfile(path):
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No such file: {query['path'][0]}")
+        return path
+
+    async def get_view(self, name: str, query: dict[str, list[str]]) -> Any:
+        cached = await self.cache.get(self.resolve_path(query), self.executor)
+        if name not in cached.views:
+            cached.views[name] = await asyncio.get_running_loop().run_in_executor(
+                self.executor, SAVE_VIEWS[name], cached.save_file)
+        return cached.views[name]
+
+    async def get_block(self, query: dict[str, list[str]]) -> Any:
+        try:
+            key = int(query["key"][0], 0)
+        except (KeyError, ValueError):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected a 'key' parameter such as 0x21C9BD44")
+        cached = await self.cache.get(self.resolve_path(query), self.executor)
+        try:
+            block = cached.save_file.hash_db[key]
+        except KeyError:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No block 0x{key:08X}")
+        value = block.get_value() if block.has_value() else None
+        return {"key": f"0x{block.key:08X}", "type": block.type.name, "sub_type": block.sub_type.name,
+                "size": len(block.raw), "value": value, "data": block.raw.hex()}
+
+    def get_metrics(self) -> Any:
+        return {"uptime_s": round(time.monotonic() - self.started, 3), "cache": self.cache.get_stats(),
+                "endpoints": self.metrics.get_stats()}
+
+    async def dispatch(self, target: str) -> tuple[str, Any]:
+        url = urlsplit(target)
+        endpoint = url.path.strip("/")
+        query = parse_qs(url.query)
+        if endpoint in SAVE_VIEWS:
+            return endpoint, await self.get_view(endpoint, query)
+        if endpoint == "block":
+            return endpoint, await self.get_block(query)
+        if endpoint == "metrics":
+            return endpoint, self.get_metrics()
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown endpoint /{endpoint}")
+
+    async def handle_request(self, method: str, target: str) -> tuple[HTTPStatus, Any]:
+        start = time.perf_counter()
+        endpoint = "other"
+        status = HTTPStatus.OK
+        try:
+            if method != "GET":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Only GET is supported")
+            endpoint, body = await self.dispatch(target)
+        except HTTPError as e:
+            status, body = e.status, {"error": str(e)}
+        except Exception as e:
+            logger.exception("Error while handling %s", target)
+            status, body = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+        if endpoint != "metrics":
+            self.metrics.record(endpoint, time.perf_counter() - start, status != HTTPStatus.OK)
+        return status, body
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serves the requests of one connection (HTTP/1.1 keep-alive, GET only, no request bodies)."""
+        try:
+            while True:
+                try:
+                    request_line = await self.read_line(reader)
+                    if not request_line:
+                        break
+                    headers = {}
+                    for _ in range(MAX_HEADERS):
+                        line = await self.read_line(reader)
+                        if line in (b"\r\n", b"\n", b""):
+                            break
+                        name, _, value = line.decode("latin-1").partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                except HTTPError as e:
+                    await self.send(writer, e.status, {"error": str(e)}, False)
+                    break
+
+                parts = request_line.decode("latin-1").split()
+                if len(parts) != 3:
+                    await self.send(writer, HTTPStatus.BAD_REQUEST, {"error": "Malformed request line"}, False)
+                    break
+                method, target, version = parts
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                status, body = await self.handle_request(method, target)
+                await self.send(writer, status, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def read_line(reader: asyncio.StreamReader) -> bytes:
+        """Reads a line of the request head; lines longer than MAX_REQUEST_LINE are refused."""
+        try:
+            line = await reader.readline()
+        except (ValueError, asyncio.LimitOverrunError):
+            # Longer than the stream limit: readline gives up before finding the end of the line.
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Request line or header too long")
+        if len(line) > MAX_REQUEST_LINE:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Request line or header too long")
+        return line
+
+    @staticmethod
+    async def send(writer: asyncio.StreamWriter, status: HTTPStatus, body: Any, keep_alive: bool) -> None:
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765) -> None:
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        addresses = ", ".join(f"{sock.getsockname()[0]}:{sock.getsockname()[1]}" for sock in server.sockets)
+        logger.info("Serving %s on http://%s", self.root, addresses)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
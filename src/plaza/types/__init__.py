@@ -2,3 +2,4 @@ from .bagsave import BagSave, BagEntry, BagFlagID, BagReleaseCategory, CategoryT
 from .coredata import CoreData, UserDataSaveDataAccessor
 from .pokedex import PokedexSaveDataAccessor, PokedexData, PokedexCoreData, PokedexKind, DrawData
 from .accessors import HashDBKeys
+from .registry import ACCESSOR_TYPES, BlockViews, get_accessor_type, register_accessor
@@ -1,5 +1,6 @@
 import struct
 from enum import Enum
+from typing import Callable
 
 class CategoryType(Enum):
     CORRUPT  = -1
@@ -119,6 +120,7 @@ class BagSave:
         self.entries: list[BagEntry] = []
         self.release_category = BagReleaseCategory()
         self.reserve = bytes(124)
+        self.listeners: list[Callable[[int], None]] = []
 
     @classmethod
     def from_bytes(cls, data):
@@ -151,6 +153,21 @@ class BagSave:
         data += self.reserve
         return data
 
+    def reload_range(self, data, start, end):
+        """Re-reads the entries of the block data overlapping [start, end), notifying the ones that changed."""
+        changed = []
+        for item_id in range(start // 16, min((end - 1) // 16 + 1, len(self.entries))):
+            entry_data = bytes(data[item_id * 16:item_id * 16 + 16])
+            if entry_data != self.entries[item_id].to_bytes():
+                self.entries[item_id] = BagEntry.from_bytes(entry_data)
+                changed.append(item_id)
+        if end > 48000:
+            self.release_category = BagReleaseCategory.from_bytes(bytes(data[48000:48004]))
+            self.reserve = bytes(data[48004:48128])
+        for item_id in changed:
+            self.notify_changed(item_id)
+        return changed
+
     def get_entry(self, item_id):
         if 0 <= item_id < len(self.entries):
             return self.entries[item_id]
@@ -159,6 +176,19 @@ class BagSave:
     def set_entry(self, item_id, entry):
         if 0 <= item_id < len(self.entries):
             self.entries[item_id] = entry
+            self.notify_changed(item_id)
+
+    def add_listener(self, listener: Callable[[int], None]) -> None:
+        """Registers a callback invoked with the item id of every entry changed through set_entry."""
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[int], None]) -> None:
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def notify_changed(self, item_id: int) -> None:
+        for listener in self.listeners:
+            listener(item_id)
 
     def is_release_category(self, category):
         return self.release_category.get_flag(category)
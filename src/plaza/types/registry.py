@@ -0,0 +1,138 @@
+"""
+Typed views of blocks: a registry of the accessor class of each known block, and lazy per-save views.
+
+A view is parsed from its block on first access and cached. A block that changes underneath its
+view (undo, journal replay, reload from disk) drops the view, to be parsed again when next needed,
+unless the accessor can reload just the changed range (reload_range). Views modified in memory are
+marked as touched and written back by flush; the others are never serialized.
+"""
+
+from contextlib import contextmanager
+from enum import Enum
+from typing import Any, Callable, Iterator, Optional
+
+from ..crypto import HashDB
+from .accessors import HashDBKeys
+from .bagsave import BagSave
+from .coredata import CoreData
+from .pokedex import PokedexSaveDataAccessor
+
+# Block key -> accessor class (anything with from_bytes(data) and to_bytes()).
+ACCESSOR_TYPES: dict[int, type] = {}
+
+
+def register_accessor(key: int | Enum, accessor_type: type) -> None:
+    ACCESSOR_TYPES[key.value if isinstance(key, Enum) else key] = accessor_type
+
+
+def get_accessor_type(key: int | Enum) -> Optional[type]:
+    return ACCESSOR_TYPES.get(key.value if isinstance(key, Enum) else key)
+
+
+register_accessor(HashDBKeys.BagSave, BagSave)
+register_accessor(HashDBKeys.CoreData, CoreData)
+register_accessor(HashDBKeys.PokeDex, PokedexSaveDataAccessor)
+
+
+class BlockViews:
+    """The typed views of the blocks of one HashDB, parsed on first access."""
+
+    def __init__(self, hash_db: HashDB):
+        self.hash_db = hash_db
+        self.views: dict[int, Any] = {}
+        self.touched: set[int] = set()
+        self.syncing: set[int] = set()     # blocks being written from their view (not a change underneath)
+
+    def get_key(self, key: int | Enum) -> int:
+        return self.hash_db[key].key
+
+    def get(self, key: int | Enum, default: Any = None) -> Any:
+        """Gets the view of a block, parsing it on first access; default if the save has no such block."""
+        try:
+            block = self.hash_db[key]
+        except KeyError:
+            return default
+        view = self.views.get(block.key)
+        if view is None:
+            accessor_type = get_accessor_type(block.key)
+            if accessor_type is None:
+                raise KeyError(f"No accessor registered for block 0x{block.key:08X}")
+            view = self.views[block.key] = accessor_type.from_bytes(block.data)
+        return view
+
+    def __getitem__(self, key: int | Enum) -> Any:
+        view = self.get(key)
+        if view is None:
+            raise KeyError(f"The save has no block {key}")
+        return view
+
+    def peek(self, key: int | Enum) -> Any:
+        """Gets the view of a block if it was already parsed, without parsing it."""
+        return self.views.get(key.value if isinstance(key, Enum) else key)
+
+    def touch(self, key: int | Enum) -> None:
+        """Marks a view as modified in memory, so that flush writes it back."""
+        self.touched.add(self.get_key(key))
+
+    def invalidate(self, key: int | Enum) -> None:
+        """Drops the view of a block (and its unflushed changes); it is parsed again on next access."""
+        key = key.value if isinstance(key, Enum) else key
+        self.views.pop(key, None)
+        self.touched.discard(key)
+
+    def clear(self) -> None:
+        self.views.clear()
+        self.touched.clear()
+
+    def reload(self, key: int | Enum, start: int = 0, end: Optional[int] = None) -> None:
+        """
+        Follows a change of the bytes [start, end) of a block (the whole block by default): the view
+        reloads that range if it can, or is dropped.
+        """
+        key = key.value if isinstance(key, Enum) else key
+        view = self.views.get(key)
+        if view is None:
+            return
+        reload_range = getattr(view, "reload_range", None)
+        try:
+            raw = self.hash_db[key].raw
+        except KeyError:
+            raw = None
+        if reload_range is not None and raw is not None and key not in self.touched:
+            reload_range(raw, start, len(raw) if end is None else end)
+        else:
+            self.invalidate(key)
+
+    def on_block_changed(self, key: int, offset: int, data: bytes) -> None:
+        """Follows a write into a block (signature of a BlockHistory listener), see reload."""
+        if key not in self.syncing:
+            self.reload(key, offset, offset + len(data))
+
+    @contextmanager
+    def sync(self, key: int | Enum) -> Iterator[None]:
+        """Writes made to the block in this context come from its view: the view is kept as it is."""
+        key = self.get_key(key)
+        self.syncing.add(key)
+        try:
+            yield
+        finally:
+            self.syncing.discard(key)
+
+    def flush(self, write: Optional[Callable[[int, bytes], object]] = None) -> list[int]:
+        """
+        Writes the touched views back into their blocks (only the ones whose bytes differ); returns
+        the keys written. write(key, data) replaces SCBlock.change_data, e.g. BlockHistory.change_data.
+        """
+        written = []
+        for key in sorted(self.touched):
+            data = self.views[key].to_bytes()
+            block = self.hash_db[key]
+            if data != bytes(block.raw):
+                with self.sync(key):
+                    if write is not None:
+                        write(key, data)
+                    else:
+                        block.change_data(data)
+                written.append(key)
+        self.touched.clear()
+        return written
@@ -0,0 +1,194 @@
+import heapq
+import unicodedata
+from typing import Callable, Iterable, Mapping, Optional
+
+
+class ItemSearchIndex:
+    """
+    Typo-tolerant, ranked item name search.
+
+    Every word start of every name is indexed through a deletion neighbourhood of its first
+    characters (symmetric delete), so a query only has to look up the deletions of its own prefix
+    instead of computing an edit distance against the whole catalog. Candidates are then verified
+    with a bounded prefix edit distance and the best ones are kept with a heap.
+
+    Names that contain the query as is (plain substring matching, as the filters always did) are
+    always part of the results, ranked before the typo-tolerant matches.
+
+    Non-ASCII (CJK) characters each start a token and carry more information per character, so
+    they use a shorter indexed prefix and tolerate fewer edits.
+    """
+
+    PREFIX_LENGTH = 7
+    MAX_EDITS = 2
+    WIDE_PREFIX_LENGTH = 3
+    WIDE_MAX_EDITS = 1
+    SEPARATORS = " -_'.,:/()"
+    IGNORED_NAMES = ("？？？", "???")
+
+    def __init__(self, names: Mapping[int, Iterable[str]]):
+        self.entries: list[tuple[int, str, tuple[int, ...]]] = []
+        self.index: dict[str, set[int]] = {}
+
+        for item_id, item_names in names.items():
+            seen = set()
+            for name in item_names:
+                if not name or name in self.IGNORED_NAMES:
+                    continue
+                normalized = self.normalize(name)
+                if not normalized or normalized in seen:
+                    continue
+                seen.add(normalized)
+                self._add_entry(item_id, normalized)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Case-folds the text and strips accents and full-width forms."""
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(c for c in text if not unicodedata.combining(c))
+        return " ".join(text.casefold().split())
+
+    @classmethod
+    def get_token_starts(cls, name: str) -> tuple[int, ...]:
+        """Gets the positions a match may start at: word starts, and every non-ASCII (CJK) character."""
+        starts = []
+        for i, c in enumerate(name):
+            if c in cls.SEPARATORS:
+                continue
+            if i == 0 or name[i - 1] in cls.SEPARATORS or not c.isascii():
+                starts.append(i)
+        return tuple(starts)
+
+    @classmethod
+    def get_limits(cls, text: str) -> tuple[int, int]:
+        """Gets the indexed prefix length and the edit budget of a token or query starting the text."""
+        if text[:1].isascii():
+            return cls.PREFIX_LENGTH, cls.MAX_EDITS
+        return cls.WIDE_PREFIX_LENGTH, cls.WIDE_MAX_EDITS
+
+    @classmethod
+    def get_max_edits(cls, query: str) -> int:
+        """Gets the number of typos tolerated for a normalized query."""
+        # A CJK character weighs about as much as two latin letters.
+        weight = sum(1 if c.isascii() else 2 for c in query)
+        if weight <= 2:
+            return 0
+        if weight <= 5:
+            return 1
+        return cls.get_limits(query)[1]
+
+    @staticmethod
+    def get_deletes(text: str, max_edits: int) -> set[str]:
+        """Gets every string obtained by deleting up to max_edits characters (never all of them)."""
+        result = {text}
+        level = {text}
+        for _ in range(min(max_edits, len(text) - 1)):
+            level = {s[:i] + s[i + 1:] for s in level for i in range(len(s))}
+            result |= level
+        return result
+
+    def _add_entry(self, item_id: int, name: str) -> None:
+        entry_index = len(self.entries)
+        starts = self.get_token_starts(name)
+        self.entries.append((item_id, name, starts))
+
+        keys = set()
+        for start in starts:
+            prefix_length, max_edits = self.get_limits(name[start:])
+            # The prefixes of the deletions of a segment are the deletions of its prefixes.
+            for deletion in self.get_deletes(name[start:start + prefix_length], max_edits):
+                keys.update(deletion[:length] for length in range(1, len(deletion) + 1))
+        for key in keys:
+            self.index.setdefault(key, set()).add(entry_index)
+
+    @staticmethod
+    def prefix_distance(query: str, text: str, max_edits: int) -> int:
+        """
+        Gets the smallest edit distance (with transpositions) between the query and any prefix
+        of the text, or max_edits + 1 if it is larger than max_edits.
+        """
+        width = min(len(text), len(query) + max_edits)
+        previous2 = None
+        previous = list(range(width + 1))
+        for i in range(1, len(query) + 1):
+            current = [i] + [0] * width
+            qc = query[i - 1]
+            for j in range(1, width + 1):
+                tc = text[j - 1]
+                cost = 0 if qc == tc else 1
+                value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+                if (previous2 is not None and j > 1 and qc == text[j - 2]
+                        and query[i - 2] == tc):
+                    value = min(value, previous2[j - 2] + 1)
+                current[j] = value
+            if min(current) > max_edits:
+                return max_edits + 1
+            previous2, previous = previous, current
+        return min(previous)
+
+    def score(self, query: str, entry_index: int, max_edits: int) -> Optional[tuple]:
+        """Scores an entry against a normalized query, lower is better; None if it does not match."""
+        item_id, name, starts = self.entries[entry_index]
+        best = None
+        for start in starts:
+            distance = self.prefix_distance(query, name[start:], max_edits)
+            if distance > max_edits:
+                continue
+            # Prefix bonus: matching the start of the name beats matching a later word.
+            key = (1 + distance, 0 if start == 0 else 1, len(name), item_id)
+            if best is None or key < best:
+                best = key
+        return best
+
+    def find_substrings(self, query: str, allowed: Optional[Callable[[int], bool]] = None) -> dict[int, tuple]:
+        """Gets the items whose names contain the normalized query, with their ranking keys."""
+        found: dict[int, tuple] = {}
+        for item_id, name, starts in self.entries:
+            position = name.find(query)
+            if position < 0 or (allowed is not None and not allowed(item_id)):
+                continue
+            # The start of the name beats the start of a later word, which beats the middle of a word.
+            if position == 0:
+                rank = 0
+            else:
+                rank = 1 if any(name.startswith(query, start) for start in starts) else 2
+            key = (0, rank, len(name), item_id)
+            if item_id not in found or key < found[item_id]:
+                found[item_id] = key
+        return found
+
+    def search(self, query: str, limit: Optional[int] = 20,
+               allowed: Optional[Callable[[int], bool]] = None) -> list[int]:
+        """
+        Gets the ids of the best matching items, best first: every item whose name contains the
+        query (even beyond limit), then the typo-tolerant matches up to limit.
+
+        If allowed is given, only item ids it accepts are ranked.
+        """
+        query = self.normalize(query)
+        if not query:
+            return []
+        substrings = self.find_substrings(query, allowed)
+
+        max_edits = self.get_max_edits(query)
+        prefix_length = self.get_limits(query)[0]
+        candidates = set()
+        # Only the part of the query that always aligns inside an indexed prefix is looked up.
+        for key in self.get_deletes(query[:max(prefix_length - max_edits, 1)], max_edits):
+            candidates |= self.index.get(key, set())
+
+        best: dict[int, tuple] = {}
+        for entry_index in candidates:
+            item_id = self.entries[entry_index][0]
+            if item_id in substrings or (allowed is not None and not allowed(item_id)):
+                continue
+            key = self.score(query, entry_index, max_edits)
+            if key is not None and (item_id not in best or key < best[item_id]):
+                best[item_id] = key
+
+        ranked = sorted(substrings.values())
+        if limit is None:
+            ranked += sorted(best.values())
+        elif len(ranked) < limit:
+            ranked += heapq.nsmallest(limit - len(ranked), best.values())
+        return [key[-1] for key in ranked]
@@ -0,0 +1,51 @@
+import mmap
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Iterable, Iterator, Optional
+
+from .crypto import SwishCrypto
+from .savefile import SAVE_FILE_MAGIC
+
+
+def verify_file(path: str) -> dict[str, Any]:
+    """
+    Checks the magic and the SHA-256 trailer of a save file through a memory map, without copying it.
+
+    Never raises: failures are reported in the "error" field of the result.
+    """
+    start = time.perf_counter()
+    result: dict[str, Any] = {"path": path, "size": 0, "magic": False, "hash_valid": None, "error": None}
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            result["size"] = size
+            # Empty files cannot be mapped, and files this small cannot be saves anyway.
+            if size >= len(SAVE_FILE_MAGIC) + SwishCrypto.SIZE_HASH:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    result["magic"] = mapped[:len(SAVE_FILE_MAGIC)] == SAVE_FILE_MAGIC
+                    if result["magic"]:
+                        # The view must be released before the map is closed.
+                        with memoryview(mapped) as view:
+                            result["hash_valid"] = SwishCrypto.get_is_hash_valid(view)
+    except (OSError, ValueError) as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def verify_many(paths: Iterable[str], workers: Optional[int] = None) -> Iterator[dict[str, Any]]:
+    """
+    Verifies files on a thread pool (hashlib releases the GIL while hashing large buffers), yielding
+    the results in the order of paths. At most a few files per worker are mapped at the same time.
+    """
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    pending: deque[Future] = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="plaza-verify") as pool:
+        for path in paths:
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+            pending.append(pool.submit(verify_file, path))
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,175 @@
+"""
+Detects when another program rewrites an open save, and reloads only the blocks that changed.
+
+The watcher polls the size and mtime of the file. When they change, the new file is compared with
+the fingerprints taken when the save was loaded: every block span is hashed in its encrypted form
+(the static xorpad only depends on the offset modulo its period, so a block that did not move or
+change keeps its fingerprint), and only the spans that differ are decrypted and parsed. A block
+that changed on disk while it also has unsaved local changes is reported as a conflict instead of
+being overwritten.
+"""
+
+import hashlib
+import os
+from typing import Any, Iterable, Optional
+
+from .crypto import HashDB, SCBlock, SwishCrypto
+from .types import get_accessor_type
+
+Fingerprint = tuple[int, int, bytes]    # (offset modulo the xorpad period, length, digest)
+
+
+def digest(data: bytes | memoryview) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def digest_block(block: SCBlock) -> bytes:
+    """Gets a digest of the content of a block (type, sub-type and data)."""
+    return digest(bytes((block.type.value, block.sub_type.value)) + block.raw)
+
+
+def fingerprint_spans(data: bytes | memoryview) -> dict[int, tuple[int, int, Fingerprint]]:
+    """Gets the (offset, length, fingerprint) of every block of an encrypted save, by key."""
+    view = memoryview(data)
+    return {key: (offset, length, (offset % SwishCrypto.XORPAD_PERIOD, length, digest(view[offset:offset + length])))
+            for key, offset, length in SwishCrypto.iter_block_spans(view)}
+
+
+class ExternalChange:
+    """The blocks of a save that another program changed, compared with the version loaded."""
+
+    def __init__(self, data: bytes, spans: dict[int, tuple[int, int, Fingerprint]]):
+        self.data = data
+        self.spans = spans
+        self.changed: dict[int, SCBlock] = {}   # new and changed blocks, as they are on disk now
+        self.removed: set[int] = set()
+        self.conflicts: set[int] = set()        # changed on disk and locally
+        self.synced: dict[int, bytes] = {}      # digests of the blocks changed on disk as they already are locally
+
+    def __bool__(self) -> bool:
+        return bool(self.changed or self.removed)
+
+    def get_models(self, keys: Optional[Iterable[int]] = None) -> dict[int, Any]:
+        """Parses the changed blocks (among keys, if given) that have a registered accessor (see plaza.types.registry)."""
+        wanted = None if keys is None else set(keys)
+        models = {}
+        for key, block in self.changed.items():
+            model_type = get_accessor_type(key)
+            if model_type is not None and (wanted is None or key in wanted):
+                models[key] = model_type.from_bytes(bytes(block.raw))
+        return models
+
+
+class SaveWatcher:
+    def __init__(self, path: str, data: bytes, hash_db: HashDB):
+        self.path = path
+        self.hash_db = hash_db
+        self.signature: Optional[tuple[int, int]] = None
+        self.fingerprints: dict[int, Fingerprint] = {}
+        self.digests: dict[int, bytes] = {}     # content of every block in the version on disk
+        self.rebase(data, hash_db.blocks)
+
+    def get_signature(self) -> Optional[tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def rebase(self, data: bytes, blocks: Iterable[SCBlock], path: Optional[str] = None) -> None:
+        """Takes data (made of blocks) as the version on disk, e.g. after loading or writing it."""
+        if path is not None:
+            self.path = path
+        self.fingerprints = {key: fingerprint for key, (_, _, fingerprint) in fingerprint_spans(data).items()}
+        self.digests = {block.key: digest_block(block) for block in blocks}
+        self.signature = self.get_signature()
+
+    def poll(self) -> bool:
+        """Indicates if the size or mtime of the file changed since the version known."""
+        signature = self.get_signature()
+        return signature is not None and signature != self.signature
+
+    def get_local_changes(self) -> set[int]:
+        """Gets the keys of the blocks changed in memory since the version on disk."""
+        return {block.key for block in self.hash_db.blocks if self.digests.get(block.key) != digest_block(block)}
+
+    def check(self) -> Optional[ExternalChange]:
+        """
+        Reads the file if it changed and compares it block by block; returns what changed, or None.
+        A file that cannot be read yet (e.g. still being written) is tried again on the next check.
+        """
+        signature = self.get_signature()
+        if signature is None or signature == self.signature:
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+            spans = fingerprint_spans(data)
+        except (OSError, ValueError):
+            return None
+
+        change = ExternalChange(data, spans)
+        view = memoryview(data)
+        for key, (offset, length, fingerprint) in spans.items():
+            if self.fingerprints.get(key) == fingerprint:
+                continue
+            encoded = SwishCrypto.crypt_static_xorpad_range(view[offset:offset + length], offset)
+            block = SCBlock.read_from_offset(encoded, 0)[0]
+            new_digest = digest_block(block)
+            if new_digest == self.digests.get(key):
+                continue    # moved, not changed
+            try:
+                local = self.hash_db[key]
+            except KeyError:
+                local = None
+            local_digest = digest_block(local) if local is not None else None
+            if local_digest == new_digest:
+                change.synced[key] = new_digest     # already what is in memory (e.g. written by us)
+                continue
+            change.changed[key] = block
+            if local is not None and local_digest != self.digests.get(key):
+                change.conflicts.add(key)
+        change.removed = {key for key in self.digests if key not in spans}
+
+        self.signature = signature
+        if not change:
+            self.accept(change)
+        return change or None
+
+    def accept(self, change: ExternalChange, keep: Iterable[int] = ()) -> list[int]:
+        """
+        Loads the changed blocks into the HashDB, except the keys in keep (local changes that win over
+        the ones on disk); the new file becomes the version on disk. Returns the keys reloaded.
+        """
+        keep = set(keep)
+        reloaded = []
+        for key, block in change.changed.items():
+            if key in keep:
+                continue
+            try:
+                local = self.hash_db[key]
+            except KeyError:
+                continue
+            local.type, local.sub_type = block.type, block.sub_type
+            local.raw[:] = block.raw
+            reloaded.append(key)
+
+        added = [key for key in change.changed if key not in keep and key not in reloaded]
+        removed = [key for key in change.removed if key not in keep]
+        if added or removed:
+            # The set of blocks changed: follow the order of the file, keeping local blocks kept.
+            current = {block.key: block for block in self.hash_db.blocks}
+            blocks = [current.get(key) or change.changed[key] for key in change.spans
+                      if key in current or key in change.changed]
+            blocks += [block for block in self.hash_db.blocks if block.key not in change.spans and block.key in keep]
+            self.hash_db.blocks[:] = blocks
+            self.hash_db.db = {f"{block.key:08X}": block for block in blocks}
+            reloaded += added + removed
+
+        self.fingerprints = {key: fingerprint for key, (_, _, fingerprint) in change.spans.items()}
+        for key in change.removed:
+            self.digests.pop(key, None)
+        for key, block in change.changed.items():
+            self.digests[key] = digest_block(block)
+        self.digests.update(change.synced)
+        return reloaded
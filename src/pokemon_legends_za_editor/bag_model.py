@@ -0,0 +1,113 @@
+"""
+宝可梦传说 Z-A 存档编辑器背包列表模型
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .virtual_tree import VirtualListModel
+
+
+class BagListModel(VirtualListModel):
+    """背包物品列表的虚拟数据模型"""
+
+    COLUMNS = ("ID", "名称", "数量", "类别")
+    ALL_CATEGORIES = "全部"
+
+    def __init__(self, get_item_name: Callable[[int], str], get_category_name: Callable[[Any], str],
+                 search: Callable[[str, Callable[[int], bool]], List[int]]):
+        super().__init__()
+        self.get_item_name = get_item_name
+        self.get_category_name = get_category_name
+        self.search = search
+
+        self.rows: Dict[int, Tuple[Any, ...]] = {}
+        self.category_filter = self.ALL_CATEGORIES
+        self.search_term = ""
+        self.sort_column: Optional[str] = None
+        self.sort_reverse = False
+
+    def load(self, bag_save) -> None:
+        """从背包数据重建所有行"""
+        self.rows = {}
+        if bag_save:
+            for i, entry in enumerate(bag_save.entries):
+                if entry.quantity > 0:
+                    self.rows[i] = self.make_row(i, entry)
+        self.selection &= self.rows.keys()
+        self.apply()
+
+    def show_skeleton(self, count: int) -> None:
+        """在存档解析完成前显示占位行"""
+        self.rows = {-(i + 1): ("", "加载中…", "", "") for i in range(count)}
+        self.selection = set()
+        self.order = list(self.rows)
+
+    def make_row(self, item_id: int, entry) -> Tuple[Any, ...]:
+        return (item_id, self.get_item_name(item_id), entry.quantity, self.get_category_name(entry.category))
+
+    def values(self, row_id: int) -> Tuple[Any, ...]:
+        return self.rows[row_id]
+
+    def patch(self, bag_save, item_ids) -> bool:
+        """
+        只更新指定条目的行。
+
+        返回 True 表示显示顺序发生了变化（需要刷新可见窗口），
+        返回 False 表示只有这些行的显示值变了。
+        """
+        reorder = False
+        for item_id in item_ids:
+            entry = bag_save.get_entry(item_id)
+            old_row = self.rows.get(item_id)
+            if entry is None or entry.quantity <= 0:
+                if old_row is not None:
+                    del self.rows[item_id]
+                    self.selection.discard(item_id)
+                    reorder = True
+                continue
+
+            row = self.make_row(item_id, entry)
+            self.rows[item_id] = row
+            if old_row is None or self.matches_category(old_row) != self.matches_category(row):
+                reorder = True
+            elif self.sort_column is not None:
+                column = self.COLUMNS.index(self.sort_column)
+                reorder = reorder or old_row[column] != row[column]
+
+        if reorder:
+            self.apply()
+        return reorder
+
+    def set_filter(self, category: str, search_term: str) -> None:
+        """设置类别和搜索筛选"""
+        self.category_filter = category or self.ALL_CATEGORIES
+        self.search_term = search_term.strip()
+        self.apply()
+
+    def sort_by(self, column: str) -> None:
+        """按列排序，再次点击同一列时反转顺序"""
+        if column == self.sort_column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        self.apply()
+
+    def matches_category(self, row: Tuple[Any, ...]) -> bool:
+        return self.category_filter == self.ALL_CATEGORIES or row[3] == self.category_filter
+
+    def apply(self) -> None:
+        """重新计算筛选和排序后的显示顺序"""
+        visible = {item_id for item_id, row in self.rows.items() if self.matches_category(row)}
+
+        if self.search_term:
+            # 搜索结果按匹配度排序
+            order = self.search(self.search_term, visible.__contains__)
+        else:
+            order = sorted(visible)
+
+        if self.sort_column is not None:
+            column = self.COLUMNS.index(self.sort_column)
+            order.sort(key=lambda item_id: self.rows[item_id][column], reverse=self.sort_reverse)
+
+        self.order = order
@@ -0,0 +1,47 @@
+"""
+宝可梦传说 Z-A 存档编辑器物品目录模型
+"""
+
+from typing import Any, Callable, Dict, List, Tuple
+
+from .virtual_tree import VirtualListModel
+
+
+class ItemCatalog:
+    """物品目录的预计算行：按ID排序，每次加载物品数据库时只构建一次，由所有对话框共享"""
+
+    COLUMNS = ("ID", "名称", "类别")
+
+    def __init__(self, item_database, get_item_name: Callable[[int], str],
+                 get_category_name: Callable[[Any], str]):
+        self.ids: List[int] = sorted(item_database)
+        self.rows: Dict[int, Tuple[Any, ...]] = {
+            item_id: (item_id, get_item_name(item_id),
+                      get_category_name(item_database[item_id]["expected_category"]))
+            for item_id in self.ids
+        }
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self.rows
+
+
+class CatalogListModel(VirtualListModel):
+    """对话框中的目录视图：只保存当前显示的ID顺序，行数据来自共享的 ItemCatalog"""
+
+    def __init__(self, catalog: ItemCatalog, search: Callable[[str], List[int]]):
+        super().__init__()
+        self.catalog = catalog
+        self.search = search
+        self.search_term = ""
+        # 未筛选时直接使用目录的ID列表（不复制，也不修改）
+        self.order = catalog.ids
+
+    def values(self, row_id: int) -> Tuple[Any, ...]:
+        return self.catalog.rows[row_id]
+
+    def set_search(self, search_term: str) -> None:
+        """按搜索结果筛选；清空搜索时恢复按ID排序的完整目录"""
+        self.search_term = search_term.strip()
+        self.order = self.search(self.search_term) if self.search_term else self.catalog.ids
+        if self.selection:
+            self.selection &= set(self.order)
@@ -10,93 +10,154 @@
 - 安全存档
 """
 
+import argparse
+import importlib.util
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
 import json
 import os
 import sys
 import threading
+import time
 from typing import Dict, Any, Optional
-import shutil
 
 plaza_path = os.path.join(os.path.dirname(__file__), "..")
 if plaza_path not in sys.path:
     sys.path.insert(0, plaza_path)
 
-try:
-    from plaza.crypto import HashDB, SwishCrypto
-    from plaza.types import BagEntry, BagSave, CategoryType, CoreData
-    from plaza.types.accessors import HashDBKeys
-    from plaza.util.items import item_db
-except ImportError as e:
-    print(f"导入 plaza 库时出错: {e}")
+from pokemon_legends_za_editor.startup import profile
+
+# plaza 在首次使用时才导入（首次绘制后会在后台预加载），这里只确认它存在
+if importlib.util.find_spec("plaza") is None:
+    print("导入 plaza 库时出错: 找不到 plaza 模块")
     sys.exit(1)
 
-SAVE_FILE_MAGIC = bytes([0x17, 0x2D, 0xBB, 0x06, 0xEA])
+from pokemon_legends_za_editor.bag_model import BagListModel
+from pokemon_legends_za_editor.catalog_model import CatalogListModel, ItemCatalog
+from pokemon_legends_za_editor.plza_config import (BACKUP_CONFIG, HISTORY_CONFIG, JOURNAL_CONFIG, SAVE_CONFIG,
+                                                     STARTUP_CONFIG, WATCH_CONFIG)
+from pokemon_legends_za_editor.saver import WriteBehindSaver
+from pokemon_legends_za_editor.tasks import TaskRunner
+from pokemon_legends_za_editor.virtual_tree import DebouncedCall, VirtualTreeview
 
 class PLZASaveEditor:
+    FILTER_DELAY_MS = 150
+    
     def __init__(self, root):
         self.root = root
         self.root.title("宝可梦传说 Z-A 存档编辑器")
         self.root.geometry("1200x800")
         self.root.configure(bg="#f0f0f0")
         
+        self.save_file_obj = None
         self.save_data = None
         self.hash_db = None
-        self.bag_save = None
-        self.core_data = None
+        # 块的类型化视图（背包、玩家数据、图鉴……），首次访问时解析（见 bag_save 和 core_data）
+        self.views = None
         self.save_file_path = None
         self.is_modified = False
         
-        self.item_database = item_db
-        
-        # 加载中文物品数据库
-        self.item_database_cn = {}
-        cn_db_path = os.path.join(os.path.dirname(__file__), "..", "plaza", "util", "item_db_cn.json")
-        try:
-            with open(cn_db_path, 'r', encoding='utf-8') as f:
-                self.item_database_cn = json.load(f)
-        except Exception as e:
-            print(f"加载中文物品数据库失败: {e}")
-            self.item_database_cn = {}
-        
+        # 物品数据库在首次使用时加载（见 load_catalogs）
+        self._item_database = None
+        self._item_database_cn = None
+        self.catalog_lock = threading.Lock()
+        self.preload_thread = None
+        self.item_catalog = None
+        self.search_index = None
+        
+        # 背包修改通知：同一 Tk 轮次内的多次修改合并为一次 after_idle 刷新
+        self.bag_dirty_ids = set()
+        self.bag_flush_job = None
+        
+        # 撤销/重做：背包条目的修改同步写入块并记录字节差异，每个 Tk 轮次为一个事务
+        self.history = None
+        self.restoring_history = False
+        # 崩溃日志：块的每次修改都追加到存档旁的日志中，异常退出后下次打开时可以恢复
+        self.journal = None
+        self.journal_error_reported = False
+        # 外部修改检测：其他程序改写存档时只重新加载变化的块
+        self.watcher = None
+        self.watch_job = None
+        self.player_data_modified = False
+        
+        # 加载、保存等耗时操作在后台线程中运行
+        self.tasks = TaskRunner(self.root)
+        self.current_task = None
+        # 保存在专用写入线程中进行，连续保存合并为最新的快照
+        self.saver = WriteBehindSaver(self.root, in_place=SAVE_CONFIG["in_place_writes"])
+        self.loading = False
+        
+        # 界面变量和列表模型与标签页控件分开创建，未构建的标签页也能接收数据
+        self.create_variables()
         self.create_widgets()
         self.update_status("就绪 - 请加载存档文件以开始")
         
+        # 首次绘制之后再在后台加载 plaza 和物品数据库
+        self.root.after(STARTUP_CONFIG["preload_delay_ms"], self.start_preload)
+        
+    def create_variables(self):
+        """创建界面变量和数据模型"""
+        self.status_var = tk.StringVar()
+        self.progress_var = tk.DoubleVar()
+        
+        self.player_name_var = tk.StringVar()
+        self.gender_var = tk.StringVar()
+        self.player_id_var = tk.StringVar()
+        self.money_var = tk.StringVar()
+        self.mega_power_var = tk.StringVar()
+        
+        self.search_var = tk.StringVar()
+        self.bag_model = BagListModel(
+            self.get_item_name,
+            self.get_category_name,
+            lambda term, allowed: self.get_search_index().search(term, limit=None, allowed=allowed)
+        )
+        self.bag_view = None
+        
+        self.info_text = None
+        self.info_content = ""
+        
     def create_widgets(self):
         """创建主界面"""
         # 菜单栏
         self.create_menu()
         
-        # 主框架与标签页
+        # 主框架与标签页（标签页内容在首次选中时才构建）
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.tab_builders = {}
         
-        # 玩家信息标签页
-        self.player_frame = ttk.Frame(self.notebook)
-        self.notebook.add(self.player_frame, text="玩家")
-        self.create_player_tab()
-        
-        # 背包（物品）标签页
-        self.bag_frame = ttk.Frame(self.notebook)
-        self.notebook.add(self.bag_frame, text="背包")
-        self.create_bag_tab()
-        
-        # 宝可梦标签页
-        self.pokemon_frame = ttk.Frame(self.notebook)
-        self.notebook.add(self.pokemon_frame, text="宝可梦")
-        self.create_pokemon_tab()
+        self.player_frame = self.add_tab("玩家", self.create_player_tab)
+        self.bag_frame = self.add_tab("背包", self.create_bag_tab)
+        self.pokemon_frame = self.add_tab("宝可梦", self.create_pokemon_tab)
+        self.tools_frame = self.add_tab("工具", self.create_tools_tab)
         
-        # 工具标签页
-        self.tools_frame = ttk.Frame(self.notebook)
-        self.notebook.add(self.tools_frame, text="工具")
-        self.create_tools_tab()
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+        self.on_tab_changed()
         
         # Barre de statut
-        self.status_var = tk.StringVar()
-        self.status_bar = ttk.Label(self.root, textvariable=self.status_var, relief=tk.SUNKEN)
-        self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
-        
+        status_frame = ttk.Frame(self.root)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        self.status_bar = ttk.Label(status_frame, textvariable=self.status_var, relief=tk.SUNKEN)
+        self.status_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        # 后台任务进度（仅在任务运行时显示）
+        self.progress_bar = ttk.Progressbar(status_frame, variable=self.progress_var, maximum=1.0, length=200)
+        self.cancel_button = ttk.Button(status_frame, text="取消", command=self.cancel_task)
+        
+    def add_tab(self, text: str, builder):
+        """添加标签页，内容由 builder 在首次选中时构建"""
+        frame = ttk.Frame(self.notebook)
+        self.notebook.add(frame, text=text)
+        self.tab_builders[str(frame)] = builder
+        return frame
+        
+    def on_tab_changed(self, event=None):
+        """首次选中标签页时构建其内容"""
+        builder = self.tab_builders.pop(str(self.notebook.select()), None)
+        if builder:
+            builder()
+            
     def create_menu(self):
         """创建菜单栏"""
         menubar = tk.Menu(self.root)
@@ -114,6 +175,9 @@ class PLZASaveEditor:
         
         edit_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="编辑", menu=edit_menu)
+        edit_menu.add_command(label="撤销", command=self.undo, accelerator="Ctrl+Z")
+        edit_menu.add_command(label="重做", command=self.redo, accelerator="Ctrl+Y")
+        edit_menu.add_separator()
         edit_menu.add_command(label="重置背包", command=self.reset_bag)
         edit_menu.add_command(label="添加所有物品", command=self.add_all_items)
         edit_menu.add_command(label="金钱最大化", command=self.max_money)
@@ -124,6 +188,8 @@ class PLZASaveEditor:
         
         self.root.bind('<Control-o>', lambda e: self.open_save_file())
         self.root.bind('<Control-s>', lambda e: self.save_file())
+        self.root.bind('<Control-z>', lambda e: self.undo())
+        self.root.bind('<Control-y>', lambda e: self.redo())
         
     def create_player_tab(self):
         """创建玩家信息标签页"""
@@ -136,14 +202,12 @@ class PLZASaveEditor:
         
         # 玩家名称
         ttk.Label(info_frame, text="名称:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
-        self.player_name_var = tk.StringVar()
         self.player_name_entry = ttk.Entry(info_frame, textvariable=self.player_name_var, width=30)
         self.player_name_entry.grid(row=0, column=1, padx=5, pady=5)
         self.player_name_entry.bind('<KeyRelease>', self.on_player_data_changed)
         
         # 性别
         ttk.Label(info_frame, text="性别:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
-        self.gender_var = tk.StringVar()
         self.gender_combo = ttk.Combobox(info_frame, textvariable=self.gender_var, 
                                         values=["男性", "女性"], state="readonly")
         self.gender_combo.grid(row=1, column=1, padx=5, pady=5, sticky=tk.W)
@@ -151,7 +215,6 @@ class PLZASaveEditor:
         
         # 玩家ID
         ttk.Label(info_frame, text="ID:").grid(row=2, column=0, sticky=tk.W, padx=5, pady=5)
-        self.player_id_var = tk.StringVar()
         self.player_id_label = ttk.Label(info_frame, textvariable=self.player_id_var)
         self.player_id_label.grid(row=2, column=1, sticky=tk.W, padx=5, pady=5)
         
@@ -161,7 +224,6 @@ class PLZASaveEditor:
         
         # 金钱
         ttk.Label(stats_frame, text="金钱:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
-        self.money_var = tk.StringVar()
         self.money_entry = ttk.Entry(stats_frame, textvariable=self.money_var, width=15)
         self.money_entry.grid(row=0, column=1, padx=5, pady=5)
         self.money_entry.bind('<KeyRelease>', self.on_player_data_changed)
@@ -171,7 +233,6 @@ class PLZASaveEditor:
         
         # 星尘（如适用）
         ttk.Label(stats_frame, text="超能力:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
-        self.mega_power_var = tk.StringVar()
         self.mega_power_entry = ttk.Entry(stats_frame, textvariable=self.mega_power_var, width=15)
         self.mega_power_entry.grid(row=1, column=1, padx=5, pady=5)
         self.mega_power_entry.bind('<KeyRelease>', self.on_player_data_changed)
@@ -186,15 +247,17 @@ class PLZASaveEditor:
         
         ttk.Label(control_frame, text="类别:").pack(side=tk.LEFT, padx=(0, 5))
         self.category_filter = ttk.Combobox(control_frame, values=["全部", "药品", "精灵球", "其他", "拾取", "重要物品", "树果", "招式学习器", "超级"], state="readonly")
-        self.category_filter.set("全部")
+        self.category_filter.set(self.bag_model.category_filter)
         self.category_filter.pack(side=tk.LEFT, padx=(0, 10))
-        self.category_filter.bind('<<ComboboxSelected>>', self.filter_items)
         
         ttk.Label(control_frame, text="搜索:").pack(side=tk.LEFT, padx=(10, 5))
-        self.search_var = tk.StringVar()
         self.search_entry = ttk.Entry(control_frame, textvariable=self.search_var, width=30)
         self.search_entry.pack(side=tk.LEFT, padx=(0, 10))
-        self.search_entry.bind('<KeyRelease>', self.filter_items)
+        
+        # 筛选经过防抖：快速输入时只在停顿后执行一次，之前排队的筛选会被取消
+        self.schedule_filter = DebouncedCall(self.root, self.FILTER_DELAY_MS, self.filter_items)
+        self.category_filter.bind('<<ComboboxSelected>>', self.schedule_filter)
+        self.search_entry.bind('<KeyRelease>', self.schedule_filter)
         
         button_frame = ttk.Frame(control_frame)
         button_frame.pack(side=tk.RIGHT)
@@ -203,34 +266,15 @@ class PLZASaveEditor:
         ttk.Button(button_frame, text="删除", command=self.remove_selected_item).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="修改", command=self.modify_selected_item).pack(side=tk.LEFT, padx=5)
         
-        tree_container = ttk.Frame(main_frame)
-        tree_container.pack(fill=tk.BOTH, expand=True)
-        
-        columns = ("ID", "名称", "数量", "类别")
-        self.items_tree = ttk.Treeview(tree_container, columns=columns, show="headings", height=20)
-        
-        self.items_tree.heading("ID", text="ID")
-        self.items_tree.heading("名称", text="名称")
-        self.items_tree.heading("数量", text="数量")
-        self.items_tree.heading("类别", text="类别")
-        
-        self.items_tree.column("ID", width=80)
-        self.items_tree.column("名称", width=300)
-        self.items_tree.column("数量", width=100)
-        self.items_tree.column("类别", width=150)
-        
-        v_scroll = ttk.Scrollbar(tree_container, orient=tk.VERTICAL, command=self.items_tree.yview)
-        h_scroll = ttk.Scrollbar(tree_container, orient=tk.HORIZONTAL, command=self.items_tree.xview)
-        self.items_tree.configure(yscrollcommand=v_scroll.set, xscrollcommand=h_scroll.set)
-        
-        self.items_tree.grid(row=0, column=0, sticky="nsew")
-        v_scroll.grid(row=0, column=1, sticky="ns")
-        h_scroll.grid(row=1, column=0, sticky="ew")
-        
-        tree_container.grid_rowconfigure(0, weight=1)
-        tree_container.grid_columnconfigure(0, weight=1)
+        # 虚拟列表：只有可见的行存在于 Treeview 中
+        self.bag_view = VirtualTreeview(
+            main_frame, self.bag_model, BagListModel.COLUMNS,
+            widths={"ID": 80, "名称": 300, "数量": 100, "类别": 150}, height=20
+        )
+        self.bag_view.pack(fill=tk.BOTH, expand=True)
         
-        self.items_tree.bind('<Double-1>', lambda e: self.modify_selected_item())
+        self.bag_view.bind_tree('<Double-1>', lambda e: self.modify_selected_item())
+        self.bag_view.refresh()
         
     def create_pokemon_tab(self):
         """创建宝可梦标签页"""
@@ -268,6 +312,74 @@ class PLZASaveEditor:
         
         self.info_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         info_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.info_text.insert(1.0, self.info_content)
+        
+    def set_info_text(self, text: str):
+        """设置文件信息（工具标签页尚未构建时只保存内容）"""
+        self.info_content = text
+        if self.info_text is not None:
+            self.info_text.delete(1.0, tk.END)
+            self.info_text.insert(1.0, text)
+            
+    def refresh_bag_view(self, reset: bool = False):
+        """刷新背包列表（背包标签页尚未构建时跳过，构建时会显示当前模型）"""
+        if self.bag_view is not None:
+            self.bag_view.refresh(reset)
+            
+    @property
+    def item_database(self):
+        """英文物品数据库（首次使用时加载）"""
+        if self._item_database is None:
+            self.load_catalogs()
+        return self._item_database
+        
+    @property
+    def item_database_cn(self):
+        """中文物品数据库（首次使用时加载）"""
+        if self._item_database_cn is None:
+            self.load_catalogs()
+        return self._item_database_cn
+        
+    def load_catalogs(self):
+        """加载物品数据库（可在预加载线程中调用）"""
+        with self.catalog_lock:
+            if self._item_database is None:
+                from plaza.util.items import item_db
+                self._item_database = item_db
+                
+            if self._item_database_cn is None:
+                # 加载中文物品数据库
+                cn_db_path = os.path.join(os.path.dirname(__file__), "..", "plaza", "util", "item_db_cn.json")
+                try:
+                    with open(cn_db_path, 'r', encoding='utf-8') as f:
+                        self._item_database_cn = json.load(f)
+                except Exception as e:
+                    print(f"加载中文物品数据库失败: {e}")
+                    self._item_database_cn = {}
+                    
+            # 添加物品对话框共享的目录行，每次加载物品数据库时只构建一次
+            if self.item_catalog is None:
+                self.item_catalog = ItemCatalog(self._item_database, self.get_item_name, self.get_category_name)
+                
+    def get_item_catalog(self) -> ItemCatalog:
+        """获取按ID排序的物品目录"""
+        if self.item_catalog is None:
+            self.load_catalogs()
+        return self.item_catalog
+                    
+    def start_preload(self):
+        """首次绘制后在后台导入 plaza 并加载物品数据库，首次打开存档时无需再等待"""
+        self.preload_thread = threading.Thread(target=self.preload, name="plza-preload", daemon=True)
+        self.preload_thread.start()
+        
+    def preload(self):
+        try:
+            for module in ("plaza.crypto", "plaza.types", "plaza.savefile", "plaza.util.items"):
+                profile.import_module(module)
+            self.load_catalogs()
+            profile.mark("后台预加载完成")
+        except Exception as e:
+            print(f"预加载时出错: {e}")
         
     def update_status(self, message: str):
         """更新状态栏"""
@@ -277,10 +389,63 @@ class PLZASaveEditor:
     def on_player_data_changed(self, event=None):
         """标记数据已修改"""
         self.is_modified = True
+        self.player_data_modified = True
         self.update_status("数据已修改 - 请记得保存")
         
+    def start_task(self, message: str, func, on_done=None, on_error=None, on_cancelled=None, cancellable=True):
+        """在后台线程中运行任务，并在状态栏显示进度"""
+        def finish(callback):
+            def handler(*args):
+                self.current_task = None
+                self.progress_bar.pack_forget()
+                self.cancel_button.pack_forget()
+                if callback:
+                    callback(*args)
+            return handler
+            
+        def on_progress(fraction, text):
+            self.progress_var.set(fraction)
+            if text:
+                self.status_var.set(text)
+                
+        def default_error(e):
+            messagebox.showerror("错误", f"{message}出错: {str(e)}")
+            self.update_status("操作出错")
+            
+        self.progress_var.set(0.0)
+        self.progress_bar.pack(side=tk.LEFT, padx=5)
+        if cancellable:
+            self.cancel_button.pack(side=tk.LEFT, padx=(0, 5))
+        self.update_status(message)
+        
+        self.current_task = self.tasks.submit(
+            message, func,
+            on_done=finish(on_done),
+            on_error=finish(on_error or default_error),
+            on_progress=on_progress,
+            on_cancelled=finish(on_cancelled),
+            cancellable=cancellable
+        )
+        return self.current_task
+        
+    def cancel_task(self):
+        """取消当前后台任务"""
+        if self.current_task:
+            self.current_task.cancel()
+            self.update_status("正在取消...")
+            
+    def ensure_idle(self) -> bool:
+        """确认没有正在运行的后台任务或正在写入的保存"""
+        if self.tasks.busy or self.saver.busy:
+            messagebox.showwarning("警告", "请等待当前操作完成")
+            return False
+        return True
+        
     def open_save_file(self):
         """打开存档文件"""
+        if not self.ensure_idle():
+            return
+            
         file_path = filedialog.askopenfilename(
             title="打开PLZA存档文件",
             filetypes=[("存档文件", "*"), ("所有文件", "*.*")]
@@ -289,48 +454,256 @@ class PLZASaveEditor:
         if not file_path:
             return
             
-        try:
-            self.update_status("正在加载文件...")
+        self.show_loading_state()
+        self.start_task(
+            "正在加载文件...",
+            lambda task: self.load_save_task(task, file_path),
+            on_done=self.on_save_loaded,
+            on_error=self.on_load_failed,
+            on_cancelled=self.on_load_cancelled
+        )
+        
+    @staticmethod
+    def load_save_task(task, file_path: str):
+        """读取、解密并解析存档（在工作线程中运行）"""
+        from plaza.inplace import recover
+        from plaza.journal import read_journal
+        from plaza.savefile import SaveFile
+        from plaza.types import BlockViews, HashDBKeys
+        from plaza.watcher import SaveWatcher
+        
+        task.progress(0.0, "正在读取文件...")
+        # 先完成上次中断的原地写入，崩溃日志才能与磁盘上的版本对应
+        recover(file_path)
+        with open(file_path, "rb") as f:
+            data = f.read()
             
-            with open(file_path, "rb") as f:
-                data = f.read()
-                
-            if not data.startswith(SAVE_FILE_MAGIC):
-                messagebox.showerror("错误", "此文件不是有效的PLZA存档")
-                return
-                
-            # 解密数据
-            blocks = SwishCrypto.decrypt(data)
-            self.hash_db = HashDB(blocks)
+        if not SaveFile.has_magic(data):
+            raise ValueError("此文件不是有效的PLZA存档")
             
-            # 加载背包数据
-            try:
-                self.bag_save = BagSave.from_bytes(self.hash_db[HashDBKeys.BagSave].data)
-            except KeyError:
-                messagebox.showerror("错误", "无法找到背包数据")
-                return
-                
-            # 加载玩家数据
+        # 解密数据
+        task.progress(0.1, "正在解密...")
+        save_file = SaveFile.from_bytes(data, file_path, progress=lambda f: task.progress(0.1 + 0.8 * f))
+        
+        if BACKUP_CONFIG["auto_backup"] and BACKUP_CONFIG["backup_on_open"]:
+            task.progress(0.9, "正在创建备份...")
+            PLZASaveEditor.create_backup_copy(file_path, save_file.hash_db.blocks, data)
+            
+        # 视图在首次访问时解析：背包和玩家数据打开后立即显示，在这里预先解析，其他块（如图鉴）用到时才解析
+        task.progress(0.9, "正在解析背包数据...")
+        views = BlockViews(save_file.hash_db)
+        if views.get(HashDBKeys.BagSave) is None:
+            raise ValueError("无法找到背包数据")
+        # 没有玩家数据时界面显示"不可用"
+        views.get(HashDBKeys.CoreData)
+            
+        # 哈希在解析期间已于后台线程中计算，这里只等待其结果以便界面直接读取缓存
+        save_file.is_hash_valid()
+        
+        # 上次异常退出时留下的、针对这个版本的未保存修改
+        journal_records = read_journal(file_path, data) if JOURNAL_CONFIG["enabled"] else None
+        # 记录各块的指纹，之后只比较和重新解析被其他程序修改的块
+        watcher = SaveWatcher(file_path, data, save_file.hash_db) if WATCH_CONFIG["enabled"] else None
+        return save_file, views, journal_records, watcher
+        
+    def on_save_loaded(self, result):
+        """存档解析完成（在 Tk 线程中）"""
+        from plaza.history import BlockHistory
+        from plaza.journal import Journal
+        
+        save_file, views, journal_records, watcher = result
+        self.loading = False
+        
+        self.save_file_obj = save_file
+        self.hash_db = save_file.hash_db
+        self.views = views
+        self.history = BlockHistory(self.hash_db, HISTORY_CONFIG["max_bytes"])
+        # 撤销、重做和恢复修改的块时，视图随之更新（背包只重新解析变化的条目）
+        self.history.add_listener(self.views.on_block_changed)
+        # 之前存档的未保存修改随打开新存档而放弃
+        self.close_journal(discard=True)
+        self.history.add_listener(self.append_to_journal)
+        self.bag_save.add_listener(self.on_bag_entry_changed)
+        self.save_file_path = save_file.path
+        self.save_data = save_file.data
+        self.is_modified = False
+        self.player_data_modified = False
+        self.watcher = watcher
+        if watcher and self.watch_job is None:
+            self.watch_job = self.root.after(WATCH_CONFIG["poll_interval_ms"], self.check_external_changes)
+        
+        # 更新界面
+        self.update_ui_with_save_data()
+        self.update_status(f"已加载文件: {os.path.basename(save_file.path)}")
+        
+        messagebox.showinfo("成功", "存档文件已成功加载！")
+        
+        replay = bool(journal_records) and messagebox.askyesno(
+            "恢复", f"发现 {len(journal_records)} 条未保存的修改记录（编辑器上次可能异常退出）。是否恢复这些修改？")
+        # 新日志会覆盖磁盘上的旧日志，所以在用户回答之后才创建（对话框打开时崩溃，旧日志仍在）
+        if JOURNAL_CONFIG["enabled"]:
             try:
-                core_data_block = self.hash_db[HashDBKeys.CoreData]
-                self.core_data = CoreData.from_bytes(core_data_block.data)
-            except (KeyError, AttributeError):
-                # 如果CoreData不可用，创建默认数据
-                self.core_data = None
-                
-            self.save_file_path = file_path
-            self.save_data = data
-            self.is_modified = False
+                self.journal = Journal(save_file.path, save_file.data, JOURNAL_CONFIG["flush_delay_ms"] / 1000)
+                self.journal_error_reported = False
+            except OSError as e:
+                print(f"创建崩溃日志时出错: {e}")
+        if replay:
+            self.replay_journal(journal_records)
+            
+    @property
+    def bag_save(self):
+        """背包视图（BagSave）；未加载存档时为 None"""
+        from plaza.types import HashDBKeys
+        return self.views.get(HashDBKeys.BagSave) if self.views is not None else None
+        
+    @property
+    def core_data(self):
+        """玩家数据视图（CoreData）；未加载存档或存档中没有时为 None"""
+        from plaza.types import HashDBKeys
+        return self.views.get(HashDBKeys.CoreData) if self.views is not None else None
+        
+    def replay_journal(self, records):
+        """把崩溃日志中的修改作为一个可撤销的操作重新应用（同时写入新的日志）"""
+        self.restoring_history = True
+        try:
+            with self.history.transaction("恢复") as transaction:
+                for key, offset, data in records:
+                    try:
+                        self.history.write(key, offset, data)
+                    except (KeyError, ValueError):
+                        continue
+        finally:
+            self.restoring_history = False
+        if not transaction.deltas:
+            return
+            
+        self.apply_history(transaction)
+        self.update_status(f"已恢复 {len(records)} 条未保存的修改")
+        
+    def check_external_changes(self):
+        """定期检查存档是否被其他程序修改（只比较大小和修改时间，有变化时才读取文件）"""
+        self.watch_job = None
+        if not self.watcher:
+            return
+        self.watch_job = self.root.after(WATCH_CONFIG["poll_interval_ms"], self.check_external_changes)
+        # 加载、批量工具和保存期间块正在变化，下次再检查
+        if self.loading or self.tasks.busy or self.saver.busy or not self.watcher.poll():
+            return
+        change = self.watcher.check()
+        if change:
+            self.on_external_change(change)
             
-            # 更新界面
+    def on_external_change(self, change):
+        """存档被其他程序修改：重新加载变化的块；与未保存的修改冲突时询问用户"""
+        from plaza.types import HashDBKeys
+        
+        conflicts = set(change.conflicts)
+        core_key = HashDBKeys.CoreData.value
+        if self.player_data_modified and core_key in change.changed:
+            # 玩家数据的修改保存时才写入块
+            conflicts.add(core_key)
+        keep = set()
+        if conflicts:
+            names = {HashDBKeys.BagSave.value: "背包", core_key: "玩家数据", HashDBKeys.PokeDex.value: "图鉴"}
+            described = "、".join(names.get(key, f"0x{key:08X}") for key in sorted(conflicts))
+            if not messagebox.askyesno(
+                    "外部修改",
+                    f"存档文件已被其他程序修改，以下数据同时存在未保存的修改：{described}。\n\n"
+                    "是：使用磁盘上的版本（放弃这些本地修改）\n否：保留本地修改（保存时覆盖磁盘上的版本）"):
+                keep = conflicts
+                
+        reloaded = self.watcher.accept(change, keep)
+        self.save_data = change.data
+        if self.save_file_obj:
+            self.save_file_obj.replace_data(change.data)
+        self.saver.set_disk_data(self.save_file_path, change.data)
+        # 撤销历史记录的是旧版本的字节
+        self.history.clear()
+        self.reset_journal_after_reload(change.data)
+        
+        # 背包只替换变化的条目并刷新这些行，其他视图丢弃，下次访问时重新解析
+        self.restoring_history = True
+        try:
+            for key in reloaded:
+                self.views.reload(key)
+        finally:
+            self.restoring_history = False
+        if core_key in reloaded:
+            self.player_data_modified = False
             self.update_ui_with_save_data()
-            self.update_status(f"已加载文件: {os.path.basename(file_path)}")
+        else:
+            self.update_file_info()
+        self.is_modified = bool(keep or self.watcher.get_local_changes())
+        self.update_status(f"已重新加载其他程序修改的 {len(reloaded)} 个块"
+                           + (f"，保留了 {len(keep)} 个块的本地修改" if keep else ""))
+        
+    def reset_journal_after_reload(self, data: bytes):
+        """日志改为针对磁盘上的新版本，只记录仍未保存的块"""
+        if not self.journal:
+            return
+        try:
+            self.journal.reset(data, keep_from=self.journal.mark())
+            for key in self.watcher.get_local_changes():
+                self.journal.append(key, 0, self.hash_db[key].raw)
+        except OSError as e:
+            print(f"重置崩溃日志时出错: {e}")
             
-            messagebox.showinfo("成功", "存档文件已成功加载！")
+    def append_to_journal(self, key, offset, data):
+        """把块的修改追加到崩溃日志（BlockHistory 的监听器）"""
+        if self.journal is None:
+            return
+        self.journal.append(key, offset, data)
+        # 日志在写入线程中同步，失败（如磁盘已满）时在下一次修改后提示；保存后日志重建，错误随之清除
+        if self.journal.error is None:
+            self.journal_error_reported = False
+        elif not self.journal_error_reported:
+            self.journal_error_reported = True
+            self.root.after_idle(self.report_journal_error)
             
-        except Exception as e:
-            messagebox.showerror("错误", f"加载时出错: {str(e)}")
-            self.update_status("加载出错")
+    def report_journal_error(self):
+        """崩溃日志写入失败：未保存的修改在异常退出时无法恢复"""
+        if self.journal is None or self.journal.error is None:
+            return
+        self.update_status(f"崩溃日志写入失败，未保存的修改不受保护，请尽快保存: {self.journal.error}")
+        
+    def close_journal(self, discard: bool = False):
+        """关闭崩溃日志；discard 表示修改已保存或已放弃，删除日志"""
+        if self.journal is None:
+            return
+        try:
+            self.journal.close(discard=discard)
+        except OSError as e:
+            print(f"关闭崩溃日志时出错: {e}")
+        self.journal = None
+        
+    def on_load_failed(self, error):
+        self.restore_after_loading()
+        messagebox.showerror("错误", f"加载时出错: {str(error)}")
+        self.update_status("加载出错")
+        
+    def on_load_cancelled(self):
+        self.restore_after_loading()
+        self.update_status("已取消加载")
+        
+    def show_loading_state(self):
+        """加载期间显示占位内容，直到解析结果到达"""
+        self.loading = True
+        for var in (self.player_name_var, self.player_id_var, self.mega_power_var):
+            var.set("加载中…")
+        self.bag_model.show_skeleton(self.bag_view.visible_rows() if self.bag_view else 20)
+        self.refresh_bag_view(reset=True)
+        self.set_info_text("正在加载…")
+        
+    def restore_after_loading(self):
+        """加载失败或取消时恢复显示之前的存档"""
+        self.loading = False
+        if self.hash_db:
+            self.update_ui_with_save_data()
+        else:
+            for var in (self.player_name_var, self.player_id_var, self.mega_power_var):
+                var.set("")
+            self.update_items_list()
+            self.set_info_text("")
             
     def update_ui_with_save_data(self):
         """用存档数据更新界面"""
@@ -373,26 +746,73 @@ class PLZASaveEditor:
         
     def update_items_list(self):
         """更新背包物品列表"""
-        # 清空当前列表
-        for item in self.items_tree.get_children():
-            self.items_tree.delete(item)
+        self.bag_dirty_ids.clear()
+        self.bag_model.load(self.bag_save)
+        self.refresh_bag_view()
+        
+    def on_bag_entry_changed(self, item_id: int):
+        """背包条目被修改：记录并安排一次合并刷新"""
+        if self.loading:
+            return
+        if self.history and not self.restoring_history:
+            from plaza.types import HashDBKeys
+            self.history.write(HashDBKeys.BagSave, item_id * 16, self.bag_save.entries[item_id].to_bytes())
+        self.bag_dirty_ids.add(item_id)
+        if self.bag_flush_job is None:
+            self.bag_flush_job = self.root.after_idle(self.flush_bag_changes)
             
-        if not self.bag_save:
+    def flush_bag_changes(self):
+        """只更新被修改的行，并结束本轮次的撤销事务"""
+        self.bag_flush_job = None
+        if self.history:
+            self.history.commit()
+        if not self.bag_dirty_ids or not self.bag_save:
             return
             
-        # 添加物品
-        for i, entry in enumerate(self.bag_save.entries):
-            if entry.quantity > 0:
-                item_name = self.get_item_name(i)
-                category_name = self.get_category_name(entry.category)
-                
-                self.items_tree.insert("", "end", values=(
-                    i,
-                    item_name,
-                    entry.quantity,
-                    category_name
-                ))
+        item_ids, self.bag_dirty_ids = self.bag_dirty_ids, set()
+        if self.bag_model.patch(self.bag_save, item_ids):
+            self.refresh_bag_view()
+        elif self.bag_view is not None:
+            self.bag_view.refresh_rows(item_ids)
                 
+    def undo(self):
+        """撤销上一次修改"""
+        if not self.history or self.tasks.busy:
+            return
+        self.restoring_history = True
+        try:
+            transaction = self.history.undo()
+        finally:
+            self.restoring_history = False
+        if transaction is None:
+            self.update_status("没有可撤销的操作")
+            return
+        self.apply_history(transaction)
+        self.update_status("已撤销")
+        
+    def redo(self):
+        """重做上一次撤销的修改"""
+        if not self.history or self.tasks.busy:
+            return
+        self.restoring_history = True
+        try:
+            transaction = self.history.redo()
+        finally:
+            self.restoring_history = False
+        if transaction is None:
+            self.update_status("没有可重做的操作")
+            return
+        self.apply_history(transaction)
+        self.update_status("已重做")
+        
+    def apply_history(self, transaction):
+        """块已恢复（视图已由历史记录的监听器更新，背包的行随之刷新）：玩家数据变化时刷新界面"""
+        from plaza.types import HashDBKeys
+        
+        self.is_modified = True
+        if HashDBKeys.CoreData.value in transaction.get_keys():
+            self.update_ui_with_save_data()
+        
     def get_item_name(self, item_id: int) -> str:
         """通过ID获取物品名称（中文）"""
         # 优先使用中文数据库
@@ -403,8 +823,8 @@ class PLZASaveEditor:
                 return f"未知物品 ({item_id})"
             return chinese_name
         # 备用：使用英文数据库
-        elif str(item_id) in self.item_database:
-            return self.item_database[str(item_id)]["english_ui_name"]
+        elif item_id in self.item_database:
+            return self.item_database[item_id]["english_ui_name"]
         return f"未知物品 ({item_id})"
         
     def get_category_name(self, category) -> str:
@@ -426,47 +846,43 @@ class PLZASaveEditor:
         except:
             return "未知"
             
+    def get_search_index(self):
+        """获取物品名称模糊搜索索引（首次使用时构建）"""
+        if self.search_index is None:
+            from plaza.util.search import ItemSearchIndex
+            
+            names = {}
+            for item_id, item_data in self.item_database.items():
+                names.setdefault(int(item_id), []).append(item_data["english_ui_name"])
+            for item_id, item_data in self.item_database_cn.items():
+                names.setdefault(int(item_id), []).append(item_data["chinese_ui_name"])
+            self.search_index = ItemSearchIndex(names)
+        return self.search_index
+        
     def filter_items(self, event=None):
-        """按类别和搜索筛选物品"""
+        """按类别和搜索筛选物品（搜索容错拼写错误，按匹配度排序）"""
         if not self.bag_save:
             return
             
-        for item in self.items_tree.get_children():
-            self.items_tree.delete(item)
+        category, search_term = self.category_filter.get(), self.search_var.get().strip()
+        if (category, search_term) == (self.bag_model.category_filter, self.bag_model.search_term):
+            return
             
-        category_filter = self.category_filter.get()
-        search_term = self.search_var.get().lower()
+        # 筛选只改变模型中的顺序，已有的行项目只会被 detach/move
+        self.bag_model.set_filter(category, search_term)
+        self.bag_view.refresh(reset=True)
         
-        for i, entry in enumerate(self.bag_save.entries):
-            if entry.quantity > 0:
-                item_name = self.get_item_name(i)
-                category_name = self.get_category_name(entry.category)
-                
-                if category_filter != "全部" and category_name != category_filter:
-                    continue
-                    
-                if search_term and search_term not in item_name.lower():
-                    continue
-                    
-                self.items_tree.insert("", "end", values=(
-                    i,
-                    item_name,
-                    entry.quantity,
-                    category_name
-                ))
-                
     def add_item_dialog(self):
         """添加物品对话框"""
         if not self.bag_save:
             messagebox.showwarning("警告", "未加载存档文件")
             return
             
-        dialog = ItemAddDialog(self.root, self.item_database)
+        dialog = ItemAddDialog(self.root, self.get_item_catalog(), self.get_search_index)
         if dialog.result:
             item_id, quantity = dialog.result
             try:
                 self.add_item(item_id, quantity)
-                self.update_items_list()
                 self.is_modified = True
                 self.update_status("已添加物品")
             except Exception as e:
@@ -474,13 +890,15 @@ class PLZASaveEditor:
                 
     def add_item(self, item_id: int, quantity: int):
         """向背包添加物品"""
+        from plaza.types import BagEntry
+        
         if not self.bag_save:
             return
             
-        if str(item_id) not in self.item_database:
+        if item_id not in self.item_database:
             raise ValueError(f"数据库中未找到物品ID {item_id}")
             
-        expected_category = self.item_database[str(item_id)]["expected_category"]
+        expected_category = self.item_database[item_id]["expected_category"]
         
         entry = BagEntry()
         entry.quantity = quantity
@@ -490,18 +908,18 @@ class PLZASaveEditor:
         
     def modify_selected_item(self):
         """修改选中的物品"""
-        selection = self.items_tree.selection()
+        from plaza.types import BagEntry
+        
+        selection = self.bag_model.get_selected_ids()
         if not selection:
             messagebox.showwarning("警告", "请选择一个物品")
             return
             
-        item = self.items_tree.item(selection[0])
-        item_id = int(item['values'][0])
-        current_quantity = int(item['values'][2])
+        item_id, item_name, current_quantity, _ = self.bag_model.values(selection[0])
         
         new_quantity = simpledialog.askinteger(
             "修改数量",
-            f"{item['values'][1]}的新数量:",
+            f"{item_name}的新数量:",
             initialvalue=current_quantity,
             minvalue=0,
             maxvalue=999
@@ -521,7 +939,6 @@ class PLZASaveEditor:
                     entry.quantity = new_quantity
                     self.bag_save.set_entry(item_id, entry)
                     
-                self.update_items_list()
                 self.is_modified = True
                 self.update_status("已修改物品")
             except Exception as e:
@@ -529,23 +946,22 @@ class PLZASaveEditor:
                 
     def remove_selected_item(self):
         """删除选中的物品"""
-        selection = self.items_tree.selection()
+        from plaza.types import BagEntry
+        
+        selection = self.bag_model.get_selected_ids()
         if not selection:
             messagebox.showwarning("警告", "请选择一个物品")
             return
             
-        item = self.items_tree.item(selection[0])
-        item_name = item['values'][1]
+        item_id, item_name = self.bag_model.values(selection[0])[:2]
         
         if messagebox.askyesno("确认", f"删除 {item_name} ?"):
-            item_id = int(item['values'][0])
             try:
                 entry = BagEntry()
                 entry.quantity = 0
                 entry.category = 0
                 self.bag_save.set_entry(item_id, entry)
                 
-                self.update_items_list()
                 self.is_modified = True
                 self.update_status("已删除物品")
             except Exception as e:
@@ -553,50 +969,79 @@ class PLZASaveEditor:
                 
     def reset_bag(self):
         """重置背包（删除所有物品）"""
+        from plaza.types import BagEntry
+        
         if not self.bag_save:
             messagebox.showwarning("警告", "未加载存档文件")
             return
+        if not self.ensure_idle():
+            return
             
         if messagebox.askyesno("确认", "删除背包中的所有物品？"):
-            try:
-                for i in range(len(self.bag_save.entries)):
+            count = len(self.bag_save.entries)
+            
+            def plan(task):
+                changes = []
+                for i in range(count):
+                    if i % 500 == 0:
+                        task.progress(i / count)
                     entry = BagEntry()
                     entry.quantity = 0
                     entry.category = 0
-                    self.bag_save.set_entry(i, entry)
-                    
-                self.update_items_list()
-                self.is_modified = True
+                    changes.append((i, entry))
+                return changes
+                
+            def done(changed):
                 self.update_status("背包已重置")
                 messagebox.showinfo("成功", "背包已重置")
-            except Exception as e:
-                messagebox.showerror("错误", f"错误: {str(e)}")
+                
+            self.run_bag_tool("正在重置背包...", plan, done)
                 
     def add_all_items(self):
         """添加所有物品，数量最大"""
+        from plaza.types import BagEntry
+        
         if not self.bag_save:
             messagebox.showwarning("警告", "未加载存档文件")
             return
+        if not self.ensure_idle():
+            return
             
         if messagebox.askyesno("确认", "添加所有物品，数量x999？"):
-            try:
-                added_count = 0
-                for item_id_str, item_data in self.item_database.items():
-                    item_id = int(item_id_str)
-                    expected_category = item_data["expected_category"]
-                    
+            item_database = self.item_database
+            
+            def plan(task):
+                changes = []
+                for n, (item_id, item_data) in enumerate(item_database.items()):
+                    if n % 500 == 0:
+                        task.progress(n / len(item_database))
                     entry = BagEntry()
                     entry.quantity = 999
-                    entry.category = expected_category
-                    self.bag_save.set_entry(item_id, entry)
-                    added_count += 1
-                    
-                self.update_items_list()
-                self.is_modified = True
+                    entry.category = item_data["expected_category"]
+                    changes.append((int(item_id), entry))
+                return changes
+                
+            def done(added_count):
                 self.update_status(f"已添加{added_count}个物品")
                 messagebox.showinfo("成功", f"已添加{added_count}个物品")
-            except Exception as e:
-                messagebox.showerror("错误", f"错误: {str(e)}")
+                
+            self.run_bag_tool("正在添加物品...", plan, done)
+            
+    def run_bag_tool(self, message: str, plan, on_applied):
+        """在工作线程中计算批量修改 (物品ID, BagEntry)，再在 Tk 线程中一次性应用"""
+        bag_save = self.bag_save
+        
+        def apply(changes):
+            if self.bag_save is not bag_save:
+                # 计算期间已加载了其他存档
+                return
+            for item_id, entry in changes:
+                self.bag_save.set_entry(item_id, entry)
+            if changes:
+                self.is_modified = True
+            on_applied(len(changes))
+            
+        self.start_task(message, plan, on_done=apply)
                 
     def max_money(self):
         """金钱最大化"""
@@ -606,48 +1051,65 @@ class PLZASaveEditor:
         
     def repair_bag(self):
         """修复背包（纠正类别）"""
+        from plaza.types import BagEntry
+        
         if not self.bag_save:
             messagebox.showwarning("警告", "未加载存档文件")
             return
+        if not self.ensure_idle():
+            return
             
-        try:
-            repaired_count = 0
-            for i, entry in enumerate(self.bag_save.entries):
+        entries = list(self.bag_save.entries)
+        item_database = self.item_database
+        
+        def plan(task):
+            # 不修改原条目，修复结果在 Tk 线程中应用
+            changes = []
+            for i, entry in enumerate(entries):
+                if i % 500 == 0:
+                    task.progress(i / len(entries))
                 if entry.quantity > 0:
-                    if str(i) in self.item_database:
-                        expected_category = self.item_database[str(i)]["expected_category"]
+                    if i in item_database:
+                        expected_category = item_database[i]["expected_category"]
                         if entry.category != expected_category:
-                            entry.category = expected_category
-                            self.bag_save.set_entry(i, entry)
-                            repaired_count += 1
+                            fixed = BagEntry.from_bytes(entry.to_bytes())
+                            fixed.category = expected_category
+                            changes.append((i, fixed))
                     else:
-                        entry.quantity = 0
-                        entry.category = 0
-                        self.bag_save.set_entry(i, entry)
-                        repaired_count += 1
-                        
-            self.update_items_list()
+                        fixed = BagEntry.from_bytes(entry.to_bytes())
+                        fixed.quantity = 0
+                        fixed.category = 0
+                        changes.append((i, fixed))
+            return changes
+            
+        def done(repaired_count):
             if repaired_count > 0:
-                self.is_modified = True
                 self.update_status(f"已修复{repaired_count}个物品")
                 messagebox.showinfo("成功", f"已修复{repaired_count}个物品")
             else:
+                self.update_status("无需修复")
                 messagebox.showinfo("信息", "无需修复")
-        except Exception as e:
-            messagebox.showerror("错误", f"错误: {str(e)}")
+                
+        self.run_bag_tool("正在修复背包...", plan, done)
             
     def check_integrity(self):
         """检查文件完整性"""
-        if not self.save_data:
+        if not self.save_file_obj:
             messagebox.showwarning("警告", "未加载存档文件")
             return
             
-        try:
-            is_valid = SwishCrypto.get_is_hash_valid(self.save_data)
+        save_file = self.save_file_obj
+        
+        def done(is_valid):
             status = "有效" if is_valid else "无效"
+            self.update_status(f"文件哈希: {status}")
             messagebox.showinfo("完整性", f"文件哈希: {status}")
-        except Exception as e:
-            messagebox.showerror("错误", f"检查时出错: {str(e)}")
+            
+        # 同一份数据的哈希只计算一次
+        if save_file.hash_status is not None:
+            done(save_file.hash_status)
+        elif self.ensure_idle():
+            self.start_task("正在检查完整性...", lambda task: save_file.is_hash_valid(), on_done=done)
             
     def update_file_info(self):
         """更新文件信息"""
@@ -659,28 +1121,27 @@ class PLZASaveEditor:
         info.append(f"块数: {len(self.hash_db.blocks)}")
         
         if self.bag_save:
-            item_count = sum(1 for entry in self.bag_save.entries if entry.quantity > 0)
-            info.append(f"背包中的物品: {item_count}")
+            info.append(f"背包中的物品: {len(self.bag_model.rows)}")
             
         if self.core_data:
             info.append(f"玩家ID: {self.core_data.id}")
             
-        try:
-            is_valid = SwishCrypto.get_is_hash_valid(self.save_data) if self.save_data else False
+        # 只读取缓存的哈希状态，不重新计算
+        is_valid = self.save_file_obj.hash_status if self.save_file_obj else None
+        if is_valid is None:
+            info.append("哈希有效: 未检查")
+        else:
             info.append(f"哈希有效: {'是' if is_valid else '否'}")
-        except:
-            info.append("哈希有效: 检查错误")
             
-        self.info_text.delete(1.0, tk.END)
-        self.info_text.insert(1.0, "\n".join(info))
+        self.set_info_text("\n".join(info))
         
-    def save_file(self):
+    def save_file(self, on_saved=None):
         """保存当前文件"""
         if not self.save_file_path:
             self.save_file_as()
             return
             
-        self.save_to_file(self.save_file_path)
+        self.save_to_file(self.save_file_path, on_saved)
         
     def save_file_as(self):
         """另存为新文件"""
@@ -697,11 +1158,18 @@ class PLZASaveEditor:
         if file_path:
             self.save_to_file(file_path)
             
-    def save_to_file(self, file_path: str):
-        """保存到特定文件"""
+    def save_to_file(self, file_path: str, on_saved=None):
+        """保存到特定文件：在 Tk 线程中收集修改并做快照，由写入线程加密和写入（不等待磁盘）"""
+        from plaza.types import HashDBKeys
+        
+        # 加载和批量工具会替换或修改块，期间不能保存；正在进行的保存不影响新的保存
+        if self.tasks.busy:
+            messagebox.showwarning("警告", "请等待当前操作完成")
+            return
+            
         try:
-            # 应用玩家数据修改
-            if self.core_data:
+            # 应用玩家数据修改（只在表单被编辑过时写回，未编辑时不解析也不序列化玩家数据）
+            if self.player_data_modified and self.core_data:
                 # 玩家名称
                 try:
                     player_name = self.player_name_var.get()
@@ -724,41 +1192,102 @@ class PLZASaveEditor:
                 except:
                     pass
                     
-                # 在hash_db中更新数据
-                self.hash_db[HashDBKeys.CoreData].change_data(self.core_data.to_bytes())
+                self.views.touch(HashDBKeys.CoreData)
                 
-            # 更新背包数据
-            if self.bag_save:
-                self.hash_db[HashDBKeys.BagSave].change_data(self.bag_save.to_bytes())
+            # 只序列化修改过的视图（背包条目在修改时已写入块）
+            self.views.flush()
+        except Exception as e:
+            messagebox.showerror("错误", f"保存时出错: {str(e)}")
+            return
+            
+        self.is_modified = False
+        self.player_data_modified = False
+        
+        def done(request, encrypted_data):
+            if self.save_file_obj:
+                # 新写入的数据的哈希已在加密时计算
+                self.save_file_obj.replace_data(encrypted_data, hash_valid=True)
+                self.save_file_obj.path = file_path
+            self.save_data = encrypted_data
+            self.save_file_path = file_path
+            self.update_file_info()
+            status = f"已保存: {os.path.basename(file_path)}"
+            if request.written < len(encrypted_data):
+                status += f"（仅写入 {request.written} 字节）"
+            if request.merged > 1:
+                status += f"（合并了 {request.merged} 次保存）"
+            self.update_status(status)
+            if on_saved:
+                on_saved()
                 
-            # 创建备份
-            self.create_backup()
+        def failed(e):
+            self.is_modified = True
+            self.update_status(f"保存出错: {str(e)}")
+            messagebox.showerror("错误", f"保存时出错: {str(e)}")
             
-            # 加密并保存
-            encrypted_data = SwishCrypto.encrypt(self.hash_db.blocks)
-            with open(file_path, "wb") as f:
-                f.write(encrypted_data)
+        # 块快照在这里完成，之后可以继续编辑；写入线程原地或原子地写入，然后把写入的版本存入备份库
+        disk_data = self.save_data if file_path == self.save_file_path else None
+        journal = self.journal
+        journal_mark = journal.mark() if journal else 0
+        watcher = self.watcher
+        
+        def after_write(blocks, data):
+            # 写入线程中：日志只保留快照之后的修改，并改为针对新写入的版本
+            if journal:
+                try:
+                    journal.reset(data, keep_from=journal_mark, path=file_path)
+                except OSError as e:
+                    print(f"重置崩溃日志时出错: {e}")
+            if watcher:
+                # 自己写入的版本不算外部修改（另存为之后检测新的路径）
+                watcher.rebase(data, blocks, path=file_path)
+            if BACKUP_CONFIG["auto_backup"] and BACKUP_CONFIG["backup_on_save"]:
+                self.create_backup_copy(file_path, blocks, data)
                 
-            self.is_modified = False
-            self.save_file_path = file_path
-            self.update_status(f"已保存: {os.path.basename(file_path)}")
-            messagebox.showinfo("成功", "文件已成功保存！")
+        merged = self.saver.submit(file_path, self.hash_db.blocks, disk_data, after_write=after_write,
+                                   on_done=done, on_error=failed)
+        self.update_status("正在后台保存..." if merged == 1 else f"正在后台保存（已合并 {merged} 次保存）...")
             
+    @staticmethod
+    def create_backup_copy(save_file_path: Optional[str], blocks, data: Optional[bytes] = None) -> Optional[str]:
+        """
+        把存档的块存入存档目录中的备份库（按块内容去重，每个存档保留 max_backups 个备份），
+        返回备份ID（失败时返回 None；可在工作线程中调用）
+        """
+        from plaza.backup import BackupStore
+        
+        if not save_file_path:
+            return None
+        try:
+            store = BackupStore.for_save(save_file_path, BACKUP_CONFIG["max_backups"])
+            return store.create(blocks, save_file_path, data)
         except Exception as e:
-            messagebox.showerror("错误", f"保存时出错: {str(e)}")
-            
+            print(f"创建备份时出错: {e}")
+        return None
+        
     def create_backup(self):
-        """创建原始文件备份"""
+        """备份磁盘上的存档文件"""
+        from plaza.savefile import SaveFile
+        
+        if not self.ensure_idle():
+            return
         if not self.save_file_path or not os.path.exists(self.save_file_path):
+            messagebox.showwarning("警告", "未加载存档文件")
             return
             
-        backup_path = self.save_file_path + ".backup"
-        if not os.path.exists(backup_path):
-            try:
-                shutil.copy2(self.save_file_path, backup_path)
-                self.update_status(f"已创建备份: {os.path.basename(backup_path)}")
-            except Exception as e:
-                print(f"创建备份时出错: {e}")
+        def backup(task):
+            # 备份磁盘上的版本，而不是界面中尚未保存的修改
+            save_file = SaveFile.load(save_file_path)
+            return self.create_backup_copy(save_file_path, save_file.hash_db.blocks, save_file.data)
+            
+        def done(backup_id):
+            if backup_id:
+                self.update_status(f"已创建备份: {backup_id}")
+            else:
+                self.update_status("创建备份失败")
+                
+        save_file_path = self.save_file_path
+        self.start_task("正在创建备份...", backup, on_done=done)
                 
     def quit_app(self):
         """退出应用程序"""
@@ -770,8 +1299,21 @@ class PLZASaveEditor:
             if result is None:  # 取消
                 return
             elif result:  # 是，保存
-                self.save_file()
+                if self.tasks.busy:
+                    messagebox.showwarning("警告", "请等待当前操作完成")
+                    return
+                # 保存完成后再退出；保存失败时保持窗口打开
+                self.save_file(on_saved=self.quit_app_now)
+                return
                 
+        self.quit_app_now()
+        
+    def quit_app_now(self):
+        """结束后台任务（等待正在进行和排队的保存）并退出"""
+        self.tasks.shutdown()
+        self.saver.shutdown()
+        # 修改已保存或用户选择不保存，日志不再需要
+        self.close_journal(discard=True)
         self.root.quit()
         
     def show_about(self):
@@ -798,9 +1340,14 @@ class PLZASaveEditor:
 
 class ItemAddDialog:
     """添加物品对话框"""
-    def __init__(self, parent, item_database):
+    SEARCH_LIMIT = 100
+    FILTER_DELAY_MS = 150
+    
+    def __init__(self, parent, catalog, search_index):
+        """catalog 为共享的 ItemCatalog；search_index 是返回搜索索引的函数（首次搜索时才构建）"""
         self.result = None
-        self.item_database = item_database
+        self.catalog = catalog
+        self.search_index = search_index
         
         self.dialog = tk.Toplevel(parent)
         self.dialog.title("添加物品")
@@ -819,29 +1366,16 @@ class ItemAddDialog:
         self.search_var = tk.StringVar()
         self.search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=30)
         self.search_entry.pack(side=tk.LEFT, padx=(5, 0), fill=tk.X, expand=True)
-        self.search_entry.bind('<KeyRelease>', self.filter_items)
-        
-        # 物品列表
-        list_frame = ttk.Frame(main_frame)
-        list_frame.pack(fill=tk.BOTH, expand=True)
-        
-        columns = ("ID", "名称", "类别")
-        self.items_tree = ttk.Treeview(list_frame, columns=columns, show="headings", height=15)
-        
-        self.items_tree.heading("ID", text="ID")
-        self.items_tree.heading("名称", text="名称")
-        self.items_tree.heading("类别", text="类别")
-        
-        self.items_tree.column("ID", width=80)
-        self.items_tree.column("名称", width=300)
-        self.items_tree.column("类别", width=150)
-        
-        # 滚动条
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.items_tree.yview)
-        self.items_tree.configure(yscrollcommand=scrollbar.set)
-        
-        self.items_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.schedule_filter = DebouncedCall(self.dialog, self.FILTER_DELAY_MS, self.filter_items)
+        self.search_entry.bind('<KeyRelease>', self.schedule_filter)
+        
+        # 物品列表：共享目录的虚拟视图，打开对话框时不需要排序或插入所有行
+        self.model = CatalogListModel(catalog, self.search)
+        self.items_view = VirtualTreeview(
+            main_frame, self.model, ItemCatalog.COLUMNS,
+            widths={"ID": 80, "名称": 300, "类别": 150}, height=15
+        )
+        self.items_view.pack(fill=tk.BOTH, expand=True)
         
         # 数量
         quantity_frame = ttk.Frame(main_frame)
@@ -860,72 +1394,37 @@ class ItemAddDialog:
         ttk.Button(button_frame, text="取消", command=self.cancel).pack(side=tk.RIGHT)
         
         # 填充列表
-        self.populate_items()
+        self.items_view.refresh()
         
         # 双击添加
-        self.items_tree.bind('<Double-1>', lambda e: self.add_item())
+        self.items_view.bind_tree('<Double-1>', lambda e: self.add_item())
+        
+        # 等待对话框关闭，调用者随后读取 result
+        self.dialog.wait_window()
+        
+    def search(self, search_term: str):
+        """容错搜索，返回最匹配的物品ID"""
+        return self.search_index().search(search_term, limit=self.SEARCH_LIMIT,
+                                          allowed=self.catalog.__contains__)
         
-    def populate_items(self):
-        """填充物品列表"""
-        for item_id, item_data in sorted(self.item_database.items(), key=lambda x: int(x[0])):
-            category_names = {
-                0: "无",
-                1: "精灵球",
-                2: "药品", 
-                3: "树果",
-                4: "招式学习器",
-                5: "物品",
-                6: "其他"
-            }
-            
-            expected_category = item_data.get("expected_category", 0)
-            category_name = category_names.get(expected_category, f"类别 {expected_category}")
-            
-            self.items_tree.insert("", "end", values=(
-                item_id,
-                item_data["english_ui_name"],
-                category_name
-            ))
-            
     def filter_items(self, event=None):
-        """按名称筛选物品"""
-        search_term = self.search_var.get().lower()
-        
-        # 清空列表
-        for item in self.items_tree.get_children():
-            self.items_tree.delete(item)
-            
-        # 用筛选后的物品重新填充
-        for item_id, item_data in sorted(self.item_database.items(), key=lambda x: int(x[0])):
-            if search_term in item_data["english_ui_name"].lower():
-                category_names = {
-                    0: "无",
-                    1: "精灵球", 
-                    2: "药品",
-                    3: "树果",
-                    4: "招式学习器",
-                    5: "物品",
-                    6: "其他"
-                }
-                
-                expected_category = item_data.get("expected_category", 0)
-                category_name = category_names.get(expected_category, f"类别 {expected_category}")
-                
-                self.items_tree.insert("", "end", values=(
-                    item_id,
-                    item_data["english_ui_name"],
-                    category_name
-                ))
-                
+        """按名称筛选物品（容错搜索，显示最匹配的结果）"""
+        search_term = self.search_var.get().strip()
+        if search_term == self.model.search_term:
+            return
+        self.model.set_search(search_term)
+        self.items_view.refresh(reset=True)
+            
     def add_item(self):
         """添加选中的物品"""
-        selection = self.items_tree.selection()
+        # 确保使用最新的搜索结果
+        self.schedule_filter.flush()
+        selection = self.model.get_selected_ids()
         if not selection:
             messagebox.showwarning("警告", "请选择一个物品")
             return
             
-        item = self.items_tree.item(selection[0])
-        item_id = int(item['values'][0])
+        item_id = selection[0]
         quantity = self.quantity_var.get()
         
         self.result = (item_id, quantity)
@@ -933,24 +1432,69 @@ class ItemAddDialog:
         
     def cancel(self):
         """取消"""
+        self.schedule_filter.cancel()
         self.dialog.destroy()
 
 
-def main():
+def main(argv=None):
     """主函数"""
+    parser = argparse.ArgumentParser(description="宝可梦传说 Z-A 存档编辑器")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="显示启动计时报告（类似 -X importtime）后退出")
+    parser.add_argument("--check-startup", action="store_true",
+                        help="首次绘制时间超出启动预算时以非零状态退出")
+    args = parser.parse_args(argv)
+    profile.mark("模块导入")
+    
     root = tk.Tk()
+    profile.mark("Tk 初始化")
     app = PLZASaveEditor(root)
+    # 标题栏的关闭按钮与菜单中的退出相同：询问是否保存，并等待后台保存写完
+    root.protocol("WM_DELETE_WINDOW", app.quit_app)
+    profile.mark("主窗口构建")
     
     root.update_idletasks()
     x = (root.winfo_screenwidth() - root.winfo_width()) // 2
     y = (root.winfo_screenheight() - root.winfo_height()) // 2
     root.geometry(f"+{x}+{y}")
     
+    if args.startup_report or args.check_startup:
+        return check_startup(root, app)
+        
     try:
         root.mainloop()
     except KeyboardInterrupt:
         pass
+    finally:
+        # 无论主循环如何结束，都先写完排队和正在写入的保存（写入线程是守护线程，解释器退出时会被直接结束）；
+        # 日志只同步不删除，未保存的修改下次打开时仍可恢复
+        app.saver.shutdown()
+        app.close_journal()
+        
+        
+def check_startup(root, app) -> int:
+    """测量首次绘制时间并等待后台预加载，输出报告；超出预算时返回 1"""
+    root.update()
+    first_paint = profile.mark("首次绘制")
+    
+    # 等待后台预加载完成，使报告包含延迟导入的耗时
+    deadline = time.perf_counter() + STARTUP_CONFIG["preload_timeout_s"]
+    while time.perf_counter() < deadline:
+        root.update()
+        if app.preload_thread is not None and not app.preload_thread.is_alive():
+            break
+        time.sleep(0.01)
+        
+    print(profile.report())
+    root.destroy()
+    
+    budget = STARTUP_CONFIG["first_paint_budget_ms"]
+    if first_paint > budget:
+        print(f"首次绘制耗时 {first_paint:.1f} ms，超出预算 {budget} ms")
+        return 1
+    print(f"首次绘制耗时 {first_paint:.1f} ms（预算 {budget} ms）")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
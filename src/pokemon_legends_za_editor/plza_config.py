@@ -145,6 +145,30 @@ BACKUP_CONFIG = {
     "backup_extension": ".backup"
 }
 
+STARTUP_CONFIG = {
+    "first_paint_budget_ms": 1000,  # budget vérifié par --check-startup
+    "preload_delay_ms": 100,        # délai avant le préchargement de plaza et des catalogues
+    "preload_timeout_s": 10
+}
+
+SAVE_CONFIG = {
+    "in_place_writes": True  # n'écrire que les octets modifiés quand la taille des blocs ne change pas
+}
+
+HISTORY_CONFIG = {
+    "max_bytes": 4 * 1024 * 1024  # taille maximale de l'historique d'annulation (octets des différences)
+}
+
+JOURNAL_CONFIG = {
+    "enabled": True,        # journal des modifications non enregistrées, rejoué après un plantage
+    "flush_delay_ms": 20    # regroupe les modifications de cet intervalle en une seule synchronisation
+}
+
+WATCH_CONFIG = {
+    "enabled": True,            # recharger les blocs modifiés par un autre programme (le jeu, un autre outil)
+    "poll_interval_ms": 1000    # intervalle de vérification de la taille et de la date du fichier
+}
+
 GAME_LIMITS = {
     "max_money": 999999,
     "max_item_quantity": 999,
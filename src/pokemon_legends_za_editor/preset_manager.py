@@ -258,6 +258,36 @@ class PresetManager:
         """将背包内容导出为新预设"""
         return self.create_custom_preset(name, description, bag_items)
     
+    def preview_preset(self, hash_db, preset_data: Dict[str, Any]):
+        """在存档之上预览预设：返回记录改动的 SaveOverlay，存档本身不变（commit 应用，discard 放弃）"""
+        from plaza.overlay import SaveOverlay
+        from plaza.patch import compile_preset
+
+        patch, _ = compile_preset(preset_data)
+        overlay = SaveOverlay(hash_db, preset_data.get("name"))
+        overlay.apply(patch)
+        return overlay
+
+    def preview_presets(self, hash_db, filenames: List[str]) -> Dict[str, Any]:
+        """同时预览多个预设；所有预览共享同一个存档，每个只保存自己改动的页"""
+        return {filename: self.preview_preset(hash_db, self.load_preset(os.path.join(self.preset_dir, filename)))
+                for filename in filenames}
+
+    def get_preview_changes(self, overlay) -> List[Dict[str, Any]]:
+        """列出预览中有变化的物品（旧数量与新数量）"""
+        from plaza.types import BagEntry, HashDBKeys
+
+        key = HashDBKeys.BagSave.value
+        item_ids = set()
+        for change_key, offset, data in overlay.get_changes():
+            if change_key == key:
+                item_ids.update(range(offset // 16, (offset + len(data) - 1) // 16 + 1))
+        base = overlay.base[key].raw
+        return [{"id": item_id,
+                 "old_quantity": BagEntry.from_bytes(base[item_id * 16:item_id * 16 + 16]).quantity,
+                 "new_quantity": BagEntry.from_bytes(overlay.read(key, item_id * 16, 16)).quantity}
+                for item_id in sorted(item_ids)]
+
     def get_preset_categories(self) -> Dict[str, List[str]]:
         """获取预设类别"""
         categories = {
@@ -0,0 +1,174 @@
+"""
+宝可梦传说 Z-A 存档编辑器后台保存
+
+保存请求只在 Tk 线程中做块快照，然后立即返回；加密和写盘由专用的写入线程完成。
+写入期间提交到同一路径的多次保存会合并为最新的一次快照（不同路径各自排队，按提交顺序写入），
+完成或失败通过 after() 轮询回到 Tk 线程。
+"""
+
+import queue
+import threading
+from typing import Callable, Dict, List, Optional
+
+
+class SaveRequest:
+    """一次保存：块快照、目标路径，以及被合并进来的所有请求的回调"""
+
+    def __init__(self, path: str, blocks: list, after_write: Optional[Callable[[list, bytes], None]] = None):
+        self.path = path
+        self.blocks = blocks
+        self.after_write = after_write
+        self.on_done: List[Callable] = []
+        self.on_error: List[Callable] = []
+        self.merged = 1
+        self.written = 0   # 实际写入磁盘的字节数
+
+
+class WriteBehindSaver:
+    """
+    写后保存器：单个写入线程，最多一个正在写入的请求，每个路径最多一个排队的请求。
+
+    同一路径上排队的请求被新请求替换（合并），因此连续按 Ctrl+S 只会写入最新的快照；
+    另存为其他路径的请求不会替换它，而是排在后面单独写入。
+    """
+
+    POLL_MS = 50
+
+    def __init__(self, root, in_place: bool = True):
+        self.root = root
+        self.in_place = in_place
+        self.condition = threading.Condition()
+        self.pending: Dict[str, SaveRequest] = {}   # 路径 -> 排队的请求（按提交顺序）
+        self.writing: Optional[SaveRequest] = None
+        self.closed = False
+        self.results: "queue.Queue" = queue.Queue()
+        self.poll_job = None
+        # 最近一次快照：内容未变的块直接复用（快照中的块不会被修改）
+        self.last_blocks: list = []
+        # 写入线程已知的各路径磁盘内容，用于原地写入时比较
+        self.disk_data = {}
+        self.thread = threading.Thread(target=self.run, name="plza-saver", daemon=True)
+        self.thread.start()
+
+    @property
+    def busy(self) -> bool:
+        with self.condition:
+            return bool(self.pending) or self.writing is not None
+
+    def snapshot(self, blocks) -> list:
+        """复制自上次快照以来有变化的块，其余块共享上次快照中的副本"""
+        previous = self.last_blocks
+        result = []
+        for i, block in enumerate(blocks):
+            old = previous[i] if i < len(previous) else None
+            if (old is not None and old.key == block.key and old.type == block.type
+                    and old.sub_type == block.sub_type and old.raw == block.raw):
+                result.append(old)
+            else:
+                result.append(block.clone())
+        self.last_blocks = result
+        return result
+
+    def submit(self, path: str, blocks, disk_data: Optional[bytes] = None,
+               after_write: Optional[Callable[[list, bytes], None]] = None,
+               on_done: Optional[Callable] = None, on_error: Optional[Callable[[Exception], None]] = None) -> int:
+        """
+        提交保存（在 Tk 线程中调用，不等待磁盘）。disk_data 是该路径上当前文件的内容（若已知）；
+        after_write 在写入线程中以块快照和写入的数据调用（例如创建备份）。返回排队请求中合并的保存次数。
+        """
+        request = SaveRequest(path, self.snapshot(blocks), after_write)
+        if on_done:
+            request.on_done.append(on_done)
+        if on_error:
+            request.on_error.append(on_error)
+
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("保存器已关闭")
+            if disk_data is not None and path not in self.disk_data:
+                self.disk_data[path] = disk_data
+            replaced = self.pending.pop(path, None)
+            if replaced is not None:
+                # 被替换的请求不会单独写入：它的回调随新快照一起完成
+                request.on_done[:0] = replaced.on_done
+                request.on_error[:0] = replaced.on_error
+                request.merged += replaced.merged
+                request.after_write = request.after_write or replaced.after_write
+            self.pending[path] = request
+            self.condition.notify()
+
+        if self.poll_job is None:
+            self.poll_job = self.root.after(self.POLL_MS, self.poll)
+        return request.merged
+
+    def set_disk_data(self, path: str, data: bytes) -> None:
+        """记录其他程序写入后该路径上的文件内容，之后的原地写入以它为准"""
+        with self.condition:
+            self.disk_data[path] = data
+            
+    def run(self) -> None:
+        """写入线程：按提交顺序写入各路径最新的排队请求"""
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                request = self.pending.pop(next(iter(self.pending)))
+                self.writing = request
+                old_data = self.disk_data.get(request.path, b"")
+
+            try:
+                data = self.write(request, old_data)
+            except Exception as e:
+                self.results.put((request, None, e))
+            else:
+                self.results.put((request, data, None))
+            finally:
+                with self.condition:
+                    self.writing = None
+                    self.condition.notify_all()
+
+    def write(self, request: SaveRequest, old_data: bytes) -> bytes:
+        from plaza.crypto import HashDB
+        from plaza.savefile import SaveFile
+
+        save_file = SaveFile(old_data, HashDB(request.blocks), request.path)
+        # 原地写入自带预写记录；否则通过临时文件 + os.replace 原子替换
+        data = save_file.write(atomic=True, in_place=self.in_place)
+        request.written = save_file.last_write_size
+        if request.after_write:
+            request.after_write(request.blocks, data)
+        with self.condition:
+            self.disk_data[request.path] = data
+        return data
+
+    def poll(self) -> None:
+        """在 Tk 线程中分发写入结果"""
+        self.poll_job = None
+        while True:
+            try:
+                request, data, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if error is None:
+                for callback in request.on_done:
+                    callback(request, data)
+            else:
+                for callback in request.on_error:
+                    callback(error)
+
+        if (self.busy or not self.results.empty()) and self.poll_job is None:
+            self.poll_job = self.root.after(self.POLL_MS, self.poll)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待所有排队的保存写完（退出时调用），返回是否全部完成"""
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.pending and self.writing is None, timeout)
+
+    def shutdown(self) -> None:
+        """写完排队的保存后结束写入线程"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
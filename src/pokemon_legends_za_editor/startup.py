@@ -0,0 +1,101 @@
+"""
+宝可梦传说 Z-A 存档编辑器启动计时
+
+记录从进程启动（包括解释器启动和 Tk 的导入）到主窗口首次绘制的各个阶段，以及延迟导入的模块耗时，
+用于 --startup-report（类似 -X importtime 的报告）和 --check-startup（启动时间预算检查）。
+"""
+
+import importlib
+import os
+import sys
+import threading
+import time
+from typing import List, Optional, Tuple
+
+
+def get_process_age() -> Optional[float]:
+    """获取进程已运行的秒数（包括解释器启动和导入本模块之前的时间）；无法获取时返回 None"""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+            
+            kernel32 = ctypes.windll.kernel32
+            creation, exit_time, kernel, user, now = (wintypes.FILETIME() for _ in range(5))
+            if not kernel32.GetProcessTimes(kernel32.GetCurrentProcess(), ctypes.byref(creation),
+                                            ctypes.byref(exit_time), ctypes.byref(kernel), ctypes.byref(user)):
+                return None
+            # GetSystemTimePreciseAsFileTime 从 Windows 8 开始提供
+            get_time = getattr(kernel32, "GetSystemTimePreciseAsFileTime", kernel32.GetSystemTimeAsFileTime)
+            get_time(ctypes.byref(now))
+            # FILETIME 以 100 纳秒为单位
+            ticks = [(ft.dwHighDateTime << 32) | ft.dwLowDateTime for ft in (now, creation)]
+            return (ticks[0] - ticks[1]) / 1e7
+        if os.path.exists("/proc/self/stat"):
+            # starttime 是开机后的时钟滴答数（第 22 个字段，进程名中可能有空格，所以从 ")" 之后数）
+            with open("/proc/self/stat") as f:
+                start_ticks = int(f.read().rpartition(")")[2].split()[19])
+            with open("/proc/uptime") as f:
+                uptime = float(f.read().split()[0])
+            return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+        import psutil   # 其他系统：可选依赖
+        return max(0.0, time.time() - psutil.Process().create_time())
+    except (ImportError, OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+# 进程启动时间（perf_counter 时基）；无法获取进程启动时间时，以本模块的导入时间近似
+# （编辑器在设置好 sys.path 后立即导入本模块，此时解释器启动的时间不计入）
+_process_age = get_process_age()
+PROCESS_START_KNOWN = _process_age is not None
+PROCESS_START = time.perf_counter() - (_process_age or 0.0)
+
+
+class StartupProfile:
+    """启动阶段与延迟导入的计时"""
+
+    def __init__(self, start: float = PROCESS_START, start_known: bool = PROCESS_START_KNOWN):
+        self.start = start
+        self.origin = "进程启动" if start_known else "导入启动计时模块"
+        self.marks: List[Tuple[str, float]] = []
+        self.imports: List[Tuple[str, float, str]] = []
+        self.lock = threading.Lock()
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def mark(self, name: str) -> float:
+        """记录一个阶段完成的时间点（毫秒，从 origin 开始）"""
+        elapsed = self.elapsed_ms()
+        with self.lock:
+            self.marks.append((name, elapsed))
+        return elapsed
+
+    def get_mark(self, name: str):
+        for mark_name, elapsed in self.marks:
+            if mark_name == name:
+                return elapsed
+        return None
+
+    def import_module(self, name: str):
+        """导入模块并记录耗时（模块已导入时不计时）"""
+        if name in sys.modules:
+            return sys.modules[name]
+        begin = time.perf_counter()
+        module = importlib.import_module(name)
+        with self.lock:
+            self.imports.append((name, (time.perf_counter() - begin) * 1000, threading.current_thread().name))
+        return module
+
+    def report(self) -> str:
+        """生成启动报告"""
+        lines = [f"启动阶段 (ms，从{self.origin}开始):"]
+        for name, elapsed in self.marks:
+            lines.append(f"  {elapsed:10.1f} | {name}")
+        lines.append("延迟导入 (ms，累计 | 模块 | 线程):")
+        for name, elapsed, thread in self.imports:
+            lines.append(f"  {elapsed:10.1f} | {name} | {thread}")
+        return "\n".join(lines)
+
+
+profile = StartupProfile()
@@ -0,0 +1,126 @@
+"""
+宝可梦传说 Z-A 存档编辑器后台任务
+
+耗时操作（加载、保存、完整性检查、批量工具）在工作线程中运行，
+进度和结果通过线程安全的队列传回，并由 Tk 线程用 after() 轮询处理。
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class TaskCancelled(Exception):
+    """任务已被取消"""
+
+
+class BackgroundTask:
+    """在工作线程中运行的任务；回调总是在 Tk 线程中调用"""
+
+    def __init__(self, runner: 'TaskRunner', name: str, func: Callable[['BackgroundTask'], Any],
+                 on_done: Optional[Callable[[Any], None]] = None,
+                 on_error: Optional[Callable[[Exception], None]] = None,
+                 on_progress: Optional[Callable[[float, str], None]] = None,
+                 on_cancelled: Optional[Callable[[], None]] = None,
+                 cancellable: bool = True):
+        self.runner = runner
+        self.name = name
+        self.func = func
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_cancelled = on_cancelled
+        self.cancellable = cancellable
+        self.cancel_event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def cancel(self) -> None:
+        """请求取消（任务在下一个检查点停止；不可取消的任务忽略此请求）"""
+        if self.cancellable:
+            self.cancel_event.set()
+
+    def check(self) -> None:
+        """检查点：已取消时抛出 TaskCancelled（在工作线程中调用）"""
+        if self.cancel_event.is_set():
+            raise TaskCancelled()
+
+    def progress(self, fraction: float, message: str = "") -> None:
+        """报告进度，同时也是取消检查点（在工作线程中调用）"""
+        self.check()
+        self.runner.queue.put(("progress", self, (fraction, message)))
+
+    def run(self) -> None:
+        try:
+            self.check()
+            result = self.func(self)
+        except TaskCancelled:
+            self.runner.queue.put(("cancelled", self, None))
+        except Exception as e:
+            self.runner.queue.put(("error", self, e))
+        else:
+            self.runner.queue.put(("done", self, result))
+
+
+class TaskRunner:
+    """后台任务执行器：单个工作线程按顺序执行任务"""
+
+    POLL_MS = 50
+
+    def __init__(self, root, max_workers: int = 1):
+        self.root = root
+        self.queue: "queue.Queue" = queue.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="plza-worker")
+        self.active = []
+        self.poll_job = None
+
+    @property
+    def busy(self) -> bool:
+        return bool(self.active)
+
+    def submit(self, name: str, func: Callable[[BackgroundTask], Any], **callbacks) -> BackgroundTask:
+        """提交任务；func 在工作线程中以任务对象为参数调用，不能访问 Tk 控件"""
+        task = BackgroundTask(self, name, func, **callbacks)
+        self.active.append(task)
+        self.executor.submit(task.run)
+        if self.poll_job is None:
+            self.poll_job = self.root.after(self.POLL_MS, self.poll)
+        return task
+
+    def cancel_all(self) -> None:
+        for task in self.active:
+            task.cancel()
+
+    def poll(self) -> None:
+        """在 Tk 线程中处理工作线程发来的消息"""
+        self.poll_job = None
+        while True:
+            try:
+                kind, task, payload = self.queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "progress":
+                if task.on_progress and not task.cancelled:
+                    task.on_progress(*payload)
+                continue
+
+            if task in self.active:
+                self.active.remove(task)
+            if kind == "done" and task.on_done:
+                task.on_done(payload)
+            elif kind == "error" and task.on_error:
+                task.on_error(payload)
+            elif kind == "cancelled" and task.on_cancelled:
+                task.on_cancelled()
+
+        if self.active and self.poll_job is None:
+            self.poll_job = self.root.after(self.POLL_MS, self.poll)
+
+    def shutdown(self) -> None:
+        """取消所有可取消的任务，并等待工作线程结束（例如正在写入的保存）"""
+        self.cancel_all()
+        self.executor.shutdown(wait=True)
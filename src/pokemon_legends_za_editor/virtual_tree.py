@@ -0,0 +1,289 @@
+"""
+宝可梦传说 Z-A 存档编辑器虚拟列表控件
+
+只有可见的行挂在 Treeview 上，滚动和筛选时复用已有的项目，
+因此无论数据有多少行，刷新列表的 Tk 调用次数都只与可见行数有关。
+"""
+
+import tkinter as tk
+from tkinter import ttk
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+class VirtualListModel:
+    """虚拟列表的数据模型基类：排序、筛选和选择都在模型中完成"""
+
+    def __init__(self):
+        self.order: List[int] = []
+        self.selection: set = set()
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def row_id(self, index: int) -> int:
+        """获取显示位置对应的行ID"""
+        return self.order[index]
+
+    def index_of(self, row_id: int) -> Optional[int]:
+        """获取行ID的显示位置（不可见时返回 None）"""
+        try:
+            return self.order.index(row_id)
+        except ValueError:
+            return None
+
+    def values(self, row_id: int) -> Tuple[Any, ...]:
+        """获取行的显示值"""
+        raise NotImplementedError
+
+    def sort_by(self, column: str) -> None:
+        """按列排序（可选）"""
+
+    def get_selected_ids(self) -> List[int]:
+        """按显示顺序获取选中的行ID"""
+        if not self.selection:
+            return []
+        return [row_id for row_id in self.order if row_id in self.selection]
+
+
+class DebouncedCall:
+    """通过 after() 延迟执行回调；在延迟期间再次触发会取消之前尚未执行的调用"""
+
+    def __init__(self, widget, delay_ms: int, callback):
+        self.widget = widget
+        self.delay_ms = delay_ms
+        self.callback = callback
+        self.job = None
+
+    def __call__(self, event=None) -> None:
+        self.cancel()
+        self.job = self.widget.after(self.delay_ms, self.run)
+
+    def cancel(self) -> None:
+        if self.job is not None:
+            self.widget.after_cancel(self.job)
+            self.job = None
+
+    def run(self) -> None:
+        self.job = None
+        self.callback()
+
+    def flush(self) -> None:
+        """立即执行尚未执行的调用"""
+        if self.job is not None:
+            self.cancel()
+            self.callback()
+
+
+class VirtualTreeview(ttk.Frame):
+    """
+    虚拟化的 Treeview：只有可见窗口内的行存在于 Treeview 中。
+
+    每个 Tk 项目绑定到一个模型行（例如一个背包条目）并被缓存；窗口变化时，
+    仍然可见的行只需 detach/move，新出现的行复用最久未使用的项目。
+    """
+
+    DEFAULT_ROW_HEIGHT = 20
+    CACHE_FACTOR = 2
+
+    def __init__(self, parent, model: VirtualListModel, columns: Sequence[str],
+                 widths: Optional[Dict[str, int]] = None, height: int = 20):
+        super().__init__(parent)
+        self.model = model
+        self.columns = tuple(columns)
+        self.top = 0
+        self.rows = max(1, height)
+        self.pool: List[str] = []
+        self.slots: Dict[str, Optional[Tuple[int, Tuple[Any, ...]]]] = {}
+        self.item_of: Dict[int, str] = {}
+        self.displayed: List[str] = []
+        self.last_used: Dict[str, int] = {}
+        self.clock = 0
+
+        self.tree = ttk.Treeview(self, columns=self.columns, show="headings",
+                                 height=height, selectmode="browse")
+        for column in self.columns:
+            self.tree.heading(column, text=column, command=lambda c=column: self.sort_by(c))
+            if widths and column in widths:
+                self.tree.column(column, width=widths[column])
+
+        self.v_scroll = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.h_scroll = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.h_scroll.set)
+
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.v_scroll.grid(row=0, column=1, sticky="ns")
+        self.h_scroll.grid(row=1, column=0, sticky="ew")
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.tree.bind('<<TreeviewSelect>>', self.on_select)
+        self.tree.bind('<Configure>', self.on_configure)
+        self.tree.bind('<MouseWheel>', self.on_mousewheel)
+        self.tree.bind('<Button-4>', lambda e: self.scroll(-3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll(3))
+        self.tree.bind('<Up>', lambda e: self.move_selection(-1))
+        self.tree.bind('<Down>', lambda e: self.move_selection(1))
+        self.tree.bind('<Prior>', lambda e: self.move_selection(-self.visible_rows()))
+        self.tree.bind('<Next>', lambda e: self.move_selection(self.visible_rows()))
+        self.tree.bind('<Home>', lambda e: self.move_selection(-len(self.model)))
+        self.tree.bind('<End>', lambda e: self.move_selection(len(self.model)))
+
+    def bind_tree(self, sequence: str, func) -> None:
+        """为内部 Treeview 绑定事件"""
+        self.tree.bind(sequence, func)
+
+    def visible_rows(self) -> int:
+        return self.rows
+
+    def on_configure(self, event=None) -> None:
+        """窗口大小改变时调整可见行数"""
+        bbox = self.tree.bbox(self.displayed[0]) if self.displayed else ""
+        if bbox:
+            header, row_height = bbox[1], bbox[3]
+        else:
+            header, row_height = self.DEFAULT_ROW_HEIGHT, self.DEFAULT_ROW_HEIGHT
+        rows = max(1, (self.tree.winfo_height() - header) // max(1, row_height))
+        if rows != self.rows:
+            self.rows = rows
+            self.refresh()
+
+    def clamp_top(self) -> None:
+        self.top = max(0, min(self.top, len(self.model) - self.rows))
+
+    def take_item(self, wanted: set) -> str:
+        """为新出现的行取得一个 Tk 项目：优先新建（不超过缓存上限），否则复用最久未使用的"""
+        if len(self.pool) < self.rows * self.CACHE_FACTOR:
+            iid = f"row{len(self.pool)}"
+            self.tree.insert("", "end", iid=iid)
+            self.tree.detach(iid)
+            self.pool.append(iid)
+            self.slots[iid] = None
+            return iid
+
+        free = [iid for iid in self.pool if self.slots[iid] is None or self.slots[iid][0] not in wanted]
+        iid = min(free, key=lambda i: self.last_used.get(i, -1))
+        if self.slots[iid] is not None:
+            del self.item_of[self.slots[iid][0]]
+            self.slots[iid] = None
+        return iid
+
+    def refresh(self, reset: bool = False) -> None:
+        """按模型重新组织可见窗口（只调用与可见行数成正比的 Tk 命令）"""
+        if reset:
+            self.top = 0
+        self.clamp_top()
+        self.clock += 1
+
+        end = min(self.top + self.rows, len(self.model))
+        window = [self.model.row_id(index) for index in range(self.top, end)]
+        wanted = set(window)
+
+        items = []
+        for row_id in window:
+            iid = self.item_of.get(row_id)
+            if iid is None:
+                iid = self.take_item(wanted)
+                self.item_of[row_id] = iid
+            values = self.model.values(row_id)
+            if self.slots[iid] != (row_id, values):
+                self.tree.item(iid, values=values)
+                self.slots[iid] = (row_id, values)
+            self.last_used[iid] = self.clock
+            items.append(iid)
+
+        # 移出窗口的行只 detach，保留绑定以便之后直接重新挂上
+        keep = set(items)
+        current = []
+        for iid in self.displayed:
+            if iid in keep:
+                current.append(iid)
+            else:
+                self.tree.detach(iid)
+        for position, iid in enumerate(items):
+            if position >= len(current) or current[position] != iid:
+                self.tree.move(iid, "", position)
+                if iid in current:
+                    current.remove(iid)
+                current.insert(position, iid)
+        self.displayed = items
+
+        selected = tuple(iid for iid in items if self.slots[iid][0] in self.model.selection)
+        if selected != tuple(self.tree.selection()):
+            self.tree.selection_set(selected)
+        self.update_scrollbar()
+
+    def refresh_rows(self, row_ids) -> None:
+        """只刷新当前显示的指定行"""
+        for row_id in row_ids:
+            iid = self.item_of.get(row_id)
+            if iid is None or iid not in self.displayed:
+                continue
+            values = self.model.values(row_id)
+            if values != self.slots[iid][1]:
+                self.tree.item(iid, values=values)
+                self.slots[iid] = (row_id, values)
+
+    def update_scrollbar(self) -> None:
+        total = len(self.model)
+        if total <= self.rows:
+            self.v_scroll.set(0.0, 1.0)
+        else:
+            self.v_scroll.set(self.top / total, (self.top + self.rows) / total)
+
+    def yview(self, *args) -> None:
+        """滚动条回调"""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * len(self.model))
+        elif args[0] == "scroll":
+            step = self.rows if args[2] == "pages" else 1
+            self.top += int(args[1]) * step
+        self.refresh()
+
+    def scroll(self, rows: int):
+        self.top += rows
+        self.refresh()
+        return "break"
+
+    def on_mousewheel(self, event):
+        # Windows 上 delta 为 120 的倍数，macOS 上为较小的整数
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self.scroll(-3 * delta)
+
+    def see(self, row_id: int) -> None:
+        """滚动使指定行可见"""
+        index = self.model.index_of(row_id)
+        if index is None:
+            return
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + self.rows:
+            self.top = index - self.rows + 1
+        self.refresh()
+
+    def on_select(self, event=None) -> None:
+        """把 Treeview 的选择同步到模型"""
+        selected = {self.slots[iid][0] for iid in self.tree.selection() if self.slots.get(iid)}
+        if selected:
+            self.model.selection = selected
+        else:
+            self.model.selection -= {self.slots[iid][0] for iid in self.displayed}
+
+    def move_selection(self, delta: int):
+        """用键盘移动选择，必要时滚动"""
+        total = len(self.model)
+        if total == 0:
+            return "break"
+        selected = self.model.get_selected_ids()
+        current = self.model.index_of(selected[0]) if selected else None
+        index = 0 if current is None else max(0, min(total - 1, current + delta))
+        row_id = self.model.row_id(index)
+        self.model.selection = {row_id}
+        self.see(row_id)
+        return "break"
+
+    def sort_by(self, column: str) -> None:
+        """点击列标题时在模型中排序"""
+        self.model.sort_by(column)
+        self.refresh()